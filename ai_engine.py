@@ -1,16 +1,153 @@
-from openai import OpenAI
+import asyncio
 import os
-from typing import Dict, List
-from dotenv import load_dotenv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterator, List, Optional
+from response_cache import bubble_cache, prompt_key
+from resilience import CircuitOpenError, llm_guard
+from scheduler import AdmissionError, current_session, llm_scheduler, speculative
+from singleflight import llm_flight, request_key
+from prompts import history_summary, prompt_library, stance_description
+from history import ConversationHistory
+from router import response_router
+from metrics import LLM_FIRST_TOKEN, record_llm_call, record_response
 
-load_dotenv()
+# openai (and httpx under it) is most of the app's import time; it is only
+# imported when the first client is created
+if TYPE_CHECKING:
+    import httpx
+
+# Process-wide pooled HTTP client shared by every AsyncAIEngine
+_async_http_client: Optional["httpx.AsyncClient"] = None
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """Get the shared, connection-pooled HTTP client for async LLM calls"""
+    import httpx
+    from openai import DefaultAsyncHttpxClient
+    
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        max_connections = int(os.getenv('LLM_MAX_CONNECTIONS', '200'))
+        _async_http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+    return _async_http_client
+
+async def close_async_http_client():
+    """Close the shared HTTP client (call on server shutdown)"""
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+
+# Background generation of extra cached AI bubble opinions
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='bubble-refresh')
 
 class AIEngine:
     def __init__(self):
-        self.client = OpenAI()  # api key from OPENAI_API_KEY env
+        self._client = None
+        self._local_client = None
+        self._client_lock = threading.Lock()
+        self.client_error: Optional[str] = None
+        
+    @property
+    def client(self):
+        """API client, created on first use so workers start serving before openai is imported"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    try:
+                        self._client = self._create_client()
+                        self.client_error = None
+                    except Exception as e:
+                        self.client_error = str(e)
+                        raise
+        return self._client
+        
+    def _create_client(self):
+        from openai import OpenAI
+        # api key from OPENAI_API_KEY env; retries and timeouts are handled by llm_guard
+        return OpenAI(max_retries=0)
         
-    def generate_npc_response(self, npc: Dict, conversation_history: List[Dict], user_message: str, game_context: Dict) -> str:
+    @property
+    def local_client(self):
+        """Client for the small local model (see router.py), created on first use"""
+        if self._local_client is None:
+            with self._client_lock:
+                if self._local_client is None:
+                    self._local_client = self._create_local_client()
+        return self._local_client
+        
+    def _create_local_client(self):
+        from openai import OpenAI
+        return OpenAI(base_url=response_router.local_base_url, api_key=response_router.local_api_key, max_retries=0)
+        
+    def warm_up(self) -> bool:
+        """Create the API client ahead of the first LLM call"""
+        try:
+            self.client
+            return True
+        except Exception as e:
+            print(f"AI Client Error: {e}")
+            return False
+            
+    def llm_status(self) -> str:
+        """cold (client not created yet), ready, degraded (circuit open or on trial) or unavailable"""
+        if self.client_error:
+            return "unavailable"
+        if self._client is None:
+            return "cold"
+        if llm_guard.breaker.state != "closed":
+            return "degraded"
+        return "ready"
+        
+    def generate_npc_response(self, npc: Dict, conversation_history: ConversationHistory, user_message: str, game_context: Dict) -> str:
         """Generate AI response for NPC based on personality and context"""
+        tier, intent = response_router.route(npc, user_message)
+        if tier == "template":
+            return self._get_template_response(npc, intent)
+        messages = self._build_npc_messages(npc, conversation_history, user_message, game_context)
+        if tier == "local":
+            response = self._local_completion(messages)
+            if response is not None:
+                return response
+        
+        try:
+            response = self._request_completion(messages, temperature=0.7, npc=npc)
+            record_response("chat", "llm")
+            return response
+            
+        except Exception as e:
+            print(f"AI Error: {e}")
+            return self._get_fallback_response(npc, user_message)
+            
+    def stream_npc_response(self, npc: Dict, conversation_history: ConversationHistory, user_message: str, game_context: Dict) -> Iterator[str]:
+        """Stream AI response for NPC as text deltas, falling back if nothing was generated"""
+        tier, intent = response_router.route(npc, user_message)
+        if tier == "template":
+            yield self._get_template_response(npc, intent)
+            return
+        messages = self._build_npc_messages(npc, conversation_history, user_message, game_context)
+        if tier == "local":
+            # Small models answer quickly: the reply is sent in one piece
+            response = self._local_completion(messages)
+            if response is not None:
+                yield response
+                return
+        yield from self._stream_completion(
+            messages,
+            temperature=0.7,
+            fallback=lambda: self._get_fallback_response(npc, user_message),
+            npc=npc,
+            kind="chat"
+        )
+        
+    def _build_npc_messages(self, npc: Dict, conversation_history: ConversationHistory, user_message: str, game_context: Dict) -> List[Dict]:
+        """Build chat messages for a free-form NPC conversation turn"""
         
         # Build system prompt based on NPC personality and current game state
         system_prompt = self._build_system_prompt(npc, game_context)
@@ -18,8 +155,12 @@ class AIEngine:
         # Build conversation history for context
         messages = [{"role": "system", "content": system_prompt}]
         
-        # Add conversation history
-        for entry in conversation_history[-5:]:  # Keep last 5 exchanges for context
+        # Older turns only survive as a summary, after the cacheable system prompt
+        if conversation_history.summary:
+            messages.append({"role": "system", "content": history_summary(conversation_history.summary)})
+        
+        # Add the recent turns kept verbatim
+        for entry in conversation_history:
             if entry.get("type") == "user_message":
                 messages.append({"role": "user", "content": entry["message"]})
             elif entry.get("type") == "ai_response":
@@ -27,81 +168,151 @@ class AIEngine:
                 
         # Add current user message
         messages.append({"role": "user", "content": user_message})
+        return messages
         
+    def _local_completion(self, messages: List[Dict]) -> Optional[str]:
+        """Reply from the small local model, or None to let the remote LLM answer"""
+        start = time.perf_counter()
+        try:
+            response = self.local_client.chat.completions.create(
+                model=response_router.local_model,
+                messages=messages,
+                max_tokens=60,
+                temperature=0.7,
+                timeout=response_router.local_timeout
+            )
+            text = (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            print(f"Local AI Error: {e}")
+            text = ""
+        return self._record_local(text, time.perf_counter() - start)
+        
+    def _record_local(self, text: str, seconds: float) -> Optional[str]:
+        """Count a local model attempt; empty replies count as failures"""
+        record_llm_call("local", seconds, bool(text))
+        response_router.record_local(bool(text), seconds)
+        if not text:
+            return None
+        record_response("chat", "local")
+        return text
+        
+    def _request_completion(self, messages: List[Dict], temperature: float, npc: Optional[Dict] = None) -> str:
+        """Call the API for a full completion within the latency budget (raises on failure).
+        
+        Identical concurrent requests share a single upstream call, which takes
+        one scheduler slot on behalf of the session that started it.
+        """
+        key = request_key("gpt-4o-mini", messages, max_tokens=60, temperature=temperature)
+        if speculative.get():
+            key = ("speculative", key)  # May be turned away; requests must not share its AdmissionError
+        session_id = current_session.get()
+        return llm_flight.do(key, lambda: llm_scheduler.call(session_id, lambda: llm_guard.call(
+            lambda timeout: self._create_completion(messages, temperature, timeout, npc)
+        )))
+        
+    def _create_completion(self, messages: List[Dict], temperature: float, timeout: float,
+                           npc: Optional[Dict] = None) -> str:
+        """Single API attempt"""
+        start = time.perf_counter()
         try:
             response = self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=messages,
                 max_tokens=60,
-                temperature=0.7
+                temperature=temperature,
+                timeout=timeout
             )
+        except Exception:
+            record_llm_call("complete", time.perf_counter() - start, False)
+            raise
             
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            print(f"AI Error: {e}")
-            return self._get_fallback_response(npc, user_message)
-            
-    def _build_system_prompt(self, npc: Dict, game_context: Dict) -> str:
-        """Build system prompt for NPC personality"""
+        record_llm_call("complete", time.perf_counter() - start, True, npc, response.usage)
+        return response.choices[0].message.content.strip()
         
-        base_prompt = f"""Você é {npc['name']}, um(a) {npc['role']} numa conferência de tecnologia. 
-
-PERSONALIDADE: {npc['personality']}
-BACKGROUND: {npc['bio']}
-
-POSIÇÃO SOBRE IA: {self._get_ai_stance_description(npc)}
-
-REGRAS IMPORTANTES DO JOGO:
-- Você está numa conferência de tecnologia para desenvolvedores backend e frontend
-- Mantenha-se no personagem {npc['name']} o tempo todo
-- Mantenha respostas com no máximo 40 palavras - seja conciso!
-- Não quebre a quarta parede ou mencione que isso é um jogo
-- RESPONDA SEMPRE EM PORTUGUÊS BRASILEIRO
-- Suas opiniões sobre IA devem ser consistentes com sua posição declarada acima
-"""
-
-        # Add context based on conversation phase
-        phase = npc.get('conversation_phase', 'initial')
-        
-        if phase == 'initial':
-            base_prompt += "\n- Esta é sua primeira interação com esta pessoa\n- Seja amigável e profissional"
+    def _stream_completion(self, messages: List[Dict], temperature: float, fallback: Callable[[], str],
+                           on_success: Optional[Callable[[str], None]] = None,
+                           npc: Optional[Dict] = None, kind: str = "chat") -> Iterator[str]:
+        """Yield completion deltas as they arrive from the API"""
+        parts = []
+        start = None
+        settled = True
+        llm_guard.count("calls")
+        try:
+            # Queue first: a breaker trial call must not be left waiting for a slot
+            with llm_scheduler.slot(current_session.get()):
+                if not llm_guard.breaker.allow():
+                    llm_guard.count("short_circuits")
+                    raise CircuitOpenError("LLM circuit breaker is open")
+                settled = False
+                    
+                start = time.perf_counter()
+                usage = None
+                stream = self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=60,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=llm_guard.attempt_timeout
+                )
             
-        elif phase == 'giovanni_check':
-            if npc['knows_giovanni']:
-                base_prompt += f"\n- Você conhece Giovanni e já trabalhou com ele antes\n- Você deve ficar curioso sobre por que estão perguntando sobre Giovanni"
-            else:
-                base_prompt += f"\n- Você não conhece ninguém chamado Giovanni\n- Você deve expressar que não reconhece o nome"
-                
-        elif phase == 'ai_opinion':
-            base_prompt += f"\n- Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', 'Você conhece Giovanni.')}"
-            if npc['ai_bubble_stance'] == 'bubble':
-                base_prompt += f"\n- Você acredita que o mercado de IA está numa bolha\n- Expresse ceticismo sobre as avaliações e hype da IA\n- Referencie sua experiência com Giovanni se relevante\n- Seja específico sobre por que acha que é uma bolha"
-            else:
-                base_prompt += f"\n- Você acredita que IA não é bolha mas está criando valor real\n- Seja otimista sobre o potencial da IA\n- Referencie sua experiência positiva com Giovanni se relevante\n- Dê exemplos específicos de valor real da IA"
+                for chunk in stream:
+                    if chunk.usage:
+                        usage = chunk.usage  # Sent in a final chunk without choices
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            LLM_FIRST_TOKEN.observe(time.perf_counter() - start)
+                        parts.append(delta)
+                        yield delta
+                    
+                llm_guard.breaker.record_success()
+                settled = True
+                llm_guard.count("successes")
+                record_llm_call("stream", time.perf_counter() - start, True, npc, usage)
+                if parts:
+                    record_response(kind, "llm")
+                    if on_success:
+                        on_success(''.join(parts).strip())
                 
-        elif phase == 'argument_phase':
-            base_prompt += f"\n- Você atualmente acha que IA é uma bolha\n- Você está aberto a ouvir argumentos mas um pouco cético\n- Você precisa de {npc.get('resistance_level', 1)} argumentos bons a mais para mudar de opinião"
+        except (CircuitOpenError, AdmissionError) as e:
+            print(f"AI Error: {e}")
+        except Exception as e:
+            print(f"AI Error: {e}")
+            llm_guard.breaker.record_failure()
+            settled = True
+            llm_guard.count("failures")
+            if start is not None:
+                record_llm_call("stream", time.perf_counter() - start, False)
+        finally:
+            # A player who disconnects mid-stream (GeneratorExit, cancellation) ends the call
+            # without an outcome: give back the breaker trial it may hold
+            if not settled:
+                llm_guard.breaker.release()
             
-        elif phase == 'safe':
-            base_prompt += f"\n- Você foi convencido de que IA não é uma bolha\n- Seja positivo sobre a conversa e o futuro da IA"
+        # Only fall back when the player has not seen any text yet
+        if not parts:
+            yield fallback()
             
-        return base_prompt
+    def _build_system_prompt(self, npc: Dict, game_context: Dict) -> str:
+        """Build system prompt for NPC personality (precompiled, see prompts.py)"""
+        return prompt_library.system_prompt(npc)
     
     def _get_ai_stance_description(self, npc: Dict) -> str:
         """Get AI stance description for the NPC"""
-        status = npc.get('status', 'unknown')
-        ai_stance = npc.get('ai_bubble_stance', 'bubble')
+        return stance_description(npc.get('status', 'unknown'), npc.get('ai_bubble_stance', 'bubble'))
         
-        if status == 'safe':
-            return "Você foi convencido de que IA não é uma bolha e está criando valor real. Seja otimista sobre o futuro da IA."
-        elif ai_stance == 'bubble':
-            return "Você acredita que o mercado de IA está numa bolha especulativa. Seja cético sobre as avaliações e hype da IA, mas não seja hostil."
-        else:
-            return "Você acredita que IA não é uma bolha e está criando valor real. Seja otimista sobre o potencial da IA."
+    def _get_template_response(self, npc: Dict, intent: str) -> str:
+        """Canned small-talk reply chosen by the router"""
+        record_response("chat", "template")
+        return response_router.template_reply(npc, intent)
         
     def _get_fallback_response(self, npc: Dict, user_message: str) -> str:
         """Fallback response when AI fails"""
+        record_response("chat", "fallback")
         fallbacks = [
             f"Interessante! Como {npc['role']}, adoraria ouvir mais sobre sua perspectiva.",
             f"Hmm, deixe-me pensar sobre isso. Qual sua opinião?",
@@ -114,67 +325,345 @@ REGRAS IMPORTANTES DO JOGO:
         
     def generate_ai_bubble_response(self, npc: Dict) -> str:
         """Generate AI bubble opinion response based on NPC's relationship with Giovanni"""
+        messages = self._build_ai_bubble_messages(npc)
+        key = prompt_key(messages)
+        cached = self._get_cached_bubble(key, messages, npc)
+        if cached is not None:
+            return cached
+            
         try:
-            if npc['ai_bubble_stance'] == 'bubble':
-                prompt = f"""Como {npc['name']}, dê sua opinião sobre se o mercado de IA é uma bolha. 
-                Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', '')}
-                Você acredita que É uma bolha. Seja específico mas muito breve.
-                Mantenha sob 40 palavras e permaneça no personagem como {npc['role']}."""
-            else:
-                prompt = f"""Como {npc['name']}, dê sua opinião sobre se o mercado de IA é uma bolha.
-                Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', '')}
-                Você acredita que NÃO é uma bolha. Dê exemplos breves de valor real da IA.
-                Mantenha sob 40 palavras e permaneça no personagem como {npc['role']}."""
-            
-            system_prompt = f"""Você é {npc['name']}, um(a) {npc['role']}.
-            Personalidade: {npc['personality']}
-            Background: {npc['bio']}
-            Posição sobre IA: {self._get_ai_stance_description(npc)}
-            Responda naturalmente e conversacionalmente em português brasileiro."""
+            response = self._request_completion(messages, temperature=0.7, npc=npc)
+            bubble_cache.add(key, response, label=npc['id'])
+            record_response("ai_bubble", "llm")
+            return response
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=60,
-                temperature=0.7
-            )
+        except AdmissionError:
+            if speculative.get():
+                raise  # Not worth a fallback: the request that needs the reply makes the call itself
+            return self._get_ai_bubble_fallback(npc)
+        except Exception as e:
+            print(f"AI Error: {e}")
+            return self._get_ai_bubble_fallback(npc)
             
-            return response.choices[0].message.content.strip()
+    def stream_ai_bubble_response(self, npc: Dict) -> Iterator[str]:
+        """Stream AI bubble opinion response as text deltas"""
+        messages = self._build_ai_bubble_messages(npc)
+        key = prompt_key(messages)
+        cached = self._get_cached_bubble(key, messages, npc)
+        if cached is not None:
+            yield cached
+            return
             
+        yield from self._stream_completion(
+            messages,
+            temperature=0.7,
+            fallback=lambda: self._get_ai_bubble_fallback(npc),
+            on_success=lambda response: bubble_cache.add(key, response, label=npc['id']),
+            npc=npc,
+            kind="ai_bubble"
+        )
+        
+    def ai_bubble_key(self, npc: Dict) -> str:
+        """Identify the AI bubble opinion prompt for an NPC"""
+        return prompt_key(self._build_ai_bubble_messages(npc))
+        
+    def _get_cached_bubble(self, key: str, messages: List[Dict], npc: Dict) -> Optional[str]:
+        """Serve a cached AI bubble opinion, generating another variant in the background if needed"""
+        cached, refresh = bubble_cache.get(key)
+        if cached is not None:
+            record_response("ai_bubble", "cache")
+        if refresh:
+            _refresh_executor.submit(self._refresh_bubble, key, messages, npc)
+        return cached
+        
+    def _refresh_bubble(self, key: str, messages: List[Dict], npc: Dict):
+        """Add a freshly generated AI bubble opinion to the cache"""
+        try:
+            bubble_cache.add(key, self._request_completion(messages, temperature=0.7, npc=npc), label=npc['id'])
         except Exception as e:
             print(f"AI Error: {e}")
-            # Fallback responses
-            if npc['ai_bubble_stance'] == 'bubble':
-                return "Acho que estamos numa bolha de IA. As avaliações estão loucas e todo mundo só coloca 'IA' em tudo."
-            else:
-                return "Não é bolha. IA está criando valor real na saúde, automação e acessibilidade."
+            bubble_cache.refresh_failed(key)
+        
+    def _build_ai_bubble_messages(self, npc: Dict) -> List[Dict]:
+        """Build chat messages asking the NPC for their AI bubble opinion"""
+        return prompt_library.ai_bubble_messages(npc)
+        
+    def _get_ai_bubble_fallback(self, npc: Dict) -> str:
+        """Fallback AI bubble opinion when AI fails"""
+        record_response("ai_bubble", "fallback")
+        if npc['ai_bubble_stance'] == 'bubble':
+            return "Acho que estamos numa bolha de IA. As avaliações estão loucas e todo mundo só coloca 'IA' em tudo."
+        else:
+            return "Não é bolha. IA está criando valor real na saúde, automação e acessibilidade."
 
     def generate_custom_response(self, npc: Dict, prompt: str) -> str:
         """Generate a custom response for specific game scenarios"""
         try:
-            system_prompt = f"""Você é {npc['name']}, um(a) {npc['role']}. 
-            Personalidade: {npc['personality']}
-            Background: {npc['bio']}
-            Posição sobre IA: {self._get_ai_stance_description(npc)}
-            Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', 'Você pode ou não conhecer Giovanni.')}
+            response = self._request_completion(self._build_custom_messages(npc, prompt), temperature=0.8, npc=npc)
+            record_response("custom", "llm")
+            return response
             
-            Responda no personagem, mantendo sob 40 palavras em português brasileiro."""
+        except Exception as e:
+            print(f"AI Error: {e}")
+            record_response("custom", "fallback")
+            return "Isso é muito interessante! Adoraria continuar essa conversa."
             
-            response = self.client.chat.completions.create(
+    def _build_custom_messages(self, npc: Dict, prompt: str) -> List[Dict]:
+        """Build chat messages for a custom game scenario prompt"""
+        return [
+            {"role": "system", "content": prompt_library.custom_system_prompt(npc)},
+            {"role": "user", "content": prompt}
+        ]
+
+
+class AsyncAIEngine(AIEngine):
+    """Async variant of AIEngine for ASGI serving.
+
+    Prompts and fallbacks are shared with AIEngine; only the calls to the
+    API are awaited, on a pooled HTTP client shared by the whole process.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._refresh_tasks = set()  # Keep background refreshes referenced until done
+        
+    def _create_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(http_client=get_async_http_client(), max_retries=0)
+        
+    def _create_local_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(base_url=response_router.local_base_url, api_key=response_router.local_api_key,
+                           http_client=get_async_http_client(), max_retries=0)
+        
+    async def generate_npc_response(self, npc: Dict, conversation_history: ConversationHistory, user_message: str, game_context: Dict) -> str:
+        """Generate AI response for NPC based on personality and context"""
+        tier, intent = response_router.route(npc, user_message)
+        if tier == "template":
+            return self._get_template_response(npc, intent)
+        messages = self._build_npc_messages(npc, conversation_history, user_message, game_context)
+        if tier == "local":
+            response = await self._local_completion(messages)
+            if response is not None:
+                return response
+        
+        try:
+            response = await self._request_completion(messages, temperature=0.7, npc=npc)
+            record_response("chat", "llm")
+            return response
+            
+        except Exception as e:
+            print(f"AI Error: {e}")
+            return self._get_fallback_response(npc, user_message)
+            
+    async def stream_npc_response(self, npc: Dict, conversation_history: ConversationHistory, user_message: str, game_context: Dict) -> AsyncIterator[str]:
+        """Stream AI response for NPC as text deltas, falling back if nothing was generated"""
+        tier, intent = response_router.route(npc, user_message)
+        if tier == "template":
+            yield self._get_template_response(npc, intent)
+            return
+        messages = self._build_npc_messages(npc, conversation_history, user_message, game_context)
+        if tier == "local":
+            # Small models answer quickly: the reply is sent in one piece
+            response = await self._local_completion(messages)
+            if response is not None:
+                yield response
+                return
+        async for delta in self._stream_completion(
+            messages,
+            temperature=0.7,
+            fallback=lambda: self._get_fallback_response(npc, user_message),
+            npc=npc,
+            kind="chat"
+        ):
+            yield delta
+            
+    async def _local_completion(self, messages: List[Dict]) -> Optional[str]:
+        """Reply from the small local model, or None to let the remote LLM answer"""
+        start = time.perf_counter()
+        try:
+            response = await self.local_client.chat.completions.create(
+                model=response_router.local_model,
+                messages=messages,
+                max_tokens=60,
+                temperature=0.7,
+                timeout=response_router.local_timeout
+            )
+            text = (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            print(f"Local AI Error: {e}")
+            text = ""
+        return self._record_local(text, time.perf_counter() - start)
+        
+    async def _request_completion(self, messages: List[Dict], temperature: float, npc: Optional[Dict] = None) -> str:
+        """Call the API for a full completion within the latency budget (raises on failure).
+        
+        Identical concurrent requests share a single upstream call, which takes
+        one scheduler slot on behalf of the session that started it.
+        """
+        key = request_key("gpt-4o-mini", messages, max_tokens=60, temperature=temperature)
+        if speculative.get():
+            key = ("speculative", key)  # May be turned away; requests must not share its AdmissionError
+        session_id = current_session.get()
+        return await llm_flight.ado(key, lambda: llm_scheduler.acall(session_id, lambda: llm_guard.acall(
+            lambda timeout: self._create_completion(messages, temperature, timeout, npc)
+        )))
+        
+    async def _create_completion(self, messages: List[Dict], temperature: float, timeout: float,
+                                 npc: Optional[Dict] = None) -> str:
+        """Single API attempt"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 max_tokens=60,
-                temperature=0.8
+                temperature=temperature,
+                timeout=timeout
             )
+        except Exception:
+            record_llm_call("complete", time.perf_counter() - start, False)
+            raise
+            
+        record_llm_call("complete", time.perf_counter() - start, True, npc, response.usage)
+        return response.choices[0].message.content.strip()
+        
+    async def _stream_completion(self, messages: List[Dict], temperature: float, fallback: Callable[[], str],
+                                 on_success: Optional[Callable[[str], None]] = None,
+                                 npc: Optional[Dict] = None, kind: str = "chat") -> AsyncIterator[str]:
+        """Yield completion deltas as they arrive from the API"""
+        parts = []
+        start = None
+        settled = True
+        llm_guard.count("calls")
+        try:
+            # Queue first: a breaker trial call must not be left waiting for a slot
+            async with llm_scheduler.aslot(current_session.get()):
+                if not llm_guard.breaker.allow():
+                    llm_guard.count("short_circuits")
+                    raise CircuitOpenError("LLM circuit breaker is open")
+                settled = False
+                    
+                start = time.perf_counter()
+                usage = None
+                stream = await self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=60,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=llm_guard.attempt_timeout
+                )
+            
+                async for chunk in stream:
+                    if chunk.usage:
+                        usage = chunk.usage  # Sent in a final chunk without choices
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            LLM_FIRST_TOKEN.observe(time.perf_counter() - start)
+                        parts.append(delta)
+                        yield delta
+                    
+                llm_guard.breaker.record_success()
+                settled = True
+                llm_guard.count("successes")
+                record_llm_call("stream", time.perf_counter() - start, True, npc, usage)
+                if parts:
+                    record_response(kind, "llm")
+                    if on_success:
+                        on_success(''.join(parts).strip())
+                
+        except (CircuitOpenError, AdmissionError) as e:
+            print(f"AI Error: {e}")
+        except Exception as e:
+            print(f"AI Error: {e}")
+            llm_guard.breaker.record_failure()
+            settled = True
+            llm_guard.count("failures")
+            if start is not None:
+                record_llm_call("stream", time.perf_counter() - start, False)
+        finally:
+            # A player who disconnects mid-stream (GeneratorExit, cancellation) ends the call
+            # without an outcome: give back the breaker trial it may hold
+            if not settled:
+                llm_guard.breaker.release()
+            
+        # Only fall back when the player has not seen any text yet
+        if not parts:
+            yield fallback()
+            
+    async def generate_ai_bubble_response(self, npc: Dict) -> str:
+        """Generate AI bubble opinion response based on NPC's relationship with Giovanni"""
+        messages = self._build_ai_bubble_messages(npc)
+        key = prompt_key(messages)
+        cached = self._get_cached_bubble(key, messages, npc)
+        if cached is not None:
+            return cached
+            
+        try:
+            response = await self._request_completion(messages, temperature=0.7, npc=npc)
+            bubble_cache.add(key, response, label=npc['id'])
+            record_response("ai_bubble", "llm")
+            return response
+            
+        except AdmissionError:
+            if speculative.get():
+                raise  # Not worth a fallback: the request that needs the reply makes the call itself
+            return self._get_ai_bubble_fallback(npc)
+        except Exception as e:
+            print(f"AI Error: {e}")
+            return self._get_ai_bubble_fallback(npc)
+            
+    async def stream_ai_bubble_response(self, npc: Dict) -> AsyncIterator[str]:
+        """Stream AI bubble opinion response as text deltas"""
+        messages = self._build_ai_bubble_messages(npc)
+        key = prompt_key(messages)
+        cached = self._get_cached_bubble(key, messages, npc)
+        if cached is not None:
+            yield cached
+            return
+            
+        async for delta in self._stream_completion(
+            messages,
+            temperature=0.7,
+            fallback=lambda: self._get_ai_bubble_fallback(npc),
+            on_success=lambda response: bubble_cache.add(key, response, label=npc['id']),
+            npc=npc,
+            kind="ai_bubble"
+        ):
+            yield delta
             
-            return response.choices[0].message.content.strip()
+    def _get_cached_bubble(self, key: str, messages: List[Dict], npc: Dict) -> Optional[str]:
+        """Serve a cached AI bubble opinion, generating another variant in the background if needed"""
+        cached, refresh = bubble_cache.get(key)
+        if cached is not None:
+            record_response("ai_bubble", "cache")
+        if refresh:
+            task = asyncio.get_running_loop().create_task(self._refresh_bubble(key, messages, npc))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_tasks.discard)
+        return cached
+        
+    async def _refresh_bubble(self, key: str, messages: List[Dict], npc: Dict):
+        """Add a freshly generated AI bubble opinion to the cache"""
+        try:
+            bubble_cache.add(key, await self._request_completion(messages, temperature=0.7, npc=npc), label=npc['id'])
+        except Exception as e:
+            print(f"AI Error: {e}")
+            bubble_cache.refresh_failed(key)
+            
+    async def generate_custom_response(self, npc: Dict, prompt: str) -> str:
+        """Generate a custom response for specific game scenarios"""
+        try:
+            response = await self._request_completion(self._build_custom_messages(npc, prompt), temperature=0.8, npc=npc)
+            record_response("custom", "llm")
+            return response
             
         except Exception as e:
             print(f"AI Error: {e}")
+            record_response("custom", "fallback")
             return "Isso é muito interessante! Adoraria continuar essa conversa."
@@ -1,27 +1,91 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, g, Response, stream_with_context, has_app_context
 import os
+import json
+import sys
+import threading
+import time
 import uuid
+from contextlib import contextmanager
+from functools import lru_cache
 from dotenv import load_dotenv
-from game_logic import GameState
-from ai_engine import AIEngine
+from jinja2.utils import htmlsafe_json_dumps
 
+# Before the local imports: several modules read their settings at import time
 load_dotenv()
 
+from game_logic import GameState
+from npc_data import NPC_IDS, NPC_RECORDS
+from ai_engine import AIEngine
+from session_store import create_session_store
+from response_cache import bubble_cache, load_bubble_cache
+from speculation import speculator, speculation_enabled, result_stream, speculated_result
+from images import image_set
+from assets import asset_url, send_static
+from metrics import registry, HTTP_REQUEST_DURATION
+from resilience import llm_guard
+from scheduler import current_session, llm_scheduler
+from singleflight import llm_flight
+from router import response_router
+
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
+app.add_template_global(image_set)
+app.add_template_global(asset_url)
+# Fingerprinted files are immutable; built CSS/JS is sent precompressed
+app.view_functions['static'] = send_static
 
-# Server-side session storage to avoid large cookies
-game_sessions = {}
+# Server-side session storage to avoid large cookies (bounded, expiring)
+game_sessions = create_session_store()
 
-# Initialize AI engine
+# Initialize AI engine (the API client itself is created on first use or by warm_up)
 ai_engine = AIEngine()
+load_bubble_cache()
+
+# Engines serving LLM calls in this process, reported by /ready; asgi.py adds its AsyncAIEngine
+llm_engines = {'sync': ai_engine}
+# llm_status() values, best first
+LLM_STATUSES = ('ready', 'cold', 'degraded', 'unavailable')
+
+# Render the player's game into the page so it starts without /api/start_game
+EMBED_INITIAL_STATE = os.getenv('EMBED_INITIAL_STATE', '1') == '1'
+# NPC fields the conference room cards need; the rest stays on the server
+CARD_FIELDS = ("id", "name", "role", "bio", "avatar_color")
+
+def warm_up():
+    """Load what the first game actions need without delaying the first page"""
+    import scoring  # NumPy and the argument index, used by make_argument
+    ai_engine.warm_up()
+
+if os.getenv('LLM_WARMUP', '1') == '1':
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+# Component stats exported by /metrics at scrape time
+registry.register_stats("chicoteia_sessions", game_sessions.stats,
+                        counters=("hits", "misses", "evictions", "expirations"))
+registry.register_stats("chicoteia_llm_guard", llm_guard.stats,
+                        counters=("calls", "successes", "failures", "timeouts", "errors", "retries",
+                                  "hedges", "hedge_wins", "short_circuits", "opens"))
+registry.register_stats("chicoteia_llm_scheduler", llm_scheduler.stats,
+                        counters=("admitted", "queued", "rate_limited", "queue_timeouts",
+                                  "speculative_admitted", "speculative_skipped"))
+registry.register_stats("chicoteia_router", response_router.stats,
+                        counters=("template", "local", "remote", "local_errors"))
+registry.register_stats("chicoteia_llm_flight", llm_flight.stats, counters=("executed", "saved"))
+registry.register_stats("chicoteia_bubble_cache", bubble_cache.stats, counters=("hits", "misses", "refreshes"))
+registry.register_stats("chicoteia_speculation", speculator.stats,
+                        counters=("started", "hits", "joined", "misses", "expired"))
 
 def get_game_state():
     """Get game state from server-side storage"""
     session_id = session.get('session_id')
-    if not session_id or session_id not in game_sessions:
+    if not session_id:
         return None
-    return game_sessions[session_id]
+    
+    # Requests that modify the game hold the session lock until teardown,
+    # so concurrent requests on other workers cannot overwrite each other
+    if request.method != 'GET' and 'session_lock' not in g:
+        g.session_lock = (session_id, game_sessions.acquire_lock(session_id))
+    return game_sessions.get(session_id)
 
 def save_game_state(game_state):
     """Save game state to server-side storage"""
@@ -29,12 +93,254 @@ def save_game_state(game_state):
     if not session_id:
         session_id = str(uuid.uuid4())
         session['session_id'] = session_id
-    game_sessions[session_id] = game_state
+    game_sessions.set(session_id, game_state)
+
+def update_game_state(session_id, update):
+    """Apply update(game_state) to the latest saved game under the session lock and save it.
+    
+    Streamed replies are recorded this way when they finish, after the lock
+    of the request that started them has been released.
+    """
+    with game_sessions.lock(session_id):
+        game_state = game_sessions.get(session_id)
+        if game_state is not None:
+            update(game_state)
+            game_sessions.set(session_id, game_state)
+    return game_state
+
+def save_and_unlock(game_state):
+    """Save the game and release the session lock before a reply is streamed"""
+    save_game_state(game_state)
+    release_session_lock(None)
+
+@contextmanager
+def session_unlocked(game_state):
+    """Save the game and let go of the session lock while waiting on the LLM.
+    
+    The lock is taken again afterwards and game_state takes over whatever
+    other requests saved meanwhile, so no request holds the lock (a lease in
+    the SQLite store) across an LLM wait and no change is overwritten.
+    """
+    lock = g.pop('session_lock', None) if has_app_context() else None
+    if lock is None:
+        yield
+        return
+    session_id, token = lock
+    game_sessions.set(session_id, game_state)
+    game_sessions.release_lock(session_id, token)
+    try:
+        yield
+    finally:
+        g.session_lock = (session_id, game_sessions.acquire_lock(session_id))
+        latest = game_sessions.get(session_id)
+        if latest is not None and latest is not game_state:
+            game_state.replace_with(latest)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    # LLM calls made for this request are scheduled under the player's session
+    current_session.set(session.get('session_id'))
+
+@app.after_request
+def record_request_duration(response):
+    """Observe request latency per route for /metrics"""
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+    return response
+
+@app.teardown_request
+def release_session_lock(exc):
+    """Release the session lock taken by get_game_state"""
+    lock = g.pop('session_lock', None)
+    if lock:
+        game_sessions.release_lock(*lock)
+
+def wants_stream():
+    """Check whether the client asked for a streamed (Server-Sent Events) reply"""
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+def sse_event(event, data):
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_reply(deltas, on_complete):
+    """Forward completion deltas as SSE and finish with the payload built from the full text"""
+    def generate():
+        parts = []
+        for delta in deltas:
+            parts.append(delta)
+            yield sse_event('delta', {'text': delta})
+        
+        # The final text is only recorded once the stream has closed
+        yield sse_event('done', on_complete(''.join(parts).strip()))
+        
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def record_ai_opinion(game_state, npc_id, ai_response):
+    """Add the NPC's AI bubble opinion to the conversation history"""
+    game_state.history(npc_id).append({
+        "type": "ai_opinion",
+        "response": ai_response
+    })
+
+def record_chat(game_state, npc_id, message, ai_response):
+    """Add a free-form chat exchange to the conversation history"""
+    history = game_state.history(npc_id)
+    history.append({"type": "user_message", "message": message})
+    history.append({"type": "ai_response", "response": ai_response})
+
+def ai_opinion_speculation_key(npc):
+    """Key a speculated AI bubble opinion on the session and the exact prompt"""
+    return (current_session.get(), npc['id'], ai_engine.ai_bubble_key(npc))
+
+def answer_ask_giovanni(game_state, npc_id):
+    """Ask NPC if they know Giovanni, speculating on the follow-up opinion"""
+    result = game_state.ask_about_giovanni(npc_id)
+    
+    # The next request is almost always /api/ask_ai_opinion: start its LLM call now
+    if speculation_enabled and result.get('phase') == 'ai_opinion':
+        npc = game_state.preview_ai_bubble_opinion(npc_id)
+        speculator.start(ai_opinion_speculation_key(npc), ai_engine.generate_ai_bubble_response, npc)
+    return result
+
+def answer_ai_opinion(game_state, npc_id):
+    """Ask NPC about AI bubble opinion and wait for the full response"""
+    result = game_state.ask_ai_bubble_opinion(npc_id)
+    if not result.pop('needs_ai_response', False):
+        return result
+    
+    # Use the speculated response started by ask_giovanni, if it matches this prompt
+    speculated = speculator.take(ai_opinion_speculation_key(result['npc']))
+    with session_unlocked(game_state):
+        if speculated:
+            ai_response = speculated_result(speculated, lambda: ai_engine.generate_ai_bubble_response(result['npc']),
+                                            lambda: ai_engine._get_ai_bubble_fallback(result['npc']))
+        else:
+            ai_response = ai_engine.generate_ai_bubble_response(result['npc'])
+    
+    record_ai_opinion(game_state, npc_id, ai_response)
+    result['response'] = ai_response
+    return result
+
+def answer_chat(game_state, npc_id, message):
+    """Free-form chat turn, waiting for the full response"""
+    npc = game_state.get_npc(npc_id)
+    if not npc:
+        return {'error': 'NPC not found'}
+    
+    with session_unlocked(game_state):
+        ai_response = ai_engine.generate_npc_response(
+            npc=npc,
+            conversation_history=game_state.history(npc_id),
+            user_message=message,
+            game_context=game_state.get_compact_status()
+        )
+    record_chat(game_state, npc_id, message, ai_response)
+    return {'response': ai_response, 'npc': npc}
+
+# Game actions that can be sent together to /api/batch: name -> fn(game_state, params)
+GAME_ACTIONS = {
+    'start_conversation': lambda game_state, params: game_state.start_conversation(params.get('npc_id')),
+    'ask_giovanni': lambda game_state, params: answer_ask_giovanni(game_state, params.get('npc_id')),
+    'ask_ai_opinion': lambda game_state, params: answer_ai_opinion(game_state, params.get('npc_id')),
+    'make_argument': lambda game_state, params: game_state.make_argument(params.get('npc_id'), params.get('argument', '')),
+    'chat': lambda game_state, params: answer_chat(game_state, params.get('npc_id'), params.get('message', '')),
+    'available_arguments': lambda game_state, params: game_state.get_available_arguments(),
+    'random_arguments': lambda game_state, params: game_state.get_random_arguments(params.get('count', 3)),
+}
+# Optional parameters of each action and their types
+ACTION_PARAMS = {
+    'start_conversation': {'npc_id': str},
+    'ask_giovanni': {'npc_id': str},
+    'ask_ai_opinion': {'npc_id': str},
+    'make_argument': {'npc_id': str, 'argument': str},
+    'chat': {'npc_id': str, 'message': str},
+    'available_arguments': {},
+    'random_arguments': {'count': int},
+}
+MAX_BATCH_ACTIONS = 10
+
+def is_count(value):
+    """A non-negative int (JSON true/false are not counts)"""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+def check_actions(actions, since=None):
+    """Error message for an invalid list of actions or status version, None if they can run"""
+    if not isinstance(actions, list) or not 0 < len(actions) <= MAX_BATCH_ACTIONS:
+        return f'Send between 1 and {MAX_BATCH_ACTIONS} actions'
+    for params in actions:
+        if not isinstance(params, dict) or params.get('action') not in GAME_ACTIONS:
+            return 'Unknown action'
+        for name, kind in ACTION_PARAMS[params['action']].items():
+            if name in params and not (is_count(params[name]) if kind is int else isinstance(params[name], kind)):
+                return f'Invalid {name} for {params["action"]}'
+    if since is not None and not is_count(since):
+        return 'since must be a status version'
+    return None
+
+def run_actions(game_state, actions):
+    """Apply game actions in order, stopping after the first one that fails"""
+    results = []
+    for params in actions:
+        try:
+            result = GAME_ACTIONS[params['action']](game_state, params)
+        except Exception as e:
+            print(f"Action Error: {e}")
+            result = {'error': 'Action failed'}
+        results.append(result)
+        if isinstance(result, dict) and 'error' in result:
+            break
+    return results
+
+@lru_cache(maxsize=1)
+def npc_catalogue():
+    """Static NPC card data as page-safe JSON, built once per process"""
+    npcs = []
+    for npc_id in NPC_IDS:
+        record = NPC_RECORDS[npc_id]
+        npc = {field: record[field] for field in CARD_FIELDS}
+        npc["avatar"] = image_set(record["avatar_image"])
+        npcs.append(npc)
+    return htmlsafe_json_dumps(npcs, separators=(',', ':'), ensure_ascii=False)
+
+@lru_cache(maxsize=1)
+def new_game_status():
+    """Compact status of a game nobody has played yet, as page-safe JSON"""
+    return htmlsafe_json_dumps(GameState().get_compact_status(), separators=(',', ':'))
+
+def initial_state():
+    """Compact status of the player's game to resume, or None when there is none.
+    
+    Nothing is created or saved here: visitors without a game (bots, link
+    previews, health checks) get new_game_status() and the page creates the
+    game with its first action.
+    """
+    game_state = get_game_state()
+    if game_state is None or game_state.game_won:
+        return None
+    return htmlsafe_json_dumps(game_state.get_compact_status(), separators=(',', ':'))
 
 @app.route('/')
 def index():
     """Main game interface"""
-    return render_template('index.html')
+    if not EMBED_INITIAL_STATE:
+        return render_template('index.html')
+    status = initial_state()
+    response = app.make_response(render_template(
+        'index.html', npc_catalogue=npc_catalogue(), initial_state=status or new_game_status(),
+        new_game=status is None))
+    # The page carries this player's game now
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/api/start_game', methods=['POST'])
 def start_game():
@@ -44,8 +350,8 @@ def start_game():
     
     return jsonify({
         'success': True,
-        'npcs': list(game_state.npcs.values()),
-        'status': game_state.get_game_status()
+        'npcs': game_state.get_npcs(),
+        'status': game_state.get_compact_status()
     })
 
 @app.route('/api/start_conversation/<npc_id>', methods=['POST'])
@@ -67,7 +373,7 @@ def ask_giovanni(npc_id):
     if not game_state:
         return jsonify({'error': 'No active game'}), 400
         
-    result = game_state.ask_about_giovanni(npc_id)
+    result = answer_ask_giovanni(game_state, npc_id)
     save_game_state(game_state)
     
     return jsonify(result)
@@ -79,26 +385,36 @@ def ask_ai_opinion(npc_id):
     if not game_state:
         return jsonify({'error': 'No active game'}), 400
         
+    if not wants_stream():
+        try:
+            result = answer_ai_opinion(game_state, npc_id)
+        except Exception as e:
+            return jsonify({'error': f'AI service error: {str(e)}'}), 500
+        save_game_state(game_state)
+        return jsonify(result)
+    
     result = game_state.ask_ai_bubble_opinion(npc_id)
     
-    # If needs AI response, generate it
+    # If needs AI response, stream it
     if result.get('needs_ai_response'):
-        try:
-            ai_response = ai_engine.generate_ai_bubble_response(result['npc'])
-            
-            # Add to conversation history
-            history = game_state.conversation_history.get(npc_id, [])
-            history.append({
-                "type": "ai_opinion",
-                "response": ai_response
-            })
-            game_state.conversation_history[npc_id] = history
-            
+        del result['needs_ai_response']  # Clean up
+        
+        # The phase change is saved now, so a player who leaves mid-stream can still go on
+        session_id = session['session_id']
+        save_and_unlock(game_state)
+        
+        def on_complete(ai_response):
+            update_game_state(session_id, lambda latest: record_ai_opinion(latest, npc_id, ai_response))
             result['response'] = ai_response
-            del result['needs_ai_response']  # Clean up
+            return result
             
-        except Exception as e:
-            return jsonify({'error': f'AI service error: {str(e)}'}), 500
+        # Use the speculated response started by ask_giovanni, if it matches this prompt
+        speculated = speculator.take(ai_opinion_speculation_key(result['npc']))
+        if speculated:
+            call = lambda: ai_engine.stream_ai_bubble_response(result['npc'])
+            fallback = lambda: ai_engine._get_ai_bubble_fallback(result['npc'])
+            return stream_reply(result_stream(speculated, call, fallback), on_complete)
+        return stream_reply(ai_engine.stream_ai_bubble_response(result['npc']), on_complete)
     
     save_game_state(game_state)
     return jsonify(result)
@@ -133,40 +449,120 @@ def chat_with_npc(npc_id):
         return jsonify({'error': 'NPC not found'}), 404
         
     # Get conversation history for this NPC
-    history = game_state.conversation_history.get(npc_id, [])
+    history = game_state.history(npc_id)
     
-    # Generate AI response
-    try:
-        ai_response = ai_engine.generate_npc_response(
+    if wants_stream():
+        # Nothing changes until the reply is recorded: don't hold the lock while it streams
+        session_id = session['session_id']
+        release_session_lock(None)
+        
+        def on_complete(ai_response):
+            update_game_state(session_id, lambda latest: record_chat(latest, npc_id, message, ai_response))
+            return {'response': ai_response, 'npc': npc}
+            
+        deltas = ai_engine.stream_npc_response(
             npc=npc,
             conversation_history=history,
             user_message=message,
-            game_context=game_state.get_game_status()
+            game_context=game_state.get_compact_status()
         )
-        
-        # Add to conversation history
-        history.append({"type": "user_message", "message": message})
-        history.append({"type": "ai_response", "response": ai_response})
-        game_state.conversation_history[npc_id] = history
-        
+        return stream_reply(deltas, on_complete)
+    
+    # Generate AI response
+    try:
+        result = answer_chat(game_state, npc_id, message)
         save_game_state(game_state)
-        
-        return jsonify({
-            'response': ai_response,
-            'npc': npc
-        })
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': f'AI service error: {str(e)}'}), 500
 
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Apply several game actions under a single session lookup and save.
+    
+    Body: {"actions": [{"action": "make_argument", "npc_id": ..., "argument": ...},
+    {"action": "random_arguments"}], "since": <status version>}. Actions run in
+    order and stop at the first error; the response has one result per action
+    run plus the compact status (only NPCs changed after `since`, if given).
+    """
+    game_state = get_game_state()
+    if not game_state:
+        return jsonify({'error': 'No active game'}), 400
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Send a JSON object'}), 400
+    actions = data.get('actions')
+    error = check_actions(actions, data.get('since'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    results = run_actions(game_state, actions)
+    save_game_state(game_state)
+    
+    return jsonify({
+        'results': results,
+        'status': game_state.get_compact_status(data.get('since'))
+    })
+
 @app.route('/api/game_status')
 def game_status():
-    """Get current game status"""
+    """Get current game status.
+    
+    ?format=compact returns NPC ids plus counters; adding ?since=<version>
+    returns only NPCs changed after that version. Unchanged status answers
+    If-None-Match with 304.
+    """
     game_state = get_game_state()
     if not game_state:
         return jsonify({'error': 'No active game'}), 400
     
-    return jsonify(game_state.get_game_status())
+    compact = request.args.get('format') == 'compact'
+    since = request.args.get('since', type=int)
+    etag = game_state.status_etag('compact' if compact else 'full')
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif compact:
+        response = jsonify(game_state.get_compact_status(since))
+    else:
+        response = jsonify(game_state.get_game_status())
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/ready')
+def ready():
+    """Readiness: pages and game logic are served as soon as the app is imported.
+    
+    `llm` is the worst status of the engines serving this process (under
+    asgi.py, the Flask routes' AIEngine and the native routes'
+    AsyncAIEngine), detailed in `llm_engines`; both share one LLM circuit.
+    `?llm=1` also requires every AI client to be ready and the circuit to
+    be closed (503 otherwise), for load balancers that should only route
+    players to warm workers.
+    """
+    engines = {name: engine.llm_status() for name, engine in llm_engines.items()}
+    status = {
+        'game': 'ready',
+        'scoring': 'ready' if 'scoring' in sys.modules else 'cold',
+        'llm': max(engines.values(), key=LLM_STATUSES.index),
+        'llm_engines': engines,
+        'llm_breaker': llm_guard.breaker.state
+    }
+    errors = [engine.client_error for engine in llm_engines.values() if engine.client_error]
+    if errors:
+        status['llm_error'] = errors[0]
+    if request.args.get('llm') == '1' and status['llm'] != 'ready':
+        return jsonify(status), 503
+    return jsonify(status)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for this process"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/available_arguments')
 def available_arguments():
@@ -0,0 +1,442 @@
+"""ASGI entry point for Giovanni's Jibber Jabber.
+
+The LLM-bound routes (/api/chat and /api/ask_ai_opinion) are served natively
+with AsyncAIEngine, so one process can keep hundreds of conversations waiting
+on the model without pinning a worker each. Every other route is delegated to
+the Flask app through a WSGI adapter.
+
+/ws is a WebSocket carrying a player's game actions over one connection,
+with NPC replies pushed as they are generated. It only exists here; under
+gunicorn the frontend keeps using the REST routes.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 6060
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlparse
+from asgiref.wsgi import WsgiToAsgi
+from ai_engine import AsyncAIEngine, close_async_http_client
+from app import (app, check_actions, game_sessions, llm_engines, record_ai_opinion, record_chat, run_actions,
+                 sse_event, update_game_state)
+from speculation import speculator
+from metrics import HTTP_REQUEST_DURATION, WS_MESSAGE_DURATION
+from scheduler import AdmissionError, current_session
+
+LLM_ROUTE = re.compile(r'^/api/(chat|ask_ai_opinion)/([^/]+)$')
+SOCKET_PATH = '/ws'
+# Socket actions answered natively with streamed replies; the rest go through app.GAME_ACTIONS
+STREAMED_ACTIONS = ('ask_ai_opinion', 'chat')
+
+flask_app = WsgiToAsgi(app)
+async_ai_engine = AsyncAIEngine()
+llm_engines['async'] = async_ai_engine
+
+
+def get_session_id(scope):
+    """Read the game session id from Flask's signed session cookie"""
+    cookie_name = app.config['SESSION_COOKIE_NAME']
+    for name, value in scope.get('headers', []):
+        if name != b'cookie':
+            continue
+        cookie = SimpleCookie()
+        cookie.load(value.decode('latin-1'))
+        if cookie_name not in cookie:
+            continue
+        serializer = app.session_interface.get_signing_serializer(app)
+        try:
+            data = serializer.loads(cookie[cookie_name].value)
+        except Exception:
+            return None
+        return data.get('session_id')
+    return None
+
+
+def wants_stream(scope):
+    """Check whether the client asked for a streamed (Server-Sent Events) reply"""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('stream') == ['1']:
+        return True
+    for name, value in scope.get('headers', []):
+        if name == b'accept' and b'text/event-stream' in value:
+            return True
+    return False
+
+
+async def read_json(receive):
+    """Read and decode a JSON request body"""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    if not body:
+        return {}
+    try:
+        return json.loads(body)
+    except ValueError:
+        return {}
+
+
+async def send_json(send, payload, status=200):
+    """Send a complete JSON response"""
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode())
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_stream(send, deltas, on_complete):
+    """Forward completion deltas as SSE and finish with the payload built from the full text"""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no')
+        ]
+    })
+    parts = []
+    async for delta in deltas:
+        parts.append(delta)
+        await send({
+            'type': 'http.response.body',
+            'body': sse_event('delta', {'text': delta}).encode(),
+            'more_body': True
+        })
+    payload = await asyncio.to_thread(on_complete, ''.join(parts).strip())
+    await send({'type': 'http.response.body', 'body': sse_event('done', payload).encode()})
+
+
+async def future_result(future, call, fallback, timeout=60):
+    """A response computed elsewhere (a speculated call): await call() instead if the
+    scheduler turned that call away, fallback() if it failed or did not finish in time"""
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except AdmissionError:
+        return await call()
+    except Exception as e:
+        print(f"AI Error: {e}")
+        return fallback()
+
+
+async def future_deltas(future, call, fallback, timeout=60):
+    """Async stream of a response computed elsewhere, like future_result; call()
+    returns an async iterator of deltas"""
+    try:
+        text = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except AdmissionError:
+        async for delta in call():
+            yield delta
+        return
+    except Exception as e:
+        print(f"AI Error: {e}")
+        text = fallback()
+    yield text
+
+
+async def send_reply(send, reply, on_complete, stream):
+    """Send a reply started by ai_opinion_reply or chat_reply over HTTP"""
+    if on_complete is None:
+        await send_json(send, reply)
+    elif stream:
+        await send_stream(send, reply, on_complete)
+    else:
+        await send_json(send, await asyncio.to_thread(on_complete, await reply))
+
+
+def ai_opinion_reply(game_state, session_id, npc_id, stream):
+    """Apply ask_ai_opinion and start the NPC's reply.
+
+    Returns (reply, on_complete): reply is an async iterator of deltas when
+    `stream` is set, an awaitable of the full text otherwise; on_complete
+    records the text in the saved game (blocking I/O, run it off the event
+    loop). When the phase check answers without the LLM, reply is the final
+    result and on_complete is None. The caller saves game_state, with its
+    phase change, before sending the reply, and does not hold the session
+    lock while the reply is generated.
+    """
+    result = game_state.ask_ai_bubble_opinion(npc_id)
+
+    if not result.get('needs_ai_response'):
+        return result, None
+    del result['needs_ai_response']
+
+    def on_complete(ai_response):
+        update_game_state(session_id, lambda latest: record_ai_opinion(latest, npc_id, ai_response))
+        result['response'] = ai_response
+        return result
+
+    # Join the call speculatively started by ask_giovanni (on the Flask side), if any
+    speculated = speculator.take((session_id, npc_id, async_ai_engine.ai_bubble_key(result['npc'])))
+
+    if speculated:
+        if stream:
+            call = lambda: async_ai_engine.stream_ai_bubble_response(result['npc'])
+        else:
+            call = lambda: async_ai_engine.generate_ai_bubble_response(result['npc'])
+        fallback = lambda: async_ai_engine._get_ai_bubble_fallback(result['npc'])
+        reply = (future_deltas if stream else future_result)(speculated, call, fallback)
+    elif stream:
+        reply = async_ai_engine.stream_ai_bubble_response(result['npc'])
+    else:
+        reply = async_ai_engine.generate_ai_bubble_response(result['npc'])
+    return reply, on_complete
+
+
+def chat_reply(game_state, session_id, npc, message, stream):
+    """Start the NPC's reply to a chat message; same return value as ai_opinion_reply"""
+    npc_id = npc['id']
+
+    def on_complete(ai_response):
+        update_game_state(session_id, lambda latest: record_chat(latest, npc_id, message, ai_response))
+        return {'response': ai_response, 'npc': npc}
+
+    generate = async_ai_engine.stream_npc_response if stream else async_ai_engine.generate_npc_response
+    reply = generate(
+        npc=npc,
+        conversation_history=game_state.history(npc_id),
+        user_message=message,
+        game_context=game_state.get_compact_status()
+    )
+    return reply, on_complete
+
+
+async def ask_ai_opinion(scope, game_state, session_id, npc_id):
+    """Ask NPC about AI bubble opinion and save the phase change; returns (status, reply, on_complete)"""
+    if npc_id not in game_state.npcs:
+        return 404, {'error': 'NPC not found'}, None
+
+    reply, on_complete = ai_opinion_reply(game_state, session_id, npc_id, wants_stream(scope))
+    await asyncio.to_thread(game_sessions.set, session_id, game_state)
+    return 200, reply, on_complete
+
+
+async def chat_with_npc(scope, receive, game_state, session_id, npc_id):
+    """Free-form chat with NPC using AI; returns (status, reply, on_complete)"""
+    data = await read_json(receive)
+    message = data.get('message', '')
+
+    npc = game_state.get_npc(npc_id)
+    if not npc:
+        return 404, {'error': 'NPC not found'}, None
+
+    reply, on_complete = chat_reply(game_state, session_id, npc, message, wants_stream(scope))
+    return 200, reply, on_complete
+
+
+def same_origin(scope):
+    """Reject cross-site WebSocket handshakes (browsers send the session cookie with them)"""
+    headers = dict(scope.get('headers', []))
+    origin = headers.get(b'origin')
+    if origin is None:
+        return True
+    return urlparse(origin.decode('latin-1')).netloc == headers.get(b'host', b'').decode('latin-1')
+
+
+def locked_action(session_id, params):
+    """Run a game action on the saved game under its session lock and save it (blocking).
+
+    Returns (game_state, result); game_state is None when the session has no game.
+    """
+    with game_sessions.lock(session_id):
+        game_state = game_sessions.get(session_id)
+        if game_state is None:
+            return None, None
+        result = run_actions(game_state, [params])[0]
+        game_sessions.set(session_id, game_state)
+    return game_state, result
+
+
+async def socket_action(send_frame, session_id, params, request_id):
+    """Run one action of a socket message; same return value as locked_action.
+
+    Game logic and session I/O run in worker threads, never on the event
+    loop. LLM replies are pushed as delta frames once the game is saved and
+    the lock released. Raises TimeoutError when the session lock is busy.
+    """
+    action = params['action']
+    if action not in STREAMED_ACTIONS:
+        return await asyncio.to_thread(locked_action, session_id, params)
+
+    game_state = None
+    token = await asyncio.to_thread(game_sessions.acquire_lock, session_id)
+    try:
+        game_state = await asyncio.to_thread(game_sessions.get, session_id)
+        if game_state is None:
+            return None, None
+        npc = game_state.get_npc(params.get('npc_id'))
+        if not npc:
+            return game_state, {'error': 'NPC not found'}
+        if action == 'chat':
+            reply, on_complete = chat_reply(game_state, session_id, npc, params.get('message', ''), stream=True)
+        else:
+            reply, on_complete = ai_opinion_reply(game_state, session_id, npc['id'], stream=True)
+            await asyncio.to_thread(game_sessions.set, session_id, game_state)
+            if on_complete is None:
+                return game_state, reply
+    except Exception as e:
+        print(f"Action Error: {e}")
+        return game_state, {'error': 'Action failed'}
+    finally:
+        await asyncio.to_thread(game_sessions.release_lock, session_id, token)
+
+    try:
+        parts = []
+        async for delta in reply:
+            parts.append(delta)
+            await send_frame({'id': request_id, 'event': 'delta', 'text': delta})
+        return game_state, await asyncio.to_thread(on_complete, ''.join(parts).strip())
+    except Exception as e:
+        print(f"Action Error: {e}")
+        return game_state, {'error': 'Action failed'}
+
+
+async def game_socket(scope, receive, send):
+    """One WebSocket carrying all of a player's game actions.
+
+    Each text frame is a /api/batch body plus an optional `id`:
+    {"id": 1, "actions": [...], "since": <status version>}. NPC replies of
+    ask_ai_opinion and chat are pushed as {"id", "event": "delta", "text"}
+    frames while they are generated, then {"id", "results", "status"} ends
+    the message. Messages are handled in order, one at a time.
+    """
+    await receive()  # websocket.connect
+    session_id = get_session_id(scope)
+    if not same_origin(scope) or not session_id:
+        await send({'type': 'websocket.close', 'code': 4403 if session_id else 4401})
+        return
+    await send({'type': 'websocket.accept'})
+    current_session.set(session_id)
+
+    async def send_frame(payload):
+        await send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    while True:
+        message = await receive()
+        if message['type'] == 'websocket.disconnect':
+            return
+        start = time.perf_counter()
+        try:
+            data = json.loads(message.get('text') or message.get('bytes') or b'')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            await send_frame({'error': 'Send a JSON object'})
+            continue
+        request_id = data.get('id')
+        actions = data.get('actions')
+        error = check_actions(actions, data.get('since'))
+        if error:
+            await send_frame({'id': request_id, 'error': error})
+            WS_MESSAGE_DURATION.observe(time.perf_counter() - start, 'error')
+            continue
+
+        results = []
+        try:
+            for params in actions:
+                game_state, result = await socket_action(send_frame, session_id, params, request_id)
+                if game_state is None:
+                    break
+                results.append(result)
+                if isinstance(result, dict) and 'error' in result:
+                    break
+        except TimeoutError:
+            # Another request held the session lock too long; the socket stays open
+            await send_frame({'id': request_id, 'error': 'Game is busy, try again'})
+            WS_MESSAGE_DURATION.observe(time.perf_counter() - start, 'error')
+            continue
+        if game_state is None:
+            await send_frame({'id': request_id, 'error': 'No active game'})
+            WS_MESSAGE_DURATION.observe(time.perf_counter() - start, 'error')
+            continue
+
+        await send_frame({
+            'id': request_id,
+            'results': results,
+            'status': game_state.get_compact_status(data.get('since'))
+        })
+        WS_MESSAGE_DURATION.observe(time.perf_counter() - start, 'ok')
+
+
+def timed(send, route):
+    """Wrap send to observe the time until the response starts, like the Flask routes"""
+    start = time.perf_counter()
+
+    async def timed_send(message):
+        if message['type'] == 'http.response.start':
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, route, 'POST', str(message['status']))
+        await send(message)
+    return timed_send
+
+
+async def lifespan(receive, send):
+    """Handle server startup/shutdown, releasing the pooled HTTP client"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if os.getenv('LLM_WARMUP', '1') == '1':
+                # Create the API client off the event loop; serving starts right away
+                asyncio.get_running_loop().run_in_executor(None, async_ai_engine.warm_up)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_http_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI application: native async LLM routes and game socket, Flask for everything else"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] == 'websocket':
+        if scope['path'] == SOCKET_PATH:
+            await game_socket(scope, receive, send)
+        else:
+            await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    match = LLM_ROUTE.match(scope.get('path', '')) if scope['type'] == 'http' else None
+    if not match or scope['method'] != 'POST':
+        await flask_app(scope, receive, send)
+        return
+
+    route, npc_id = match.groups()
+    send = timed(send, f'/api/{route}/<npc_id>')
+    session_id = get_session_id(scope)
+    if not session_id:
+        await send_json(send, {'error': 'No active game'}, 400)
+        return
+    current_session.set(session_id)
+
+    # Waiting for another worker's session lock must not block the event loop
+    token = await asyncio.to_thread(game_sessions.acquire_lock, session_id)
+    try:
+        game_state = await asyncio.to_thread(game_sessions.get, session_id)
+        if not game_state:
+            status, reply, on_complete = 400, {'error': 'No active game'}, None
+        elif route == 'chat':
+            status, reply, on_complete = await chat_with_npc(scope, receive, game_state, session_id, npc_id)
+        else:
+            status, reply, on_complete = await ask_ai_opinion(scope, game_state, session_id, npc_id)
+    finally:
+        # The reply is generated and recorded (by on_complete) after the lock is released
+        await asyncio.to_thread(game_sessions.release_lock, session_id, token)
+
+    if status != 200:
+        await send_json(send, reply, status)
+    else:
+        await send_reply(send, reply, on_complete, wants_stream(scope))
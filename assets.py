@@ -0,0 +1,86 @@
+"""Fingerprinted, precompressed static assets.
+
+tools/build_assets.py copies the page's CSS, JS and favicon to static/build/
+under content-hashed names, next to .br/.gz variants of the text files, and
+writes a manifest. asset_url() maps a static path to its fingerprinted URL
+(or the plain one when nothing was built), and send_static() replaces
+Flask's static view:
+
+- fingerprinted files (name.<10 hex digits>.ext, which includes the image
+  variants from tools/build_images.py) are cached for a year as immutable,
+  so repeat visits and reloads request none of them;
+- a prebuilt .br or .gz sibling is sent when the client accepts it;
+- everything else must revalidate and gets 304 when unchanged.
+"""
+import json
+import mimetypes
+import os
+import re
+from typing import Dict, Optional
+
+from flask import Response, request, send_from_directory, url_for
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+BUILD_DIR = os.path.join(STATIC_DIR, 'build')
+MANIFEST_PATH = os.path.join(BUILD_DIR, 'manifest.json')
+MANIFEST_VERSION = 1
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+FINGERPRINTED = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+# Content-Encoding -> file suffix, preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_manifest: Optional[Dict] = None
+
+
+def load_manifest() -> Dict:
+    """Read the build manifest once per process (empty if not built)"""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH, encoding='utf-8') as f:
+                data = json.load(f)
+            _manifest = data.get("assets", {}) if data.get("version") == MANIFEST_VERSION else {}
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(path: str) -> str:
+    """URL of a static file, fingerprinted when it has been built"""
+    built = load_manifest().get(path)
+    if built:
+        return url_for('static', filename='build/' + built)
+    return url_for('static', filename=path)
+
+
+def _precompressed(filename: str) -> Optional[tuple]:
+    """(encoding, suffix) of the best prebuilt variant the client accepts, if any"""
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(STATIC_DIR, filename + suffix)):
+            return encoding, suffix
+    return None
+
+
+def send_static(filename: str) -> Response:
+    """Static file view with immutable caching and precompressed variants"""
+    fingerprinted = FINGERPRINTED.search(filename) is not None
+    max_age = IMMUTABLE_MAX_AGE if fingerprinted else None
+
+    variant = _precompressed(filename) if fingerprinted else None
+    if variant:
+        encoding, suffix = variant
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(STATIC_DIR, filename + suffix, mimetype=mimetype, max_age=max_age)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(STATIC_DIR, filename, max_age=max_age)
+
+    if fingerprinted:
+        if variant or os.path.isfile(os.path.join(STATIC_DIR, filename + '.gz')):
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
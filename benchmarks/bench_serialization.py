@@ -0,0 +1,73 @@
+"""Benchmark GameState serialization: binary snapshot vs JSON vs pickle.
+
+Game states are taken from simulated play at a few stages (fresh game, a
+few NPCs talked to, every NPC convinced after a long chat) and each format
+is measured for encoded size and encode/decode time.
+
+Usage:
+    python benchmarks/bench_serialization.py [--runs 2000]
+"""
+import argparse
+import json
+import os
+import pickle
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from game_logic import GameState
+from npc_data import NPC_IDS
+from tools.simulate import play_reference
+
+CHAT_MESSAGES = [
+    "O que você acha do impacto da IA no seu trabalho?",
+    "Você já usou IA para revisar código?",
+]
+
+
+def build_states():
+    random.seed(1)
+    fresh = GameState()
+
+    some = GameState()
+    for npc_id in NPC_IDS[:3]:
+        play_reference(some, npc_id, max_turns=20, chicoteia=0.5)
+
+    full = GameState()
+    for npc_id in NPC_IDS:
+        play_reference(full, npc_id, max_turns=20, chicoteia=0.5)
+        for i in range(20):
+            history = full.history(npc_id)
+            history.append({"type": "user_message", "message": random.choice(CHAT_MESSAGES)})
+            history.append({"type": "ai_response", "response": f"Resposta {i} do NPC sobre IA e o mercado."})
+    return {"fresh": fresh, "3 NPCs": some, "all NPCs + chat": full}
+
+
+FORMATS = {
+    "to_bytes": (lambda g: g.to_bytes(), GameState.from_bytes),
+    "json(to_dict)": (lambda g: json.dumps(g.to_dict(), separators=(',', ':')).encode(),
+                      lambda data: GameState.from_dict(json.loads(data))),
+    "pickle(to_dict)": (lambda g: pickle.dumps(g.to_dict(), pickle.HIGHEST_PROTOCOL),
+                        lambda data: GameState.from_dict(pickle.loads(data))),
+    "pickle(GameState)": (lambda g: pickle.dumps(g, pickle.HIGHEST_PROTOCOL), pickle.loads),
+}
+
+
+def main(runs: int):
+    for stage, game_state in build_states().items():
+        print(f"\n{stage}")
+        print(f"{'format':<20} {'bytes':>7} {'encode us':>10} {'decode us':>10}")
+        for name, (encode, decode) in FORMATS.items():
+            data = encode(game_state)
+            encode_time = timeit.timeit(lambda: encode(game_state), number=runs) / runs
+            decode_time = timeit.timeit(lambda: decode(data), number=runs) / runs
+            print(f"{name:<20} {len(data):>7} {encode_time * 1e6:>10.1f} {decode_time * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare GameState serialization formats")
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+    main(args.runs)
@@ -0,0 +1,130 @@
+"""Benchmark session backends: plain dict vs MemorySessionStore vs SQLiteSessionStore.
+
+Each operation is one request's worth of session traffic: lock, get, mutate,
+set, unlock. The SQLite store is also measured with several worker processes
+sharing one database file, which is the setup it exists for.
+
+Usage:
+    python benchmarks/bench_session_store.py [--sessions 2000] [--ops 20000] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from game_logic import GameState
+from npc_data import NPC_IDS
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class DictStore:
+    """The original unbounded module-level dict, for comparison"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def get(self, session_id):
+        return self.sessions.get(session_id)
+
+    def set(self, session_id, game_state):
+        self.sessions[session_id] = game_state
+
+    def acquire_lock(self, session_id):
+        return None
+
+    def release_lock(self, session_id, token):
+        pass
+
+
+def one_request(store, session_id, rng):
+    """Simulate one mutating request against a session"""
+    token = store.acquire_lock(session_id)
+    try:
+        game_state = store.get(session_id)
+        npc_id = rng.choice(NPC_IDS)
+        game_state.start_conversation(npc_id)
+        store.set(session_id, game_state)
+    finally:
+        store.release_lock(session_id, token)
+
+
+def run_ops(store, session_ids, ops, seed):
+    """Run ops requests and return per-request latencies in seconds"""
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(ops):
+        start = time.perf_counter()
+        one_request(store, rng.choice(session_ids), rng)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(name, latencies, elapsed):
+    print(f"{name:<28} {len(latencies) / elapsed:>10.0f} req/s"
+          f"   p50 {percentile(latencies, 50) * 1e6:>7.1f}us"
+          f"   p99 {percentile(latencies, 99) * 1e6:>7.1f}us")
+
+
+def bench_single(name, store, session_count, ops):
+    session_ids = [f"session-{i}" for i in range(session_count)]
+    for session_id in session_ids:
+        store.set(session_id, GameState())
+    start = time.perf_counter()
+    latencies = run_ops(store, session_ids, ops, seed=1)
+    report(name, latencies, time.perf_counter() - start)
+
+
+def _worker(path, session_count, ops, seed, queue):
+    store = SQLiteSessionStore(path)
+    session_ids = [f"session-{i}" for i in range(session_count)]
+    queue.put(run_ops(store, session_ids, ops, seed))
+
+
+def bench_sqlite_workers(path, session_count, ops, workers):
+    queue = multiprocessing.Queue()
+    per_worker = ops // workers
+    processes = [
+        multiprocessing.Process(target=_worker, args=(path, session_count, per_worker, seed, queue))
+        for seed in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    latencies = []
+    for _ in processes:
+        latencies.extend(queue.get())
+    for process in processes:
+        process.join()
+    report(f"sqlite x{workers} processes", latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--ops', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    bench_single("dict", DictStore(), args.sessions, args.ops)
+    bench_single("MemorySessionStore", MemorySessionStore(max_entries=args.sessions), args.sessions, args.ops)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sessions.db')
+        store = SQLiteSessionStore(path, max_entries=args.sessions)
+        bench_single("SQLiteSessionStore", store, args.sessions, args.ops)
+        print(f"{'sqlite bytes/session':<28} {store.stats()['approx_bytes'] / args.sessions:>10.0f}")
+        bench_sqlite_workers(path, args.sessions, args.ops, args.workers)
+
+
+if __name__ == '__main__':
+    main()
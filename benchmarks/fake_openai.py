@@ -0,0 +1,184 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions (plain and streamed) with canned NPC
+replies after a configurable latency, and fails a configurable share of
+requests, so the game can be load-tested without an API key or quota.
+Point the app at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake gunicorn app:app
+
+Usage:
+    python benchmarks/fake_openai.py [--port 8099] [--latency lognormal] [--latency-ms 800]
+        [--sigma 0.5] [--token-ms 30] [--error-rate 0.02] [--timeout-rate 0.01]
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLIES = [
+    "Olha, eu vejo muito hype, mas também vejo times entregando coisas reais com IA todo dia.",
+    "Avaliações de bilhões para empresas sem receita? Isso tem cara de bolha pra mim.",
+    "Na minha área a IA já economiza horas por semana. Difícil chamar isso de bolha.",
+    "Interessante esse argumento. Me conta mais, ainda estou um pouco cético.",
+    "Giovanni sempre dizia que era tudo marketing, mas os números estão mudando minha visão.",
+]
+
+
+class LatencyModel:
+    """Time to first token, drawn from a fixed, uniform, exponential or lognormal distribution"""
+
+    def __init__(self, kind: str = "lognormal", median_ms: float = 800, sigma: float = 0.5):
+        self.kind = kind
+        self.median = median_ms / 1000
+        self.sigma = sigma
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.median
+        if self.kind == "uniform":
+            return random.uniform(0, 2 * self.median)
+        if self.kind == "exponential":
+            return random.expovariate(math.log(2) / self.median)
+        return random.lognormvariate(math.log(self.median), self.sigma)
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: LatencyModel, token_ms: float = 30,
+                 error_rate: float = 0.0, timeout_rate: float = 0.0, hang_seconds: float = 60):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.token_delay = token_ms / 1000
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.counts = {"requests": 0, "streamed": 0, "errors": 0, "timeouts": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        server: FakeOpenAI = self.server
+        server.count("requests")
+        roll = random.random()
+        if roll < server.timeout_rate:
+            server.count("timeouts")
+            time.sleep(server.hang_seconds)
+            return
+        time.sleep(server.latency.sample())
+        if roll < server.timeout_rate + server.error_rate:
+            server.count("errors")
+            status, kind = random.choice([(500, "server_error"), (429, "rate_limit_exceeded")])
+            self._send_json(status, {"error": {"message": "Injected failure", "type": kind, "code": kind}})
+            return
+
+        text = random.choice(REPLIES)
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                 "total_tokens": prompt_tokens + len(text) // 4}
+        if body.get("stream"):
+            server.count("streamed")
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            self._stream(body.get("model", "gpt-4o-mini"), text, usage if include_usage else None)
+        else:
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o-mini"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+    def _stream(self, model: str, text: str, usage: dict = None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        words = text.split(' ')
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else ' ' + word}
+            self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            time.sleep(self.server.token_delay)
+        self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if usage:
+            self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _event(self, payload: dict):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(port: int, **options) -> FakeOpenAI:
+    """Start a fake server in a background thread (for use from other scripts)"""
+    server = FakeOpenAI(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for load tests")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', choices=['fixed', 'uniform', 'exponential', 'lognormal'], default='lognormal')
+    parser.add_argument('--latency-ms', type=float, default=800, help="median time to first token")
+    parser.add_argument('--sigma', type=float, default=0.5, help="lognormal shape (tail heaviness)")
+    parser.add_argument('--token-ms', type=float, default=30, help="delay between streamed chunks")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered 500/429")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="share of requests that never answer")
+    args = parser.parse_args()
+
+    server = FakeOpenAI(
+        ('127.0.0.1', args.port),
+        LatencyModel(args.latency, args.latency_ms, args.sigma),
+        token_ms=args.token_ms,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate
+    )
+    print(f"Fake OpenAI API on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(server.counts)
@@ -0,0 +1,253 @@
+"""End-to-end load test: concurrent players running full game sessions.
+
+Each virtual player starts a game and talks to a few random NPCs the way the
+frontend does (start_conversation -> ask_giovanni -> ask_ai_opinion ->
+random_arguments / make_argument and chat, with compact status polls), then
+starts over. Reports throughput and p50/p95/p99 latency per endpoint.
+
+Against a running server (use benchmarks/fake_openai.py as its upstream):
+    python benchmarks/load_test.py --url http://127.0.0.1:6060 --users 50 --duration 60
+
+Or let the script start the fake upstream and the app itself:
+    python benchmarks/load_test.py --spawn gunicorn --workers 4 --users 50 --latency-ms 800
+    python benchmarks/load_test.py --spawn uvicorn --stream --users 200
+
+--json writes the results for comparing runs.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from fake_openai import LatencyModel, serve
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CHAT_MESSAGES = [
+    "O que você acha do impacto da IA no seu trabalho?",
+    "Você já usou IA para revisar código?",
+    "Quanto tempo a IA economiza no seu time?",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Results:
+    """Latencies and errors per endpoint, shared by all players"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.sessions = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+    def summary(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors[endpoint],
+                "rps": len(samples) / elapsed,
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {
+            "elapsed": elapsed,
+            "sessions": self.sessions,
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "rps": total / elapsed,
+            "endpoints": endpoints
+        }
+
+
+class Player:
+    """One browser: its own cookie jar, playing sessions until told to stop"""
+
+    def __init__(self, base_url: str, results: Results, stream: bool, npcs_per_game: int, think: float):
+        self.base_url = base_url.rstrip('/')
+        self.results = results
+        self.stream = stream
+        self.npcs_per_game = npcs_per_game
+        self.think = think
+        self.opener = None
+
+    def request(self, endpoint: str, path: str, payload: Optional[Dict] = None, stream: bool = False) -> Optional[Dict]:
+        """Send a request, record its latency and return the JSON body (None on failure)"""
+        data = json.dumps(payload or {}).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'}
+        if stream:
+            headers['Accept'] = 'text/event-stream'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers,
+                                     method='POST' if data is not None else 'GET')
+        start = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=120) as response:
+                body = response.read()
+            ok = True
+        except (urllib.error.URLError, OSError):
+            body, ok = b'', False
+        self.results.record(endpoint, time.perf_counter() - start, ok)
+        if self.think:
+            time.sleep(random.uniform(0, 2 * self.think))
+        if not ok:
+            return None
+        if stream:
+            return self._last_event(body)
+        return json.loads(body)
+
+    @staticmethod
+    def _last_event(body: bytes) -> Optional[Dict]:
+        """Payload of the final SSE event ('done')"""
+        events = [line[6:] for line in body.decode().splitlines() if line.startswith('data: ')]
+        return json.loads(events[-1]) if events else None
+
+    def play(self):
+        # Every game is a new browser session
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        game = self.request('start_game', '/api/start_game', {})
+        if not game:
+            return
+        npc_ids = [npc['id'] for npc in game['npcs']]
+        for npc_id in random.sample(npc_ids, min(self.npcs_per_game, len(npc_ids))):
+            self.talk_to(npc_id)
+            self.request('game_status', '/api/game_status?format=compact')
+        self.results.session_done()
+
+    def talk_to(self, npc_id: str):
+        self.request('start_conversation', f'/api/start_conversation/{npc_id}', {})
+        result = self.request('ask_giovanni', f'/api/ask_giovanni/{npc_id}', {})
+        if not result or result.get('phase') != 'ai_opinion':
+            return  # Doesn't know Giovanni
+
+        result = self.request('ask_ai_opinion', f'/api/ask_ai_opinion/{npc_id}', {}, stream=self.stream)
+        self.request('chat', f'/api/chat/{npc_id}', {'message': random.choice(CHAT_MESSAGES)}, stream=self.stream)
+        if not result or result.get('phase') != 'argument_phase':
+            return
+
+        for _ in range(6):
+            arguments = self.request('random_arguments', '/api/random_arguments') or [{'text': 'chicoteia'}]
+            result = self.request('make_argument', f'/api/make_argument/{npc_id}',
+                                  {'argument': random.choice(arguments)['text']})
+            if not result or result.get('status') == 'safe' or 'error' in result:
+                return
+
+
+def spawn(kind: str, port: int, workers: int, upstream_port: int) -> subprocess.Popen:
+    """Start the app under gunicorn (WSGI) or uvicorn (ASGI) against the fake upstream"""
+    env = dict(os.environ,
+               OPENAI_BASE_URL=f'http://127.0.0.1:{upstream_port}/v1',
+               OPENAI_API_KEY='fake')
+    if workers > 1:
+        env.setdefault('SESSION_BACKEND', 'sqlite')  # Sessions must be shared between workers
+    if kind == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', '32',
+               '-b', f'127.0.0.1:{port}', 'app:app']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers', str(workers),
+               '--port', str(port), '--log-level', 'warning']
+    # The app prints every upstream error; keep the report readable
+    process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit(f"{kind} did not start on port {port}")
+
+
+def run(base_url: str, users: int, duration: float, stream: bool, npcs_per_game: int, think: float) -> Dict:
+    results = Results()
+    stop = time.monotonic() + duration
+
+    def player_loop():
+        player = Player(base_url, results, stream, npcs_per_game, think)
+        while time.monotonic() < stop:
+            player.play()
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=player_loop, daemon=True) for _ in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results.summary(time.monotonic() - start)
+
+
+def print_summary(summary: Dict):
+    print(f"\n{summary['sessions']} sessions, {summary['requests']} requests, {summary['errors']} errors "
+          f"in {summary['elapsed']:.1f}s ({summary['rps']:.1f} req/s)\n")
+    print(f"{'endpoint':<20} {'requests':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, row in summary['endpoints'].items():
+        print(f"{endpoint:<20} {row['requests']:>8} {row['errors']:>7} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="End-to-end load test of full game sessions")
+    parser.add_argument('--url', default='http://127.0.0.1:6060')
+    parser.add_argument('--users', type=int, default=20, help="concurrent players")
+    parser.add_argument('--duration', type=float, default=30, help="seconds")
+    parser.add_argument('--npcs', type=int, default=3, help="NPCs each player talks to per game")
+    parser.add_argument('--think-ms', type=float, default=0, help="mean pause between requests")
+    parser.add_argument('--stream', action='store_true', help="request SSE replies like the frontend")
+    parser.add_argument('--json', help="write results to this file")
+    spawn_group = parser.add_argument_group('spawned server')
+    spawn_group.add_argument('--spawn', choices=['gunicorn', 'uvicorn'])
+    spawn_group.add_argument('--workers', type=int, default=1)
+    spawn_group.add_argument('--port', type=int, default=6061)
+    spawn_group.add_argument('--upstream-port', type=int, default=8099)
+    spawn_group.add_argument('--latency', choices=['fixed', 'uniform', 'exponential', 'lognormal'], default='lognormal')
+    spawn_group.add_argument('--latency-ms', type=float, default=800)
+    spawn_group.add_argument('--sigma', type=float, default=0.5)
+    spawn_group.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if args.spawn:
+        upstream = serve(args.upstream_port, latency=LatencyModel(args.latency, args.latency_ms, args.sigma),
+                         error_rate=args.error_rate)
+        process = spawn(args.spawn, args.port, args.workers, args.upstream_port)
+        url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        summary = run(url, args.users, args.duration, args.stream, args.npcs, args.think_ms / 1000)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    if args.spawn:
+        summary["upstream"] = upstream.counts
+        print(f"upstream: {upstream.counts}")
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
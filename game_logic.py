@@ -1,34 +1,225 @@
 import random
-from typing import Dict, List, Optional
-from npc_data import NPCS, ARGUMENTS
+import struct
+import uuid
+from typing import Dict, List, Optional, Tuple
+from npc_data import NPC_RECORDS, NPC_IDS, ARGUMENTS
+from images import image_set
+from history import ConversationHistory
+from snapshot import SnapshotReader, SnapshotWriter
+
+# Chance of the magic word, as listed in the argument catalogue
+CHICOTEIA_RATE = next(arg["success_rate"] for arg in ARGUMENTS if arg["text"] == "chicoteia")
+
+# Snapshot sections (see snapshot.py); changing the layout of one bumps snapshot.FORMAT_VERSION
+SECTION_GAME, SECTION_NPCS, SECTION_HISTORY = 1, 2, 3
+# Format 1 NPC records: id, status, phase (string refs), resistance, version, chicoteia_used,
+# number of arguments used, followed by one 16-bit ref per argument. Format 2 writes varints,
+# which have no upper bound.
+NPC_LAYOUT_V1 = struct.Struct("<HHHBIBH")
+
+_argument_scorer = None
+
+
+def get_argument_scorer():
+    """The argument scorer, imported on first use: NumPy and the index cost ~150 ms at startup"""
+    global _argument_scorer
+    if _argument_scorer is None:
+        from scoring import argument_scorer
+        _argument_scorer = argument_scorer
+    return _argument_scorer
+
+class NPCState:
+    """Mutable per-game state of an NPC (static fields are shared in NPC_RECORDS)"""
+    __slots__ = ("status", "conversation_phase", "resistance_level", "arguments_used", "chicoteia_used", "version")
+    
+    def __init__(self, resistance_level: int):
+        self.status = "unknown"  # unknown, safe, needs_convincing
+        self.conversation_phase = "initial"  # initial, giovanni_check, ai_opinion, argument_phase, safe
+        self.resistance_level = resistance_level
+        self.arguments_used = ()  # Catalogue arguments that were matched, in order
+        self.chicoteia_used = False
+        self.version = 0  # GameState.version of the last change to this NPC
 
 class GameState:
     def __init__(self):
-        self.npcs = {npc["id"]: self._init_npc(npc) for npc in NPCS}
+        self.npcs = {npc_id: NPCState(NPC_RECORDS[npc_id]["resistance_level"]) for npc_id in NPC_IDS}
         self.current_npc = None
-        self.conversation_history = {}
+        self.conversation_history: Dict[str, ConversationHistory] = {}
         self.game_won = False
+        self.game_id = uuid.uuid4().hex[:12]
+        self.version = 0  # Bumped on every NPC state change
         
-    def _init_npc(self, npc_data: Dict) -> Dict:
-        """Initialize NPC with game state"""
-        npc = npc_data.copy()
-        npc["status"] = "unknown"  # unknown, safe, needs_convincing
-        npc["arguments_used"] = []
-        npc["chicoteia_used"] = False
-        npc["conversation_phase"] = "initial"  # initial, giovanni_check, ai_opinion, argument_phase, safe
-        return npc
+    def to_dict(self) -> Dict:
+        """Serialize mutable game state; static NPC data is referenced by id"""
+        return {
+            "game_id": self.game_id,
+            "version": self.version,
+            "current_npc": self.current_npc,
+            "game_won": self.game_won,
+            "npcs": [
+                [npc_id, npc.status, npc.conversation_phase, npc.resistance_level,
+                 list(npc.arguments_used), npc.chicoteia_used, npc.version]
+                for npc_id, npc in self.npcs.items()
+            ],
+            "conversation_history": {
+                npc_id: history.to_dict() for npc_id, history in self.conversation_history.items()
+            }
+        }
+        
+    @classmethod
+    def from_dict(cls, data: Dict) -> "GameState":
+        """Rebuild game state serialized with to_dict"""
+        game_state = cls()
+        game_state.game_id = data["game_id"]
+        game_state.version = data["version"]
+        game_state.current_npc = data["current_npc"]
+        game_state.game_won = data["game_won"]
+        for npc_id, status, phase, resistance, arguments_used, chicoteia_used, version in data["npcs"]:
+            npc = game_state.npcs.get(npc_id)
+            if npc is None:
+                continue  # NPC no longer exists in npc_data
+            npc.status = status
+            npc.conversation_phase = phase
+            npc.resistance_level = resistance
+            npc.arguments_used = tuple(arguments_used)
+            npc.chicoteia_used = chicoteia_used
+            npc.version = version
+        game_state.conversation_history = {
+            npc_id: ConversationHistory.from_dict(history)
+            for npc_id, history in data["conversation_history"].items()
+        }
+        return game_state
+        
+    def replace_with(self, other: "GameState"):
+        """Take over the state of another copy of this game (e.g. the latest saved one)"""
+        self.npcs = other.npcs
+        self.current_npc = other.current_npc
+        self.conversation_history = other.conversation_history
+        self.game_won = other.game_won
+        self.game_id = other.game_id
+        self.version = other.version
+        
+    def history(self, npc_id: str) -> ConversationHistory:
+        """Conversation history with an NPC, created on first use"""
+        history = self.conversation_history.get(npc_id)
+        if history is None:
+            history = self.conversation_history[npc_id] = ConversationHistory()
+        return history
+        
+    def to_bytes(self) -> bytes:
+        """Serialize mutable game state to a compact, versioned binary snapshot"""
+        writer = SnapshotWriter()
+        
+        def write_game(w):
+            w.string(self.game_id)
+            w.varint(self.version)
+            w.string(self.current_npc)
+            w.flags(self.game_won)
+            
+        def write_npcs(w):
+            w.varint(len(self.npcs))
+            for npc_id, npc in self.npcs.items():
+                w.string(npc_id)
+                w.string(npc.status)
+                w.string(npc.conversation_phase)
+                w.varint(npc.resistance_level)
+                w.varint(npc.version)
+                w.flags(npc.chicoteia_used)
+                w.varint(len(npc.arguments_used))
+                for argument in npc.arguments_used:
+                    w.string(argument)
+                    
+        def write_history(w):
+            w.varint(len(self.conversation_history))
+            for npc_id, history in self.conversation_history.items():
+                w.string(npc_id)
+                w.string(history.summary)
+                w.varint(len(history))
+                for entry in history:
+                    w.record(entry)
+                    
+        writer.section(SECTION_GAME, write_game)
+        writer.section(SECTION_NPCS, write_npcs)
+        writer.section(SECTION_HISTORY, write_history)
+        return writer.to_bytes()
+        
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GameState":
+        """Rebuild game state from a to_bytes snapshot (raises ValueError for foreign or newer data)"""
+        reader = SnapshotReader(data)
+        game_state = cls()
+        if reader.open(SECTION_GAME):
+            game_state.game_id = reader.string()
+            game_state.version = reader.varint()
+            game_state.current_npc = reader.string()
+            game_state.game_won, = reader.flags(1)
+        if reader.open(SECTION_NPCS):
+            read_npc = cls._read_npc if reader.version >= 2 else cls._read_npc_v1
+            for _ in range(reader.varint()):
+                npc_id, status, phase, resistance, version, chicoteia_used, arguments_used = read_npc(reader)
+                npc = game_state.npcs.get(npc_id)
+                if npc is None:
+                    continue  # NPC no longer exists in npc_data
+                npc.status = status
+                npc.conversation_phase = phase
+                npc.resistance_level = resistance
+                npc.arguments_used = arguments_used
+                npc.chicoteia_used = bool(chicoteia_used)
+                npc.version = version
+        if reader.open(SECTION_HISTORY):
+            for _ in range(reader.varint()):
+                npc_id = reader.string()
+                summary = reader.string()
+                entries = [reader.record() for _ in range(reader.varint())]
+                game_state.conversation_history[npc_id] = ConversationHistory(entries, summary)
+        return game_state
+        
+    @staticmethod
+    def _read_npc(reader: SnapshotReader) -> Tuple:
+        npc_id, status, phase = reader.string(), reader.string(), reader.string()
+        resistance, version = reader.varint(), reader.varint()
+        chicoteia_used, = reader.flags(1)
+        arguments_used = tuple(reader.string() for _ in range(reader.varint()))
+        return npc_id, status, phase, resistance, version, chicoteia_used, arguments_used
+        
+    @staticmethod
+    def _read_npc_v1(reader: SnapshotReader) -> Tuple:
+        npc_ref, status_ref, phase_ref, resistance, version, chicoteia_used, argument_count = \
+            reader.unpack(NPC_LAYOUT_V1)
+        npc_id, status, phase = reader.strings((npc_ref, status_ref, phase_ref))
+        arguments_used = reader.strings(reader.unpack(struct.Struct(f"<{argument_count}H"))) \
+            if argument_count else ()
+        return npc_id, status, phase, resistance, version, chicoteia_used, arguments_used
+        
+    def _mark_changed(self, npc: NPCState):
+        """Record that an NPC's state changed, for ETags and delta status"""
+        self.version += 1
+        npc.version = self.version
         
     def get_npc(self, npc_id: str) -> Optional[Dict]:
-        """Get NPC by ID"""
-        return self.npcs.get(npc_id)
+        """Get NPC by ID, assembled from shared static data and per-game state"""
+        state = self.npcs.get(npc_id)
+        if state is None:
+            return None
+        npc = dict(NPC_RECORDS[npc_id])
+        npc["status"] = state.status
+        npc["conversation_phase"] = state.conversation_phase
+        npc["resistance_level"] = state.resistance_level
+        npc["arguments_used"] = list(state.arguments_used)
+        npc["chicoteia_used"] = state.chicoteia_used
+        npc["avatar"] = image_set(npc["avatar_image"])
+        return npc
+        
+    def get_npcs(self) -> List[Dict]:
+        """Get all NPCs as API dicts"""
+        return [self.get_npc(npc_id) for npc_id in self.npcs]
         
     def start_conversation(self, npc_id: str) -> Dict:
         """Start conversation with an NPC"""
         self.current_npc = npc_id
-        npc = self.npcs[npc_id]
+        npc = self.get_npc(npc_id)
         
-        if npc_id not in self.conversation_history:
-            self.conversation_history[npc_id] = []
+        self.history(npc_id)
             
         return {
             "npc": npc,
@@ -49,93 +240,113 @@ class GameState:
     def ask_about_giovanni(self, npc_id: str) -> Dict:
         """Ask NPC if they know Giovanni"""
         npc = self.npcs[npc_id]
+        record = NPC_RECORDS[npc_id]
         
-        if npc["knows_giovanni"]:
-            npc["conversation_phase"] = "ai_opinion"
-            npc["status"] = "needs_convincing"
+        if record["knows_giovanni"]:
+            npc.conversation_phase = "ai_opinion"
+            npc.status = "needs_convincing"
             # Use the specific relationship context
-            response = f"Sim, conheço Giovanni! {npc['giovanni_relationship']} Por que pergunta?"
+            response = f"Sim, conheço Giovanni! {record['giovanni_relationship']} Por que pergunta?"
         else:
-            npc["conversation_phase"] = "safe"
-            npc["status"] = "safe"
-            response = npc['giovanni_relationship']  # Use the specific "don't know" response
+            npc.conversation_phase = "safe"
+            npc.status = "safe"
+            response = record['giovanni_relationship']  # Use the specific "don't know" response
+            
+        self._mark_changed(npc)
             
-        self.conversation_history[npc_id].append({
+        self.history(npc_id).append({
             "type": "giovanni_question",
             "response": response
         })
         
         return {
             "response": response,
-            "phase": npc["conversation_phase"],
-            "status": npc["status"]
+            "phase": npc.conversation_phase,
+            "status": npc.status
         }
         
     def ask_ai_bubble_opinion(self, npc_id: str) -> Dict:
         """Ask NPC about AI bubble opinion - now with AI-generated responses"""
         npc = self.npcs[npc_id]
         
-        if npc["conversation_phase"] != "ai_opinion":
+        if npc.conversation_phase != "ai_opinion":
             return {"error": "Not in correct conversation phase"}
             
-        # Mark as needing AI generation
-        npc["needs_ai_response"] = True
-        
-        if npc["ai_bubble_stance"] == "bubble":
-            npc["conversation_phase"] = "argument_phase"
-        else:
-            npc["conversation_phase"] = "safe"
-            npc["status"] = "safe"
+        npc.conversation_phase, npc.status = self._ai_opinion_outcome(npc_id)
+        self._mark_changed(npc)
             
+        # Mark as needing AI generation
         return {
             "needs_ai_response": True,
-            "phase": npc["conversation_phase"],
-            "status": npc["status"],
-            "npc": npc
+            "phase": npc.conversation_phase,
+            "status": npc.status,
+            "npc": self.get_npc(npc_id)
         }
         
+    def _ai_opinion_outcome(self, npc_id: str):
+        """Phase and status an NPC moves to once asked about the AI bubble"""
+        if NPC_RECORDS[npc_id]["ai_bubble_stance"] == "bubble":
+            return "argument_phase", self.npcs[npc_id].status
+        return "safe", "safe"
+        
+    def preview_ai_bubble_opinion(self, npc_id: str) -> Optional[Dict]:
+        """Get the NPC dict ask_ai_bubble_opinion would pass to the AI, without changing state"""
+        npc = self.get_npc(npc_id)
+        if not npc or npc["conversation_phase"] != "ai_opinion":
+            return None
+        npc["conversation_phase"], npc["status"] = self._ai_opinion_outcome(npc_id)
+        return npc
+        
     def make_argument(self, npc_id: str, argument_text: str) -> Dict:
         """Make an argument to convince NPC"""
         npc = self.npcs[npc_id]
         
-        if npc["conversation_phase"] != "argument_phase":
+        if npc.conversation_phase != "argument_phase":
             return {"error": "Not in argument phase"}
             
         # Check if it's the special "chicoteia" argument
         if argument_text.lower() == "chicoteia":
-            if npc["chicoteia_used"]:
+            if npc.chicoteia_used:
                     return {
                         "response": "Você já tentou essa palavra mágica comigo!",
                         "success": False,
-                        "phase": npc["conversation_phase"]
+                        "phase": npc.conversation_phase
                     }
                 
-            npc["chicoteia_used"] = True
-            success = random.random() < 0.5  # 50% chance
+            npc.chicoteia_used = True
+            success = random.random() < CHICOTEIA_RATE
             
             if success:
-                npc["conversation_phase"] = "safe"
-                npc["status"] = "safe"
+                npc.conversation_phase = "safe"
+                npc.status = "safe"
                 response = "Chicoteia... espera, isso é... sabe de uma coisa? Você está absolutamente certo! IA não é bolha nenhuma!"
             else:
                 response = "Chicoteia? Interessante, mas ainda não estou convencido de que IA não está supervalorizada."
         else:
-            # Regular argument
-            npc["arguments_used"].append(argument_text)
+            # Regular argument, scored locally against the catalogue and the NPC profile
+            scored = get_argument_scorer().evaluate(npc_id, argument_text, npc.resistance_level, used=npc.arguments_used)
+            # Keep each matched catalogue argument once (gibberish matches nothing), so this
+            # stays as small as the catalogue however long the session runs
+            matched = scored["argument"]
+            if matched and scored["chance"] > 0 and matched not in npc.arguments_used:
+                npc.arguments_used += (matched,)
             
-            # Reduce resistance
-            npc["resistance_level"] = max(0, npc["resistance_level"] - 1)
+            # Reduce resistance when the argument lands
+            if random.random() < scored["chance"]:
+                npc.resistance_level = max(0, npc.resistance_level - 1)
             
-            if npc["resistance_level"] <= 0:
-                npc["conversation_phase"] = "safe"
-                npc["status"] = "safe"
+            if npc.resistance_level <= 0:
+                npc.conversation_phase = "safe"
+                npc.status = "safe"
                 success = True
                 response = f"Sabe de uma coisa, esse é um ponto muito bom. Você mudou minha opinião sobre isso!"
             else:
                 success = False
                 response = f"Interessante, mas ainda não estou totalmente convencido..."
+            
+        self._mark_changed(npc)
                 
-        self.conversation_history[npc_id].append({
+        self.history(npc_id).append({
             "type": "argument",
             "argument": argument_text,
             "response": response,
@@ -148,20 +359,21 @@ class GameState:
         return {
             "response": response,
             "success": success,
-            "phase": npc["conversation_phase"],
-            "status": npc["status"]
+            "phase": npc.conversation_phase,
+            "status": npc.status
         }
         
     def _check_win_condition(self):
         """Check if all NPCs are safe"""
-        safe_count = sum(1 for npc in self.npcs.values() if npc["status"] == "safe")
+        safe_count = sum(1 for npc in self.npcs.values() if npc.status == "safe")
         self.game_won = safe_count == len(self.npcs)
         
     def get_game_status(self) -> Dict:
         """Get current game status"""
-        safe_npcs = [npc for npc in self.npcs.values() if npc["status"] == "safe"]
-        needs_convincing = [npc for npc in self.npcs.values() if npc["status"] == "needs_convincing"]
-        unknown = [npc for npc in self.npcs.values() if npc["status"] == "unknown"]
+        npcs = self.get_npcs()
+        safe_npcs = [npc for npc in npcs if npc["status"] == "safe"]
+        needs_convincing = [npc for npc in npcs if npc["status"] == "needs_convincing"]
+        unknown = [npc for npc in npcs if npc["status"] == "unknown"]
         
         return {
             "game_won": self.game_won,
@@ -172,6 +384,37 @@ class GameState:
             "unknown": unknown
         }
         
+    def get_compact_status(self, since: Optional[int] = None) -> Dict:
+        """Get game status with NPC ids and counters only.
+        
+        When `since` is given, only NPCs changed after that version are included.
+        """
+        npcs = {}
+        safe_count = 0
+        for npc_id, npc in self.npcs.items():
+            if npc.status == "safe":
+                safe_count += 1
+            if since is not None and npc.version <= since:
+                continue
+            npcs[npc_id] = {
+                "status": npc.status,
+                "phase": npc.conversation_phase,
+                "resistance_level": npc.resistance_level
+            }
+            
+        return {
+            "version": self.version,
+            "game_won": self.game_won,
+            "safe_count": safe_count,
+            "total_npcs": len(self.npcs),
+            "npcs": npcs,
+            "delta": since is not None
+        }
+        
+    def status_etag(self, fmt: str = "full") -> str:
+        """Get an ETag identifying the current status version"""
+        return f"{self.game_id}-{self.version}-{fmt}"
+        
     def get_available_arguments(self) -> List[Dict]:
         """Get list of available arguments"""
         return ARGUMENTS.copy()
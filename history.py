@@ -0,0 +1,85 @@
+"""Bounded per-NPC conversation history.
+
+Each NPC keeps its last HISTORY_SIZE entries verbatim in a ring; entries
+pushed out of the ring are folded into a short running summary instead of
+being kept forever. The summary is itself capped at SUMMARY_MAX_CHARS,
+dropping its oldest lines first, so memory per session and tokens per chat
+request stay constant however long a player keeps talking.
+
+Summarizing is done locally from the entry type, without an extra LLM call.
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, Optional
+
+# Entries kept verbatim per NPC (3 chat exchanges)
+HISTORY_SIZE = 6
+SUMMARY_MAX_CHARS = 600
+QUOTE_MAX_CHARS = 80
+
+
+def _quote(text: str) -> str:
+    text = " ".join(str(text).split())
+    if len(text) > QUOTE_MAX_CHARS:
+        text = text[:QUOTE_MAX_CHARS - 3].rstrip() + "..."
+    return f'"{text}"'
+
+
+def summarize_entry(entry: Dict) -> Optional[str]:
+    """One summary line for a history entry, written to the NPC"""
+    kind = entry.get("type")
+    if kind == "giovanni_question":
+        return "O jogador perguntou se você conhece Giovanni."
+    if kind == "ai_opinion":
+        return f"Você deu sua opinião sobre a bolha de IA: {_quote(entry['response'])}"
+    if kind == "argument":
+        outcome = "e você se convenceu" if entry.get("success") else "e você não se convenceu"
+        return f"O jogador argumentou {_quote(entry['argument'])} {outcome}."
+    if kind == "user_message":
+        return f"O jogador disse: {_quote(entry['message'])}"
+    if kind == "ai_response":
+        return f"Você respondeu: {_quote(entry['response'])}"
+    return None
+
+
+class ConversationHistory:
+    """Recent entries of one conversation plus a summary of everything older"""
+
+    __slots__ = ("entries", "summary")
+
+    def __init__(self, entries: Iterable[Dict] = (), summary: str = ""):
+        self.entries = deque(maxlen=HISTORY_SIZE)
+        self.summary = summary
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry: Dict):
+        """Add an entry, folding the oldest one into the summary when the ring is full"""
+        if len(self.entries) == HISTORY_SIZE:
+            self._fold(self.entries[0])
+        self.entries.append(entry)
+
+    def _fold(self, entry: Dict):
+        line = summarize_entry(entry)
+        if line is None:
+            return
+        lines = self.summary.split("\n") if self.summary else []
+        lines.append(line)
+        while len(lines) > 1 and sum(len(l) + 1 for l in lines) > SUMMARY_MAX_CHARS:
+            lines.pop(0)
+        self.summary = "\n".join(lines)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def to_dict(self) -> Dict:
+        return {"entries": list(self.entries), "summary": self.summary}
+
+    @classmethod
+    def from_dict(cls, data) -> "ConversationHistory":
+        """Rebuild from to_dict, or from a plain entry list saved before histories were bounded"""
+        if isinstance(data, list):
+            return cls(data)
+        return cls(data["entries"], data["summary"])
@@ -0,0 +1,66 @@
+"""Responsive image URLs.
+
+tools/build_images.py writes resized AVIF/WebP/JPEG variants with
+content-hashed names plus a manifest to static/images/build/. When the
+manifest exists, image_set() describes those variants for <picture> and
+srcset; otherwise it points at the original image so the game still works
+without the build step.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Optional
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images')
+BUILD_DIR = os.path.join(IMAGES_DIR, 'build')
+MANIFEST_PATH = os.path.join(BUILD_DIR, 'manifest.json')
+IMAGES_URL = '/static/images/'
+BUILD_URL = IMAGES_URL + 'build/'
+MANIFEST_VERSION = 1
+
+# Modern formats offered as <source> elements, best first; JPEG stays on the <img>
+SOURCE_TYPES = (("avif", "image/avif"), ("webp", "image/webp"))
+
+_manifest: Optional[Dict] = None
+
+
+def load_manifest() -> Dict:
+    """Read the build manifest once per process (empty if not built)"""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH, encoding='utf-8') as f:
+                data = json.load(f)
+            _manifest = data.get("images", {}) if data.get("version") == MANIFEST_VERSION else {}
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def _srcset(variants) -> str:
+    return ", ".join(f"{BUILD_URL}{filename} {width}w" for width, filename in variants)
+
+
+@lru_cache(maxsize=None)
+def image_set(path: str) -> Dict:
+    """Describe an image under static/images for a <picture> element.
+
+    Returns {"src", "srcset", "sizes", "sources": [{"type", "srcset"}]};
+    srcset, sizes and sources are empty when no variants were built. The
+    dict is shared, do not modify it.
+    """
+    entry = load_manifest().get(path)
+    if not entry:
+        return {"src": IMAGES_URL + path, "srcset": "", "sizes": "", "sources": []}
+
+    variants = entry["variants"]
+    fallback = variants.get("jpg", [])
+    return {
+        "src": BUILD_URL + fallback[-1][1] if fallback else IMAGES_URL + path,
+        "srcset": _srcset(fallback),
+        "sizes": f"{entry['size']}px",
+        "sources": [
+            {"type": mime, "srcset": _srcset(variants[fmt])}
+            for fmt, mime in SOURCE_TYPES if variants.get(fmt)
+        ]
+    }
@@ -0,0 +1,218 @@
+"""Prometheus metrics served at /metrics.
+
+A few in-process counters and histograms, rendered in the Prometheus text
+format together with the stats() of the session store, LLM guard,
+single-flight, bubble cache and speculator, which are read at scrape time.
+Recording is a tuple lookup and an addition under a lock, cheap enough for
+every request and every LLM call.
+
+Fallback rate per kind is
+    sum by (kind) (rate(chicoteia_fallback_responses_total[5m]))
+      / sum by (kind) (rate(chicoteia_npc_responses_total[5m]))
+
+Metrics are per process: with several gunicorn workers each scrape reaches
+one of them, so scrape workers individually (or run one per container) when
+exact numbers matter.
+"""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; LLM calls sit at the top end, everything else at the bottom
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        names = self.labels + ("le",)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics plus component stats collected at scrape time"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._stats: List[Tuple[str, Callable[[], Dict], Tuple[str, ...]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix: str, stats: Callable[[], Dict], counters: Iterable[str] = ()):
+        """Expose the numeric fields of stats() as `<prefix>_<field>`.
+
+        Fields named in `counters` are exported as counters (`_total`),
+        other numbers as gauges, nested dicts are flattened and string
+        fields become a labelled gauge set to 1 (e.g. breaker state).
+        """
+        self._stats.append((prefix, stats, tuple(counters)))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for prefix, stats, counters in self._stats:
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"Metrics Error: {prefix}: {e}")
+                continue
+            lines.extend(self._render_stats(prefix, values, counters))
+        return "\n".join(lines) + "\n"
+
+    def _render_stats(self, prefix: str, values: Dict, counters: Tuple[str, ...]) -> List[str]:
+        lines = []
+        for field, value in values.items():
+            name = f"{prefix}_{field}"
+            if isinstance(value, dict):
+                lines.extend(self._render_stats(name, value, counters))
+            elif isinstance(value, str):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{_format_labels((field,), (value,))} 1")
+            elif isinstance(value, (int, float)):
+                if field in counters:
+                    lines.append(f"# TYPE {name}_total counter")
+                    lines.append(f"{name}_total {_format_value(value)}")
+                else:
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {_format_value(value)}")
+        return lines
+
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "chicoteia_http_request_duration_seconds",
+    "Time to produce the response (headers, for streamed replies) by route",
+    ("route", "method", "status")
+)
+LLM_REQUEST_DURATION = registry.histogram(
+    "chicoteia_llm_request_duration_seconds",
+    "Duration of each upstream LLM attempt, including retries and hedges",
+    ("mode", "outcome")
+)
+LLM_FIRST_TOKEN = registry.histogram(
+    "chicoteia_llm_time_to_first_token_seconds",
+    "Time until the first streamed delta arrived from the LLM"
+)
+LLM_TOKENS = registry.counter(
+    "chicoteia_llm_tokens_total",
+    "Tokens billed by the LLM API",
+    ("npc", "phase", "type")
+)
+LLM_QUEUE_WAIT = registry.histogram(
+    "chicoteia_llm_queue_wait_seconds",
+    "Time LLM calls waited for a scheduler slot (admitted calls only)"
+)
+WS_MESSAGE_DURATION = registry.histogram(
+    "chicoteia_ws_message_duration_seconds",
+    "Time to answer each WebSocket message, until its results frame was sent",
+    ("outcome",)
+)
+NPC_RESPONSES = registry.counter(
+    "chicoteia_npc_responses_total",
+    "NPC replies by kind and where they came from (llm, local, template, cache, fallback)",
+    ("kind", "source")
+)
+FALLBACK_RESPONSES = registry.counter(
+    "chicoteia_fallback_responses_total",
+    "Canned replies sent because the LLM failed or the circuit was open",
+    ("kind",)
+)
+
+
+def record_llm_call(mode: str, seconds: float, ok: bool, npc: Optional[Dict] = None, usage=None):
+    """Record one upstream attempt and the tokens it used"""
+    LLM_REQUEST_DURATION.observe(seconds, mode, "success" if ok else "error")
+    if usage is None:
+        return
+    npc_id = npc.get("id", "unknown") if npc else "unknown"
+    phase = npc.get("conversation_phase", "unknown") if npc else "unknown"
+    LLM_TOKENS.inc(npc_id, phase, "prompt", amount=usage.prompt_tokens)
+    LLM_TOKENS.inc(npc_id, phase, "completion", amount=usage.completion_tokens)
+
+
+def record_response(kind: str, source: str):
+    """Count an NPC reply; fallbacks are also counted on their own"""
+    NPC_RESPONSES.inc(kind, source)
+    if source == "fallback":
+        FALLBACK_RESPONSES.inc(kind)
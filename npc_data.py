@@ -1,4 +1,5 @@
 # Dados dos NPCs para o jogo Giovanni's Jibber Jabber
+from types import MappingProxyType
 
 NPCS = [
     {
@@ -11,6 +12,7 @@ NPCS = [
         "ai_bubble_stance": "bubble",
         "resistance_level": 2,  # Quantos argumentos necessários para convencer
         "avatar_color": "#FF6B6B",
+        "avatar_image": "avatars/alexandre.jpg",
         "bio": "5 anos construindo SPAs, atualmente obcecado por Next.js"
     },
     {
@@ -23,6 +25,7 @@ NPCS = [
         "ai_bubble_stance": "bubble", 
         "resistance_level": 3,
         "avatar_color": "#4ECDC4",
+        "avatar_image": "avatars/maria.jpg",
         "bio": "10 anos em backend, especialista Django, defensor de microsserviços"
     },
     {
@@ -35,6 +38,7 @@ NPCS = [
         "ai_bubble_stance": "not_bubble",
         "resistance_level": 0,
         "avatar_color": "#45B7D1",
+        "avatar_image": "avatars/david.jpg",
         "bio": "Mago do Kubernetes, certificado AWS, obcecado por automação"
     },
     {
@@ -47,6 +51,7 @@ NPCS = [
         "ai_bubble_stance": "bubble",
         "resistance_level": 2,
         "avatar_color": "#96CEB4",
+        "avatar_image": "avatars/sarah.jpg",
         "bio": "Ex-consultora, agora liderando estratégia de produto para B2B SaaS"
     },
     {
@@ -59,6 +64,7 @@ NPCS = [
         "ai_bubble_stance": "not_bubble", 
         "resistance_level": 0,
         "avatar_color": "#FFEAA7",
+        "avatar_image": "avatars/tom.jpg",
         "bio": "Especialista em design systems, defensor da acessibilidade, nerd de pesquisa com usuários"
     },
     {
@@ -71,6 +77,7 @@ NPCS = [
         "ai_bubble_stance": "bubble",
         "resistance_level": 3,
         "avatar_color": "#DDA0DD",
+        "avatar_image": "avatars/lisa.jpg",
         "bio": "PhD em ML, construindo sistemas de recomendação e modelos NLP"
     },
     {
@@ -83,6 +90,7 @@ NPCS = [
         "ai_bubble_stance": "bubble",
         "resistance_level": 4,
         "avatar_color": "#FF7675",
+        "avatar_image": "avatars/miguel.jpg",
         "bio": "Especialista em testes de invasão, defensor de arquitetura zero-trust"
     },
     {
@@ -95,6 +103,7 @@ NPCS = [
         "ai_bubble_stance": "not_bubble",
         "resistance_level": 0,
         "avatar_color": "#74B9FF", 
+        "avatar_image": "avatars/jennifer.jpg",
         "bio": "Empreendedora serial, 2 exits, atualmente construindo startup fintech"
     },
     {
@@ -107,6 +116,7 @@ NPCS = [
         "ai_bubble_stance": "bubble",
         "resistance_level": 2,
         "avatar_color": "#A29BFE",
+        "avatar_image": "avatars/roberto.jpg",
         "bio": "15 anos em tech, liderou equipes em 3 unicornios, especialista em arquitetura"
     },
     {
@@ -119,6 +129,7 @@ NPCS = [
         "ai_bubble_stance": "bubble",
         "resistance_level": 3,
         "avatar_color": "#FD79A8",
+        "avatar_image": "avatars/ana.jpg",
         "bio": "Especialista em testes de automação, caçadora de bugs, obcecada por qualidade"
     }
 ]
@@ -240,3 +251,7 @@ ARGUMENTS = [
         "special": False
     }
 ]
+
+# Registros imutáveis compartilhados por todas as sessões do processo, indexados por id
+NPC_RECORDS = {npc["id"]: MappingProxyType(npc) for npc in NPCS}
+NPC_IDS = tuple(NPC_RECORDS)
@@ -0,0 +1,217 @@
+"""Precompiled NPC prompts.
+
+System prompts are compiled once per (NPC, phase, status) at import time
+instead of being rebuilt from f-strings on every turn. They are laid out so
+that everything that never changes for an NPC comes first:
+
+    [persona + game rules]  per NPC, byte-identical across all its prompts
+    [AI stance]             per status
+    [current context]       per phase
+    [resistance line]       argument phase only, appended per request
+
+so upstream prompt-prefix caching can reuse the shared part between turns
+and between the chat, opinion and custom prompts of the same NPC.
+
+Print token counts per combination with:
+    python prompts.py
+"""
+from typing import Dict, List, Optional, Tuple
+from npc_data import NPCS
+
+PHASES = ("initial", "giovanni_check", "ai_opinion", "argument_phase", "safe")
+STATUSES = ("unknown", "needs_convincing", "safe")
+
+# Minimum prompt length for OpenAI's automatic prompt caching to apply
+PROVIDER_CACHE_MIN_TOKENS = 1024
+
+STANCE_CONVINCED = "Você foi convencido de que IA não é uma bolha e está criando valor real. Seja otimista sobre o futuro da IA."
+STANCE_BUBBLE = "Você acredita que o mercado de IA está numa bolha especulativa. Seja cético sobre as avaliações e hype da IA, mas não seja hostil."
+STANCE_NOT_BUBBLE = "Você acredita que IA não é uma bolha e está criando valor real. Seja otimista sobre o potencial da IA."
+
+
+def stance_description(status: str, ai_stance: str) -> str:
+    """Get AI stance description for an NPC"""
+    if status == 'safe':
+        return STANCE_CONVINCED
+    elif ai_stance == 'bubble':
+        return STANCE_BUBBLE
+    else:
+        return STANCE_NOT_BUBBLE
+
+
+def persona_prefix(npc: Dict) -> str:
+    """Stable, NPC-specific start shared by all of the NPC's prompts"""
+    return f"""Você é {npc['name']}, um(a) {npc['role']} numa conferência de tecnologia.
+
+PERSONALIDADE: {npc['personality']}
+BACKGROUND: {npc['bio']}
+
+REGRAS IMPORTANTES DO JOGO:
+- Você está numa conferência de tecnologia para desenvolvedores backend e frontend
+- Mantenha-se no personagem {npc['name']} o tempo todo
+- Mantenha respostas com no máximo 40 palavras - seja conciso!
+- Não quebre a quarta parede ou mencione que isso é um jogo
+- RESPONDA SEMPRE EM PORTUGUÊS BRASILEIRO
+- Suas opiniões sobre IA devem ser consistentes com sua posição declarada abaixo
+
+POSIÇÃO SOBRE IA: """
+
+
+def phase_context(npc: Dict, phase: str) -> str:
+    """Conversation-phase specific instructions (without the resistance count)"""
+    if phase == 'initial':
+        lines = ["Esta é sua primeira interação com esta pessoa", "Seja amigável e profissional"]
+    elif phase == 'giovanni_check':
+        if npc['knows_giovanni']:
+            lines = ["Você conhece Giovanni e já trabalhou com ele antes",
+                     "Você deve ficar curioso sobre por que estão perguntando sobre Giovanni"]
+        else:
+            lines = ["Você não conhece ninguém chamado Giovanni",
+                     "Você deve expressar que não reconhece o nome"]
+    elif phase == 'ai_opinion':
+        lines = [f"Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', 'Você conhece Giovanni.')}"]
+        if npc['ai_bubble_stance'] == 'bubble':
+            lines += ["Você acredita que o mercado de IA está numa bolha",
+                      "Expresse ceticismo sobre as avaliações e hype da IA",
+                      "Referencie sua experiência com Giovanni se relevante",
+                      "Seja específico sobre por que acha que é uma bolha"]
+        else:
+            lines += ["Você acredita que IA não é bolha mas está criando valor real",
+                      "Seja otimista sobre o potencial da IA",
+                      "Referencie sua experiência positiva com Giovanni se relevante",
+                      "Dê exemplos específicos de valor real da IA"]
+    elif phase == 'argument_phase':
+        lines = ["Você atualmente acha que IA é uma bolha",
+                 "Você está aberto a ouvir argumentos mas um pouco cético"]
+    elif phase == 'safe':
+        lines = ["Você foi convencido de que IA não é uma bolha",
+                 "Seja positivo sobre a conversa e o futuro da IA"]
+    else:
+        lines = []
+    return "\n\nCONTEXTO ATUAL:\n" + "\n".join(f"- {line}" for line in lines)
+
+
+def history_summary(summary: str) -> str:
+    """Summary of the older turns of a conversation, sent after the system prompt"""
+    return "RESUMO DA CONVERSA ATÉ AQUI:\n" + summary
+
+
+def resistance_line(resistance_level: int) -> str:
+    """Only per-request part of a system prompt, kept at the very end"""
+    return f"\n- Você precisa de {resistance_level} argumentos bons a mais para mudar de opinião"
+
+
+class PromptLibrary:
+    """System prompts for every NPC, compiled once per process"""
+
+    def __init__(self, npcs: List[Dict] = NPCS):
+        self._prefixes: Dict[str, str] = {}
+        self._system: Dict[Tuple[str, str, str], str] = {}
+        self._bubble: Dict[Tuple[str, str], List[Dict]] = {}
+        for npc in npcs:
+            self._prefixes[npc['id']] = persona_prefix(npc)
+            for status in STATUSES:
+                for phase in PHASES:
+                    self._system[(npc['id'], phase, status)] = self._compile_system(npc, phase, status)
+                self._bubble[(npc['id'], status)] = self._compile_bubble(npc, status)
+
+    def _compile_system(self, npc: Dict, phase: str, status: str) -> str:
+        prefix = self._prefixes.get(npc['id']) or persona_prefix(npc)
+        return prefix + stance_description(status, npc['ai_bubble_stance']) + phase_context(npc, phase)
+
+    def _compile_bubble(self, npc: Dict, status: str) -> List[Dict]:
+        prefix = self._prefixes.get(npc['id']) or persona_prefix(npc)
+        system_prompt = (prefix + stance_description(status, npc['ai_bubble_stance'])
+                         + "\n\nResponda naturalmente e conversacionalmente em português brasileiro.")
+
+        if npc['ai_bubble_stance'] == 'bubble':
+            belief = "Você acredita que É uma bolha. Seja específico mas muito breve."
+        else:
+            belief = "Você acredita que NÃO é uma bolha. Dê exemplos breves de valor real da IA."
+        prompt = (f"Como {npc['name']}, dê sua opinião sobre se o mercado de IA é uma bolha.\n"
+                  f"Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', '')}\n"
+                  f"{belief}\n"
+                  f"Mantenha sob 40 palavras e permaneça no personagem como {npc['role']}.")
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    def system_prompt(self, npc: Dict) -> str:
+        """System prompt for an NPC in its current phase and status"""
+        phase = npc.get('conversation_phase', 'initial')
+        status = npc.get('status', 'unknown')
+        prompt = self._system.get((npc['id'], phase, status))
+        if prompt is None:
+            prompt = self._compile_system(npc, phase, status)
+        if phase == 'argument_phase':
+            prompt += resistance_line(npc.get('resistance_level', 1))
+        return prompt
+
+    def ai_bubble_messages(self, npc: Dict) -> List[Dict]:
+        """Messages asking an NPC for their AI bubble opinion"""
+        status = npc.get('status', 'unknown')
+        messages = self._bubble.get((npc['id'], status))
+        if messages is None:
+            messages = self._compile_bubble(npc, status)
+        # Callers may append to the list; never hand out the shared one
+        return list(messages)
+
+    def custom_system_prompt(self, npc: Dict) -> str:
+        """System prompt for custom game scenario prompts"""
+        prefix = self._prefixes.get(npc['id']) or persona_prefix(npc)
+        relationship = npc.get('giovanni_relationship', 'Você pode ou não conhecer Giovanni.')
+        return (prefix + stance_description(npc.get('status', 'unknown'), npc.get('ai_bubble_stance', 'bubble'))
+                + f"\n\nSeu relacionamento com Giovanni: {relationship}"
+                + "\n\nResponda no personagem, mantendo sob 40 palavras em português brasileiro.")
+
+    def report(self) -> List[Dict]:
+        """Token counts for every precompiled combination"""
+        rows = []
+        for (npc_id, phase, status), prompt in self._system.items():
+            rows.append({
+                "npc_id": npc_id,
+                "phase": phase,
+                "status": status,
+                "tokens": count_tokens(prompt),
+                "shared_prefix_tokens": count_tokens(self._prefixes[npc_id])
+            })
+        return rows
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate (~4 chars per token)"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text))
+
+
+_encodings: Dict[str, Optional[object]] = {}
+
+
+def _get_encoding(model: str):
+    if model not in _encodings:
+        try:
+            import tiktoken
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except Exception:
+            _encodings[model] = None
+    return _encodings[model]
+
+
+prompt_library = PromptLibrary()
+
+
+if __name__ == '__main__':
+    rows = prompt_library.report()
+    exact = _get_encoding("gpt-4o-mini") is not None
+    print(f"Token counts ({'tiktoken' if exact else 'estimated, install tiktoken for exact counts'})")
+    print(f"{'npc':<16} {'phase':<16} {'status':<18} {'tokens':>6} {'prefix':>6}")
+    for row in rows:
+        print(f"{row['npc_id']:<16} {row['phase']:<16} {row['status']:<18} "
+              f"{row['tokens']:>6} {row['shared_prefix_tokens']:>6}")
+    longest = max(row['tokens'] for row in rows)
+    if longest < PROVIDER_CACHE_MIN_TOKENS:
+        print(f"\nNote: prompts are below the {PROVIDER_CACHE_MIN_TOKENS}-token minimum for upstream "
+              f"prompt caching (longest: {longest}); the stable prefix only pays off if they grow.")
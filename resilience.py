@@ -0,0 +1,324 @@
+"""Bounded-latency upstream calls: deadlines, retries with jitter, hedging and a circuit breaker.
+
+AIEngine and AsyncAIEngine send every full completion through `llm_guard`:
+
+- each call has an overall deadline (LLM_DEADLINE) and each attempt a timeout
+  (LLM_TIMEOUT), so a slow upstream cannot hold a worker indefinitely;
+- failed attempts are retried (LLM_RETRIES) after an exponential backoff with
+  jitter, while time remains;
+- if an attempt has not answered after the LLM_HEDGE_PERCENTILE latency of
+  recent calls, a second identical request is sent and the first answer wins;
+- after LLM_BREAKER_FAILURES consecutive failed calls the breaker opens and
+  calls fail instantly (callers use their fallback responses) until a trial
+  call succeeds LLM_BREAKER_RESET seconds later; a trial that neither
+  succeeds nor fails within LLM_BREAKER_TRIAL_TIMEOUT seconds (a cancelled
+  or abandoned call) lets another trial through.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after a cool-down"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, trial_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout
+        self.state = "closed"  # closed, open, half_open
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._opens = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Check whether a call may go upstream now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            # A trial that never reported back must not block the breaker for good
+            if self._trial_in_flight and now - self._trial_started >= self.trial_timeout:
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_started = now
+                return True
+            return False
+
+    def release(self):
+        """Give back a trial call that ended without an outcome (cancelled or abandoned)"""
+        with self._lock:
+            if self.state == "half_open":
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    self._opens += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self._failures, "opens": self._opens}
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency at the given percentile, or None until enough samples exist"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def is_timeout(error: Exception) -> bool:
+    """Whether an exception is a timeout (ours, asyncio's or the OpenAI client's)"""
+    return isinstance(error, (TimeoutError, asyncio.TimeoutError)) or 'Timeout' in type(error).__name__
+
+
+class UpstreamGuard:
+    """Runs upstream attempts under a deadline with retries, hedging and a circuit breaker"""
+
+    def __init__(self, deadline: float = 12.0, attempt_timeout: float = 8.0, retries: int = 1,
+                 backoff: float = 0.2, hedge_percentile: float = 95,
+                 breaker: Optional[CircuitBreaker] = None, latency: Optional[LatencyTracker] = None):
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency or LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='llm-hedge')
+        self._counts = {
+            "calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "errors": 0,
+            "retries": 0, "hedges": 0, "hedge_wins": 0, "short_circuits": 0
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "UpstreamGuard":
+        """Build a guard configured through environment variables"""
+        return cls(
+            deadline=float(os.getenv('LLM_DEADLINE', '12')),
+            attempt_timeout=float(os.getenv('LLM_TIMEOUT', '8')),
+            retries=int(os.getenv('LLM_RETRIES', '1')),
+            hedge_percentile=float(os.getenv('LLM_HEDGE_PERCENTILE', '95')),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', '5')),
+                reset_timeout=float(os.getenv('LLM_BREAKER_RESET', '30')),
+                trial_timeout=float(os.getenv('LLM_BREAKER_TRIAL_TIMEOUT', '60'))
+            )
+        )
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long to wait before hedging, or None when hedging is off or not calibrated"""
+        if not self.hedge_percentile:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def _backoff(self, retry: int, deadline: float) -> float:
+        """Exponential backoff with full jitter, never past the deadline"""
+        delay = self.backoff * (2 ** retry) * random.uniform(0.5, 1.5)
+        return max(0.0, min(delay, deadline - time.monotonic()))
+
+    def _record_error(self, error: Exception):
+        self.count("timeouts" if is_timeout(error) else "errors")
+
+    def call(self, attempt: Callable[[float], T]) -> T:
+        """Run attempt(timeout) until it succeeds or the deadline passes"""
+        self.count("calls")
+        if not self.breaker.allow():
+            self.count("short_circuits")
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        settled = False
+        try:
+            deadline = time.monotonic() + self.deadline
+            last_error: Exception = TimeoutError("LLM deadline exceeded")
+            for retry in range(self.retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                start = time.monotonic()
+                try:
+                    result = self._hedged(attempt, min(self.attempt_timeout, remaining))
+                except Exception as e:
+                    last_error = e
+                    self._record_error(e)
+                    if retry < self.retries:
+                        self.count("retries")
+                        time.sleep(self._backoff(retry, deadline))
+                    continue
+
+                self.latency.add(time.monotonic() - start)
+                self.breaker.record_success()
+                settled = True
+                self.count("successes")
+                return result
+
+            self.breaker.record_failure()
+            settled = True
+            self.count("failures")
+            raise last_error
+        finally:
+            if not settled:
+                self.breaker.release()
+
+    def _hedged(self, attempt: Callable[[float], T], timeout: float) -> T:
+        """Run one attempt, sending a second identical one if the first is slow"""
+        hedge_after = self.hedge_delay()
+        if hedge_after is None or hedge_after >= timeout:
+            return attempt(timeout)
+
+        primary = self._executor.submit(attempt, timeout)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self.count("hedges")
+        hedge = self._executor.submit(attempt, timeout - hedge_after)
+        pending = {primary, hedge}
+        end = time.monotonic() + timeout - hedge_after
+        error: Exception = TimeoutError("LLM attempt timed out")
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break  # Abandoned attempts finish on their own client timeout
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def acall(self, attempt: Callable[[float], Awaitable[T]]) -> T:
+        """Async counterpart of call()"""
+        self.count("calls")
+        if not self.breaker.allow():
+            self.count("short_circuits")
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        loop = asyncio.get_running_loop()
+        settled = False
+        try:
+            deadline = time.monotonic() + self.deadline
+            last_error: Exception = TimeoutError("LLM deadline exceeded")
+            for retry in range(self.retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                start = loop.time()
+                try:
+                    result = await self._ahedged(attempt, min(self.attempt_timeout, remaining))
+                except Exception as e:
+                    last_error = e
+                    self._record_error(e)
+                    if retry < self.retries:
+                        self.count("retries")
+                        await asyncio.sleep(self._backoff(retry, deadline))
+                    continue
+
+                self.latency.add(loop.time() - start)
+                self.breaker.record_success()
+                settled = True
+                self.count("successes")
+                return result
+
+            self.breaker.record_failure()
+            settled = True
+            self.count("failures")
+            raise last_error
+        finally:
+            # Cancelled callers (client disconnects) must still give back a breaker trial
+            if not settled:
+                self.breaker.release()
+
+    async def _ahedged(self, attempt: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        """Async hedged attempt; the losing request is cancelled"""
+        hedge_after = self.hedge_delay()
+        primary = asyncio.ensure_future(attempt(timeout))
+        tasks = {primary}
+        try:
+            if hedge_after is not None and hedge_after < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    self.count("hedges")
+                    tasks.add(asyncio.ensure_future(attempt(timeout - hedge_after)))
+                    timeout -= hedge_after
+
+            end = asyncio.get_running_loop().time() + timeout
+            error: Exception = TimeoutError("LLM attempt timed out")
+            pending = set(tasks)
+            while pending:
+                remaining = max(0.0, end - asyncio.get_running_loop().time())
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counts)
+        stats["breaker"] = self.breaker.stats()
+        stats["latency_p50"] = self.latency.percentile(50)
+        stats["latency_p95"] = self.latency.percentile(95)
+        return stats
+
+
+# Shared by AIEngine and AsyncAIEngine: both talk to the same upstream
+llm_guard = UpstreamGuard.from_env()
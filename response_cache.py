@@ -0,0 +1,175 @@
+"""Cache of AI bubble opinions.
+
+The opinion prompt depends only on static NPC fields (name, role,
+personality, bio, relationship, stance), so every player asking the same NPC
+gets an interchangeable answer. The cache keeps several varied responses per
+prompt, serves one at random and asks the caller to generate a new variant in
+the background while it has fewer than the target number or the oldest one is
+stale.
+
+Pre-warm a cache file (one LLM call per variant) with:
+    python response_cache.py warm bubble_cache.json --variants 5
+and point BUBBLE_CACHE_FILE at it to load it at startup.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+CACHE_FILE_VERSION = 1
+
+
+def prompt_key(messages: List[Dict]) -> str:
+    """Key a cached response on the exact prompt sent to the model"""
+    payload = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Keeps up to `variants` responses per prompt key, served at random"""
+
+    def __init__(self, variants: int = 5, max_age: float = 3600):
+        self.variants = variants
+        self.max_age = max_age
+        # key -> deque of (response, created_at), oldest first
+        self._entries: Dict[str, deque] = {}
+        self._labels: Dict[str, str] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._refreshes = 0
+
+    def get(self, key: str) -> Tuple[Optional[str], bool]:
+        """Get a random cached response and whether the caller should generate another variant.
+
+        Only one caller at a time is asked to refresh a given key; it must
+        report back with add() or refresh_failed().
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                self._misses += 1
+                return None, False
+
+            self._hits += 1
+            response = random.choice(entry)[0]
+            stale = now - entry[0][1] > self.max_age
+            if (len(entry) < self.variants or stale) and key not in self._refreshing:
+                self._refreshing.add(key)
+                self._refreshes += 1
+                return response, True
+            return response, False
+
+    def add(self, key: str, response: str, label: Optional[str] = None):
+        """Store a new variant, dropping the oldest beyond the limit"""
+        with self._lock:
+            entry = self._entries.setdefault(key, deque(maxlen=self.variants))
+            entry.append((response, time.time()))
+            if label:
+                self._labels[key] = label
+            self._refreshing.discard(key)
+
+    def refresh_failed(self, key: str):
+        """Allow another refresh after a failed background generation"""
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "keys": len(self._entries),
+                "responses": sum(len(entry) for entry in self._entries.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "refreshes": self._refreshes
+            }
+
+    def load(self, path: str) -> int:
+        """Pre-warm from a cache file; returns the number of responses loaded"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != CACHE_FILE_VERSION:
+            return 0
+
+        loaded = 0
+        for item in data.get("entries", []):
+            for response in item["responses"]:
+                # Loaded variants count as fresh so startup does not trigger refreshes
+                self.add(item["key"], response, label=item.get("label"))
+                loaded += 1
+        return loaded
+
+    def save(self, path: str):
+        """Write all cached responses to a cache file"""
+        with self._lock:
+            entries = [
+                {
+                    "key": key,
+                    "label": self._labels.get(key),
+                    "responses": [response for response, _ in entry]
+                }
+                for key, entry in self._entries.items()
+            ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"version": CACHE_FILE_VERSION, "entries": entries}, f, ensure_ascii=False, indent=2)
+
+
+# Process-wide cache shared by AIEngine and AsyncAIEngine
+bubble_cache = ResponseCache(
+    variants=int(os.getenv('BUBBLE_CACHE_VARIANTS', '5')),
+    max_age=float(os.getenv('BUBBLE_CACHE_MAX_AGE', '3600'))
+)
+
+
+def load_bubble_cache():
+    """Pre-warm the shared cache from BUBBLE_CACHE_FILE, if configured"""
+    path = os.getenv('BUBBLE_CACHE_FILE')
+    if path and os.path.exists(path):
+        loaded = bubble_cache.load(path)
+        print(f"Loaded {loaded} cached AI bubble opinions from {path}")
+
+
+def warm(path: str, variants: int):
+    """Generate `variants` opinions for every NPC that reaches the opinion phase"""
+    from ai_engine import AIEngine
+    from game_logic import GameState
+
+    engine = AIEngine()
+    cache = ResponseCache(variants=variants)
+    game_state = GameState()
+    for npc_id in game_state.npcs:
+        game_state.start_conversation(npc_id)
+        game_state.ask_about_giovanni(npc_id)
+        result = game_state.ask_ai_bubble_opinion(npc_id)
+        if 'npc' not in result:
+            continue  # Doesn't know Giovanni, never asked for an opinion
+
+        messages = engine._build_ai_bubble_messages(result['npc'])
+        key = prompt_key(messages)
+        for _ in range(variants):
+            response = engine._request_completion(messages, temperature=0.7)
+            cache.add(key, response, label=npc_id)
+        print(f"{npc_id}: {variants} responses")
+    cache.save(path)
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="AI bubble opinion cache tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    warm_parser = subparsers.add_parser('warm', help="Generate a pre-warm cache file")
+    warm_parser.add_argument('path')
+    warm_parser.add_argument('--variants', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'warm':
+        warm(args.path, args.variants)
@@ -0,0 +1,227 @@
+"""Tiered routing of NPC chat replies: canned template, small local model, remote LLM.
+
+Every free-form chat turn is routed before anything is sent upstream:
+
+- template: short small talk (greetings, thanks, goodbyes, "ok", laughter)
+  gets a canned line in the NPC's voice, with a nudge back to the game
+  depending on the phase; no model is called;
+- local: a small model behind an OpenAI-compatible endpoint
+  (LOCAL_LLM_BASE_URL, e.g. llama.cpp, Ollama or vLLM) answers messages up to
+  ROUTER_LOCAL_MAX_CHARS and any message to an NPC that is already
+  convinced; while the remote LLM's p95 latency is over
+  ROUTER_LATENCY_BUDGET seconds it takes messages four times as long, and
+  while the remote circuit is open it takes everything;
+- remote: gpt-4o-mini answers everything else, and whatever the local model
+  failed to answer.
+
+The local model has its own circuit breaker: failed replies and replies
+slower than the latency budget count as failures, and after a few in a row
+the local tier is skipped until a trial call succeeds. Without
+LOCAL_LLM_BASE_URL there is no local tier.
+
+ask_about_giovanni and make_argument are already templated in game_logic,
+and AI opinions are served from bubble_cache, so only chat goes through the
+router. Compare tiers offline with tools/eval_router.py.
+"""
+import os
+import random
+import re
+import threading
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+from resilience import CircuitBreaker, LatencyTracker, llm_guard
+
+TIERS = ("template", "local", "remote")
+
+# Longer messages carry content a canned line cannot answer
+TEMPLATE_MAX_CHARS = 40
+# How much longer the messages sent to the local model get while the remote LLM is slow
+SLOW_REMOTE_FACTOR = 4
+
+# Phrases (lowercase, without accents or punctuation) a small-talk message is made of
+SMALL_TALK = {
+    "greeting": (
+        r"oi+", r"ola+", r"e ai", r"opa", r"hey", r"hello", r"hi", r"bom dia", r"boa tarde", r"boa noite",
+        r"tudo (bem|bom|certo|joia)", r"como (vai|voce esta|vai voce)", r"e voce", r"prazer"
+    ),
+    "thanks": (r"(muito )?obrigad[oa]( mesmo)?", r"brigad[oa]", r"valeu", r"vlw", r"thanks"),
+    "goodbye": (r"tchau", r"ate (mais|logo|a proxima)", r"falou", r"flw", r"bye", r"adeus", r"fui"),
+    "ack": (
+        r"ok", r"okay", r"blz", r"beleza", r"certo", r"entendi", r"legal", r"show", r"top", r"massa",
+        r"sim", r"hm+", r"ah+", r"sei", r"verdade", r"pois e", r"faz sentido", r"interessante"
+    ),
+    "laugh": (r"k+", r"(ha)+h?", r"(he)+", r"(hu)+", r"(rs)+", r"lol"),
+}
+SMALL_TALK_PATTERNS = {
+    intent: re.compile(r"(?:(?:%s)\s*)+" % "|".join(phrases))
+    for intent, phrases in SMALL_TALK.items()
+}
+
+TEMPLATES = {
+    "greeting": (
+        "Oi! Tudo ótimo por aqui, a conferência está bem animada.",
+        "Olá! Tudo bem sim, e com você?",
+        "E aí! Tudo certo, curtindo as palestras.",
+    ),
+    "thanks": (
+        "Imagina! Foi bom conversar.",
+        "De nada! Qualquer coisa, estou por aqui.",
+        "Eu que agradeço pela conversa!",
+    ),
+    "goodbye": (
+        "Até mais! Aproveite a conferência.",
+        "Tchau! Foi um prazer conversar.",
+        "Falou! Nos vemos no coffee break.",
+    ),
+    "ack": (
+        "Pois é.",
+        "Entendi.",
+        "Faz sentido.",
+    ),
+    "laugh": (
+        "Haha! Boa.",
+        "Kkk, essa foi boa.",
+        "Haha, verdade!",
+    ),
+}
+
+# Added to the canned line so small talk still moves the game forward
+FOLLOW_UPS = {
+    "needs_convincing": " Mas continuo achando que IA é uma bolha. Me convença do contrário!",
+    "safe": " E obrigado(a) de novo: você me mostrou que IA está criando valor de verdade.",
+    "default": " Sobre o que você quer conversar?",
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse spaces"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+class ResponseRouter:
+    """Chooses the tier that answers a chat turn and keeps per-tier latency and counts"""
+
+    def __init__(self, enabled: bool = True, latency_budget: float = 2.5, local_max_chars: int = 80,
+                 local_base_url: Optional[str] = None, local_model: str = "llama3.2",
+                 local_api_key: str = "local", local_timeout: float = 3.0,
+                 local_breaker: Optional[CircuitBreaker] = None):
+        self.enabled = enabled
+        self.latency_budget = latency_budget
+        self.local_max_chars = local_max_chars
+        self.local_base_url = local_base_url
+        self.local_model = local_model
+        self.local_api_key = local_api_key
+        self.local_timeout = local_timeout
+        self.local_breaker = local_breaker or CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+        self.local_latency = LatencyTracker()
+        self._counts = {"template": 0, "local": 0, "remote": 0, "local_errors": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResponseRouter":
+        """Build a router configured through environment variables"""
+        return cls(
+            enabled=os.getenv('ROUTER_ENABLED', '1') == '1',
+            latency_budget=float(os.getenv('ROUTER_LATENCY_BUDGET', '2.5')),
+            local_max_chars=int(os.getenv('ROUTER_LOCAL_MAX_CHARS', '80')),
+            local_base_url=os.getenv('LOCAL_LLM_BASE_URL') or None,
+            local_model=os.getenv('LOCAL_LLM_MODEL', 'llama3.2'),
+            local_api_key=os.getenv('LOCAL_LLM_API_KEY', 'local'),
+            local_timeout=float(os.getenv('LOCAL_LLM_TIMEOUT', '3'))
+        )
+
+    @property
+    def has_local(self) -> bool:
+        return self.local_base_url is not None
+
+    def match_template(self, message: str, npc: Optional[Dict] = None) -> Optional[str]:
+        """Small-talk intent of a short message ("oi", "valeu Maria!"), or None"""
+        if len(message) > TEMPLATE_MAX_CHARS:
+            return None
+        text = normalize(message)
+        if npc:
+            first_name = normalize(npc["name"]).split()[0]
+            text = " ".join(word for word in text.split() if word != first_name)
+        if not text:
+            return None
+        for intent, pattern in SMALL_TALK_PATTERNS.items():
+            if pattern.fullmatch(text):
+                return intent
+        return None
+
+    def _wants_local(self, npc: Dict, message: str) -> bool:
+        if llm_guard.breaker.state != "closed" or npc.get("status") == "safe":
+            return True
+        remote_p95 = llm_guard.latency.percentile(95)
+        limit = self.local_max_chars
+        if remote_p95 is not None and remote_p95 > self.latency_budget:
+            limit *= SLOW_REMOTE_FACTOR
+        return len(message.strip()) <= limit
+
+    def choose(self, npc: Dict, message: str) -> Tuple[str, Optional[str]]:
+        """(tier, small-talk intent) for a chat turn, without counting it"""
+        if not self.enabled:
+            return "remote", None
+        intent = self.match_template(message, npc)
+        if intent:
+            return "template", intent
+        # Ask the breaker last: letting a trial call through commits to making it
+        if self.has_local and self._wants_local(npc, message) and self.local_breaker.allow():
+            return "local", None
+        return "remote", None
+
+    def route(self, npc: Dict, message: str) -> Tuple[str, Optional[str]]:
+        """Choose the tier for a chat turn and count it; local turns are counted by
+        record_local, once it is known whether the local model or the remote LLM answered"""
+        tier, intent = self.choose(npc, message)
+        if tier != "local":
+            self.count(tier)
+        return tier, intent
+
+    def template_reply(self, npc: Dict, intent: str) -> str:
+        """Canned reply for a small-talk intent, with a nudge that depends on the NPC's state"""
+        reply = random.choice(TEMPLATES[intent])
+        if npc.get("status") == "safe":
+            follow_up = FOLLOW_UPS["safe"]
+        elif npc.get("conversation_phase") == "argument_phase" and intent != "goodbye":
+            follow_up = FOLLOW_UPS["needs_convincing"]
+        elif intent in ("ack", "laugh"):
+            follow_up = FOLLOW_UPS["default"]
+        else:
+            follow_up = ""
+        return reply + follow_up
+
+    def record_local(self, ok: bool, seconds: float):
+        """Feed back a local model attempt; failures and replies over budget trip its breaker.
+
+        A failed attempt is answered by the remote LLM and counted as a remote turn.
+        """
+        if ok:
+            self.count("local")
+            self.local_latency.add(seconds)
+        else:
+            self.count("local_errors")
+            self.count("remote")
+        if ok and seconds <= self.latency_budget:
+            self.local_breaker.record_success()
+        else:
+            self.local_breaker.record_failure()
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counts)
+        stats["local_breaker"] = self.local_breaker.stats()
+        stats["local_latency_p50"] = self.local_latency.percentile(50)
+        stats["local_latency_p95"] = self.local_latency.percentile(95)
+        return stats
+
+
+# Shared by AIEngine and AsyncAIEngine
+response_router = ResponseRouter.from_env()
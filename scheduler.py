@@ -0,0 +1,269 @@
+"""Admission control and fair scheduling of LLM calls.
+
+Every upstream LLM call takes a slot from `llm_scheduler` first:
+
+- at most LLM_MAX_CONCURRENT calls run at once per process;
+- each session has a token bucket (LLM_SESSION_BURST calls, refilled at
+  LLM_SESSION_RATE per second); a session that runs out is rejected at once
+  instead of queueing behind everyone else;
+- when all slots are busy, callers wait in a queue per session and freed
+  slots go round-robin across sessions, so one player with many requests in
+  flight cannot push the others back;
+- a caller still queued after LLM_QUEUE_TIMEOUT seconds gives up;
+- speculative calls (made ahead of a request that will probably need them,
+  see speculation.py) spend tokens from a separate bucket per session and
+  never queue: they only run on a slot nobody is waiting for, so they cannot
+  push the player's own requests into the rate limit or the queue.
+
+Rejected and timed-out calls raise AdmissionError, which AIEngine turns into
+its fallback responses. The session is read from `current_session`, set per
+request by the app; background work without a session (cache refreshes)
+shares one queue and has no token bucket.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List, Optional, TypeVar
+
+from metrics import LLM_QUEUE_WAIT
+
+T = TypeVar('T')
+
+# Token buckets kept at most; past this the least recently used are forgotten
+MAX_BUCKETS = 10000
+
+# Game session id of the request being handled (None for background work)
+current_session: ContextVar[Optional[str]] = ContextVar('current_session', default=None)
+# Set while running speculative work for current_session
+speculative: ContextVar[bool] = ContextVar('speculative', default=False)
+
+
+class AdmissionError(Exception):
+    """Raised when an LLM call is not admitted"""
+
+
+class RateLimited(AdmissionError):
+    """The session used up its token bucket"""
+
+
+class QueueTimeout(AdmissionError):
+    """No slot became free before the queue deadline"""
+
+
+class SlotsBusy(AdmissionError):
+    """Speculative work found no idle slot"""
+
+
+class _Waiter:
+    __slots__ = ("granted", "_event", "_loop", "_future")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._future = loop.create_future()
+
+    def grant(self):
+        """Hand the slot over (scheduler lock held)"""
+        self.granted = True
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self._future.done():
+            self._future.set_result(None)
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
+    async def await_grant(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(asyncio.shield(self._future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class LLMScheduler:
+    """Concurrency cap, per-session token buckets and a round-robin queue across sessions"""
+
+    def __init__(self, max_concurrent: int = 32, session_rate: float = 0.5, session_burst: float = 6,
+                 queue_timeout: float = 3.0):
+        self.max_concurrent = max_concurrent
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        # session -> its waiters; the first session is served next, then moved to the end
+        self._queues: "OrderedDict[Hashable, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+        # session -> [tokens, last refill]
+        # session -> [tokens, updated], least recently used first
+        self._buckets: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"admitted": 0, "queued": 0, "rate_limited": 0, "queue_timeouts": 0,
+                        "speculative_admitted": 0, "speculative_skipped": 0}
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        """Build a scheduler configured through environment variables"""
+        return cls(
+            max_concurrent=int(os.getenv('LLM_MAX_CONCURRENT', '32')),
+            session_rate=float(os.getenv('LLM_SESSION_RATE', '0.5')),
+            session_burst=float(os.getenv('LLM_SESSION_BURST', '6')),
+            queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', '3'))
+        )
+
+    def _take_token(self, session: Optional[Hashable], now: float) -> bool:
+        """Spend one of the session's tokens (lock must be held)"""
+        if session is None or not self.session_rate:
+            return True
+        bucket = self._buckets.get(session)
+        if bucket is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._sweep_buckets(now)
+            bucket = self._buckets[session] = [self.session_burst, now]
+        else:
+            self._buckets.move_to_end(session)
+        tokens = min(self.session_burst, bucket[0] + (now - bucket[1]) * self.session_rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def _sweep_buckets(self, now: float):
+        """Forget buckets that have refilled completely (they behave like new ones), then
+        the least recently used ones until there is room; only the oldest are visited"""
+        refill = self.session_burst / self.session_rate
+        while self._buckets:
+            session, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < refill and len(self._buckets) < MAX_BUCKETS:
+                break
+            del self._buckets[session]
+
+    def _enter(self, session: Optional[Hashable], loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        """Take a slot (returns None) or join the queue (returns the waiter); raises RateLimited"""
+        if speculative.get():
+            self._enter_speculative(session)
+            return None
+        with self._lock:
+            if not self._take_token(session, time.monotonic()):
+                self._counts["rate_limited"] += 1
+                raise RateLimited(f"LLM rate limit reached for session {session}")
+            if self._active < self.max_concurrent and not self._queued:
+                self._active += 1
+                self._counts["admitted"] += 1
+                return None
+            waiter = _Waiter(loop)
+            self._queues.setdefault(session, deque()).append(waiter)
+            self._queued += 1
+            self._counts["queued"] += 1
+            return waiter
+
+    def _enter_speculative(self, session: Optional[Hashable]):
+        """Take an idle slot for speculative work, charged to the session's speculation bucket"""
+        with self._lock:
+            bucket = (session, "speculative") if session is not None else None
+            if self._active >= self.max_concurrent or self._queued or not self._take_token(bucket, time.monotonic()):
+                self._counts["speculative_skipped"] += 1
+                raise SlotsBusy(f"No idle LLM slot for speculative work of session {session}")
+            self._active += 1
+            self._counts["speculative_admitted"] += 1
+
+    def _release(self):
+        """Pass the slot to the next session in turn, or free it"""
+        with self._lock:
+            if not self._queues:
+                self._active -= 1
+                return
+            session, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            self._counts["admitted"] += 1
+            waiter.grant()
+
+    def _abandon(self, session: Optional[Hashable], waiter: _Waiter) -> bool:
+        """Leave the queue; False if the slot was granted in the meantime"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            queue = self._queues[session]
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[session]
+            return True
+
+    @contextmanager
+    def slot(self, session: Optional[Hashable] = None):
+        """Hold an LLM slot for the duration of the block"""
+        start = time.monotonic()
+        waiter = self._enter(session)
+        if waiter is not None and not waiter.wait(self.queue_timeout) and self._abandon(session, waiter):
+            self.count("queue_timeouts")
+            raise QueueTimeout(f"No LLM slot within {self.queue_timeout}s")
+        LLM_QUEUE_WAIT.observe(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self, session: Optional[Hashable] = None):
+        """Async counterpart of slot()"""
+        start = time.monotonic()
+        waiter = self._enter(session, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                granted = await waiter.await_grant(self.queue_timeout)
+            except asyncio.CancelledError:
+                if not self._abandon(session, waiter):
+                    self._release()
+                raise
+            if not granted and self._abandon(session, waiter):
+                self.count("queue_timeouts")
+                raise QueueTimeout(f"No LLM slot within {self.queue_timeout}s")
+        LLM_QUEUE_WAIT.observe(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def call(self, session: Optional[Hashable], fn: Callable[[], T]) -> T:
+        with self.slot(session):
+            return fn()
+
+    async def acall(self, session: Optional[Hashable], fn: Callable[[], Awaitable[T]]) -> T:
+        async with self.aslot(session):
+            return await fn()
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counts)
+            stats["active"] = self._active
+            stats["queue_depth"] = self._queued
+            stats["queued_sessions"] = len(self._queues)
+            stats["sessions"] = len(self._buckets)
+        return stats
+
+
+# Shared by AIEngine and AsyncAIEngine: the cap is per process
+llm_scheduler = LLMScheduler.from_env()
@@ -0,0 +1,204 @@
+"""Local argument scoring.
+
+Free-text arguments are matched to the closest entry of the ARGUMENTS
+catalogue with TF-IDF weighted, hashed character n-grams (plus words), so
+typos, accents and rephrasings still land on the right argument. The
+catalogue and the NPC profiles are vectorized once at import; scoring a
+message is a handful of hashes and a sparse dot product, well under a
+millisecond, instead of an LLM round trip. The features of recent messages
+are kept in a small LRU cache keyed by a digest of the normalized text, since
+the argument buttons send the same catalogue texts over and over.
+
+The chance that an argument lands (lowers the NPC's resistance by one) is
+
+    rate   = success_rate of the match, scaled down when the match is weak
+    rate  *= 1 + AFFINITY_WEIGHT * similarity(argument, NPC profile)
+    chance = rate ** (resistance_level / MAX_RESISTANCE)
+
+so good arguments that speak to the NPC's background work best, and NPCs
+that are already worn down (or were never very resistant) give in more easily.
+
+Print matches and timings with:
+    python scoring.py ["some argument"]
+"""
+import hashlib
+import math
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter, OrderedDict
+from typing import Collection, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from npc_data import ARGUMENTS, NPCS
+
+DIMENSIONS = 2 ** 15
+NGRAM_SIZES = (3, 4, 5)
+# Below this cosine similarity a message only partially counts as the matched argument
+MATCH_THRESHOLD = 0.45
+AFFINITY_WEIGHT = 2.0
+REPEAT_PENALTY = 0.5
+MAX_RESISTANCE = max(npc["resistance_level"] for npc in NPCS) or 1
+MAX_CHANCE = 0.95
+# Messages whose features are cached, and the longest one worth caching
+FEATURE_CACHE_SIZE = 1024
+FEATURE_CACHE_MAX_CHARS = 300
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII words separated by single spaces"""
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode()
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def features(text: str) -> Counter:
+    """Hashed word and character n-gram counts"""
+    return _features(normalize(text))
+
+
+def _features(text: str) -> Counter:
+    counts = Counter()
+    for word in text.split():
+        counts[zlib.crc32(b"w:" + word.encode()) % DIMENSIONS] += 1
+    padded = f" {text} ".encode()
+    for size in NGRAM_SIZES:
+        for i in range(len(padded) - size + 1):
+            counts[zlib.crc32(padded[i:i + size]) % DIMENSIONS] += 1
+    return counts
+
+
+_feature_cache: "OrderedDict[bytes, Counter]" = OrderedDict()
+_feature_cache_lock = threading.Lock()
+
+
+def cached_features(text: str) -> Counter:
+    """features(text), memoized for short messages; callers must not modify the result"""
+    text = normalize(text)
+    if len(text) > FEATURE_CACHE_MAX_CHARS:
+        return _features(text)
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    with _feature_cache_lock:
+        counts = _feature_cache.get(key)
+        if counts is not None:
+            _feature_cache.move_to_end(key)
+            return counts
+    counts = _features(text)
+    with _feature_cache_lock:
+        _feature_cache[key] = counts
+        while len(_feature_cache) > FEATURE_CACHE_SIZE:
+            _feature_cache.popitem(last=False)
+    return counts
+
+
+class ArgumentScorer:
+    """TF-IDF index over the argument catalogue and NPC profiles"""
+
+    def __init__(self, arguments: List[Dict] = ARGUMENTS, npcs: List[Dict] = NPCS):
+        # "chicoteia" is a magic word, not an argument to be matched
+        self.arguments = [arg for arg in arguments if not arg.get("special", False)]
+        self.npc_index = {npc["id"]: i for i, npc in enumerate(npcs)}
+        documents = [features(arg["text"] + " " + arg["description"]) for arg in self.arguments]
+        profiles = [features(" ".join((npc["role"], npc["personality"], npc["bio"]))) for npc in npcs]
+
+        document_frequency = np.zeros(DIMENSIONS, dtype=np.float32)
+        for counts in documents + profiles:
+            document_frequency[list(counts)] += 1
+        total = len(documents) + len(profiles)
+        self.idf = np.log((1 + total) / (1 + document_frequency)).astype(np.float32) + 1
+
+        self.argument_matrix = self._matrix(documents)
+        self.profile_matrix = self._matrix(profiles)
+        self.success_rates = np.array([arg["success_rate"] for arg in self.arguments], dtype=np.float32)
+
+    def _matrix(self, documents: List[Counter]) -> np.ndarray:
+        matrix = np.zeros((len(documents), DIMENSIONS), dtype=np.float32)
+        for row, counts in enumerate(documents):
+            columns, weights = self._weights(counts)
+            matrix[row, columns] = weights
+        return matrix
+
+    def _weights(self, counts: Counter) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse, L2-normalized TF-IDF vector as (columns, weights)"""
+        columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter((1 + math.log(c) for c in counts.values()), dtype=np.float32, count=len(counts))
+        weights *= self.idf[columns]
+        norm = float(np.linalg.norm(weights))
+        return columns, (weights / norm if norm else weights)
+
+    def _vector(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        return self._weights(cached_features(text))
+
+    def _closest(self, columns: np.ndarray, weights: np.ndarray) -> Tuple[int, float]:
+        similarities = self.argument_matrix[:, columns] @ weights
+        best = int(similarities.argmax())
+        return best, float(similarities[best])
+
+    def match(self, text: str) -> Tuple[Optional[Dict], float]:
+        """Closest catalogue argument and its cosine similarity"""
+        columns, weights = self._vector(text)
+        if not len(columns):
+            return None, 0.0
+        best, similarity = self._closest(columns, weights)
+        return self.arguments[best], similarity
+
+    def evaluate(self, npc_id: str, text: str, resistance_level: int, repeated: bool = False,
+                 used: Collection[str] = ()) -> Dict:
+        """Chance that an argument lands with an NPC at its current resistance.
+
+        The argument counts as repeated when `repeated` is set or when the catalogue
+        argument it matches is in `used`.
+        """
+        columns, weights = self._vector(text)
+        if not len(columns):
+            return {"argument": None, "similarity": 0.0, "affinity": 0.0, "chance": 0.0}
+        best, similarity = self._closest(columns, weights)
+
+        rate = float(self.success_rates[best]) * min(1.0, similarity / MATCH_THRESHOLD)
+        affinity = 0.0
+        row = self.npc_index.get(npc_id)
+        if row is not None:
+            affinity = float(self.profile_matrix[row, columns] @ weights)
+            rate *= 1 + AFFINITY_WEIGHT * affinity
+        if repeated or self.arguments[best]["text"] in used:
+            rate *= REPEAT_PENALTY
+        rate = min(rate, MAX_CHANCE)
+
+        chance = rate ** (max(0, resistance_level) / MAX_RESISTANCE) if rate > 0 else 0.0
+        return {
+            "argument": self.arguments[best]["text"],
+            "similarity": similarity,
+            "affinity": affinity,
+            "chance": min(chance, MAX_CHANCE)
+        }
+
+
+argument_scorer = ArgumentScorer()
+
+
+if __name__ == "__main__":
+    import sys
+    import timeit
+
+    samples = sys.argv[1:] or [
+        ARGUMENTS[1]["text"],
+        "a ia ta salvando vida nos hospitais com diagnostico melhor",
+        "empresas grandes já usam IA em produção de verdade",
+        "eu gosto de pizza",
+    ]
+    for text in samples:
+        argument, similarity = argument_scorer.match(text)
+        print(f"{text!r}\n  -> {argument['text'] if argument else None!r} ({similarity:.2f})")
+        for npc in NPCS:
+            result = argument_scorer.evaluate(npc["id"], text, npc["resistance_level"])
+            print(f"     {npc['id']:<20} resistance {npc['resistance_level']}  "
+                  f"affinity {result['affinity']:.2f}  chance {result['chance']:.2f}")
+
+    runs = 2000
+    unseen = iter(range(runs))
+    cached = timeit.timeit(lambda: argument_scorer.evaluate(NPCS[0]["id"], samples[-1], 2), number=runs)
+    fresh = timeit.timeit(lambda: argument_scorer.evaluate(NPCS[0]["id"], f"{samples[-1]} {next(unseen)}", 2), number=runs)
+    print(f"\nevaluate: {cached / runs * 1e6:.0f} us cached, {fresh / runs * 1e6:.0f} us for unseen text")
@@ -0,0 +1,349 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+from game_logic import GameState
+
+
+def approximate_size(obj, seen=None) -> int:
+    """Approximate memory footprint of an object graph in bytes"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k, seen) + approximate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(approximate_size(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += approximate_size(vars(obj), seen)
+    elif hasattr(obj, '__slots__'):
+        size += sum(approximate_size(getattr(obj, slot), seen)
+                    for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
+
+
+class SessionStore:
+    """Base class for game session storage backends"""
+
+    def get(self, session_id: str) -> Optional[GameState]:
+        """Get game state for a session, or None if missing/expired"""
+        raise NotImplementedError
+
+    def set(self, session_id: str, game_state: GameState):
+        """Store game state for a session"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """Remove a session"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """Get store metrics (hits, misses, evictions, memory)"""
+        raise NotImplementedError
+
+    def acquire_lock(self, session_id: str) -> Optional[str]:
+        """Acquire exclusive access to a session across workers; returns a release token"""
+        return None
+
+    def release_lock(self, session_id: str, token: Optional[str]):
+        """Release a lock taken with acquire_lock"""
+
+    @contextmanager
+    def lock(self, session_id: str):
+        """Hold exclusive access to a session for the duration of the block"""
+        token = self.acquire_lock(session_id)
+        try:
+            yield
+        finally:
+            self.release_lock(session_id, token)
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """In-process session store with idle-TTL expiry and LRU eviction"""
+
+    SIZE_REFRESH_SAVES = 16
+
+    def __init__(self, max_entries: int = 10000, idle_ttl: float = 3600):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        # session_id -> (game_state, last_access, approx_bytes, saves), oldest access first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, session_id: str) -> Optional[GameState]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            game_state, last_access, size, saves = entry
+            if now - last_access > self.idle_ttl:
+                self._remove(session_id)
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries[session_id] = (game_state, now, size, saves)
+            self._entries.move_to_end(session_id)
+            self._hits += 1
+            return game_state
+
+    def set(self, session_id: str, game_state: GameState):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+        saves = entry[3] + 1 if entry is not None and entry[0] is game_state else 0
+
+        # Walking the object graph is far costlier than the save itself, so
+        # the size of a session saved repeatedly is only re-measured periodically
+        if saves % self.SIZE_REFRESH_SAVES:
+            size = entry[2]
+        else:
+            size = approximate_size(game_state)
+
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+            self._entries[session_id] = (game_state, now, size, saves)
+            self._bytes += size
+            self._expire(now)
+
+            # Evict least recently used sessions beyond the cap
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "idle_ttl": self.idle_ttl,
+                "approx_bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, session_id: str):
+        """Drop an entry and its memory accounting (lock must be held)"""
+        _, _, size, _ = self._entries.pop(session_id)
+        self._bytes -= size
+
+    def _expire(self, now: float):
+        """Drop idle sessions; entries are ordered by last access (lock must be held)"""
+        while self._entries:
+            oldest = next(iter(self._entries))
+            last_access = self._entries[oldest][1]
+            if now - last_access <= self.idle_ttl:
+                break
+            self._remove(oldest)
+            self._expirations += 1
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store shared by all worker processes on a host, backed by SQLite in WAL mode.
+
+    Game states are stored serialized (GameState.to_bytes), so every get returns
+    a fresh copy that must be saved back with set. Per-session locks are leases
+    in a separate table so that concurrent requests for one game serialize
+    across processes; a lease left by a crashed worker expires after
+    lock_lease seconds. Requests hold the lock around game logic and I/O
+    only, never while waiting on the LLM, so they finish well within it.
+    """
+
+    def __init__(self, path: str = 'sessions.db', max_entries: int = 10000, idle_ttl: float = 3600,
+                 lock_timeout: float = 10.0, lock_lease: float = 30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.lock_timeout = lock_timeout
+        self.lock_lease = lock_lease
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._sets = 0
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+            CREATE TABLE IF NOT EXISTS session_locks (
+                session_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection (sqlite3 connections are not shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.lock_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, amount: int = 1) -> int:
+        with self._counter_lock:
+            value = getattr(self, name) + amount
+            setattr(self, name, value)
+            return value
+
+    def get(self, session_id: str) -> Optional[GameState]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT data, last_access FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            self._count('_misses')
+            return None
+
+        data, last_access = row
+        now = time.time()
+        if now - last_access > self.idle_ttl:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._count('_expirations')
+            self._count('_misses')
+            return None
+
+        # Avoid a write per read: only refresh the idle clock when it is noticeably stale
+        if now - last_access > min(60.0, self.idle_ttl / 10):
+            conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        self._count('_hits')
+        if data[:1] == b'{':
+            # Written as JSON before snapshots were binary
+            return GameState.from_dict(json.loads(data))
+        return GameState.from_bytes(data)
+
+    def set(self, session_id: str, game_state: GameState):
+        data = game_state.to_bytes()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, last_access, size) VALUES (?, ?, ?, ?)",
+            (session_id, data, time.time(), len(data))
+        )
+        # Sweeping on every write would dominate; amortize it
+        if self._count('_sets') % 100 == 0:
+            self.cleanup()
+
+    def delete(self, session_id: str):
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def cleanup(self):
+        """Drop idle sessions and evict the least recently used beyond max_entries"""
+        conn = self._connection()
+        cursor = conn.execute("DELETE FROM sessions WHERE last_access < ?", (time.time() - self.idle_ttl,))
+        self._count('_expirations', max(cursor.rowcount, 0))
+        cursor = conn.execute("""
+            DELETE FROM sessions WHERE session_id IN (
+                SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )""", (self.max_entries,))
+        self._count('_evictions', max(cursor.rowcount, 0))
+        conn.execute("DELETE FROM session_locks WHERE expires < ?", (time.time(),))
+
+    def acquire_lock(self, session_id: str) -> Optional[str]:
+        conn = self._connection()
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.002
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM session_locks WHERE session_id = ? AND expires < ?", (session_id, now))
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO session_locks (session_id, owner, expires) VALUES (?, ?, ?)",
+                    (session_id, owner, now + self.lock_lease)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if cursor.rowcount == 1:
+                return owner
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for session lock {session_id}")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def release_lock(self, session_id: str, token: Optional[str]):
+        if token is None:
+            return
+        self._connection().execute(
+            "DELETE FROM session_locks WHERE session_id = ? AND owner = ?", (session_id, token)
+        )
+
+    def stats(self) -> Dict:
+        entries, total_bytes = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions"
+        ).fetchone()
+        with self._counter_lock:
+            return {
+                "backend": "sqlite",
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "idle_ttl": self.idle_ttl,
+                "approx_bytes": total_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store() -> SessionStore:
+    """Create the session store configured through environment variables"""
+    backend = os.getenv('SESSION_BACKEND', 'memory')
+    max_entries = int(os.getenv('SESSION_MAX_ENTRIES', '10000'))
+    idle_ttl = float(os.getenv('SESSION_IDLE_TTL', '3600'))
+
+    if backend == 'memory':
+        return MemorySessionStore(max_entries=max_entries, idle_ttl=idle_ttl)
+    if backend == 'sqlite':
+        path = os.getenv('SESSION_DB_PATH', 'sessions.db')
+        return SQLiteSessionStore(path, max_entries=max_entries, idle_ttl=idle_ttl)
+    raise ValueError(f"Unknown session backend: {backend}")
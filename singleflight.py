@@ -0,0 +1,122 @@
+"""Coalescing of identical in-flight LLM requests.
+
+When many sessions send the same prompt at the same moment (e.g. everyone
+reaching the same NPC after a stage announcement), only the first request
+goes upstream; the others wait for it and share its result or error.
+"""
+import asyncio
+import json
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar('T')
+
+
+def request_key(model: str, messages: List[Dict], **params) -> str:
+    """Identify an upstream request by everything that is sent"""
+    return json.dumps([model, messages, params], sort_keys=True, ensure_ascii=False)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncCall:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and fans its outcome out to all waiters"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, _AsyncCall] = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Run fn() unless an identical call is in flight, in which case wait for it"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+            else:
+                self._shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of do() (calls are coalesced within one event loop).
+
+        fn() runs in its own task, so a waiter that is cancelled (a client
+        disconnecting) does not cancel it for the others; it is only cancelled
+        once nobody is waiting for it anymore.
+        """
+        call = self._async_calls.get(key)
+        if call is None:
+            call = self._async_calls[key] = _AsyncCall(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda task: self._async_done(key, call))
+            with self._lock:
+                self._executed += 1
+        else:
+            with self._lock:
+                self._shared += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _AsyncCall):
+        """Stop handing out a call to new waiters"""
+        if self._async_calls.get(key) is call:
+            del self._async_calls[key]
+
+    def _async_done(self, key: Hashable, call: _AsyncCall):
+        self._forget(key, call)
+        # Mark errors as retrieved even when nobody was left waiting
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "executed": self._executed,
+                "saved": self._shared
+            }
+
+
+# Shared by AIEngine and AsyncAIEngine
+llm_flight = SingleFlight()
@@ -0,0 +1,204 @@
+"""Compact binary snapshot format used by GameState.to_bytes/from_bytes.
+
+Layout:
+
+    b"GS" | format version (1 byte) | string table | sections
+
+Every string (ids, statuses, arguments, history text) is written once in the
+string table and referenced by a varint index everywhere else, so repeated
+values such as an argument that is both in arguments_used and in the history
+cost one or two bytes after the first time. Integers are varints.
+
+Each section is `tag (1 byte) | varint length | payload`. Readers skip
+sections with tags they do not know, so new data can be added in new
+sections without breaking older readers. Changing the layout of an existing
+section requires bumping FORMAT_VERSION; readers refuse versions newer than
+they understand and keep decoding older ones.
+"""
+import struct
+from typing import Callable, Dict, List, Optional, Tuple
+
+MAGIC = b"GS"
+FORMAT_VERSION = 2  # 2: NPC records are varints instead of 16-bit fields
+
+# Tags of values inside generic records (history entries)
+_NONE, _FALSE, _TRUE, _INT, _STR, _FLOAT = range(6)
+_DOUBLE = struct.Struct("<d")
+_KEY_SEPARATOR = "\x00"
+
+
+class SnapshotWriter:
+    """Builds a snapshot: sections are written first, the string table is emitted in front of them"""
+
+    def __init__(self):
+        self._strings: Dict[str, int] = {}
+        self._sections: List[Tuple[int, bytes]] = []
+        self._buffer = bytearray()
+
+    def section(self, tag: int, write: Callable[["SnapshotWriter"], None]):
+        self._buffer = bytearray()
+        write(self)
+        self._sections.append((tag, bytes(self._buffer)))
+
+    def varint(self, value: int):
+        buffer = self._buffer
+        if value < 0x80:
+            buffer.append(value)
+            return
+        while value >= 0x80:
+            buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        buffer.append(value)
+
+    def ref(self, value: Optional[str]) -> int:
+        """Index of a string in the table; 0 means None"""
+        if value is None:
+            return 0
+        index = self._strings.get(value)
+        if index is None:
+            index = self._strings[value] = len(self._strings) + 1
+        return index
+
+    def string(self, value: Optional[str]):
+        self.varint(self.ref(value))
+
+    def pack(self, layout: struct.Struct, *values):
+        """A fixed-width record (cheaper to decode than a run of varints)"""
+        self._buffer += layout.pack(*values)
+
+    def flags(self, *values: bool):
+        self.varint(sum(1 << i for i, value in enumerate(values) if value))
+
+    def value(self, value):
+        """A tagged scalar (None, bool, int, float or str)"""
+        buffer = self._buffer
+        if value is None:
+            buffer.append(_NONE)
+        elif value is True:
+            buffer.append(_TRUE)
+        elif value is False:
+            buffer.append(_FALSE)
+        elif isinstance(value, int):
+            buffer.append(_INT)
+            self.varint((value << 1) ^ (value >> 63) if value < 0 else value << 1)
+        elif isinstance(value, float):
+            buffer.append(_FLOAT)
+            buffer += _DOUBLE.pack(value)
+        else:
+            buffer.append(_STR)
+            self.string(str(value))
+
+    def record(self, record: Dict):
+        """A dict of scalars: its key set (one string reference) followed by the values"""
+        self.string(_KEY_SEPARATOR.join(record))
+        for value in record.values():
+            self.value(value)
+
+    def to_bytes(self) -> bytes:
+        self._buffer = out = bytearray(MAGIC)
+        out.append(FORMAT_VERSION)
+        self.varint(len(self._strings))
+        for value in self._strings:
+            encoded = value.encode()
+            self.varint(len(encoded))
+            out += encoded
+        for tag, payload in self._sections:
+            out.append(tag)
+            self.varint(len(payload))
+            out += payload
+        return bytes(out)
+
+
+class SnapshotReader:
+    """Parses a snapshot into its string table and raw sections"""
+
+    def __init__(self, data: bytes):
+        if data[:2] != MAGIC:
+            raise ValueError("Not a game state snapshot")
+        self.version = data[2]
+        if self.version > FORMAT_VERSION:
+            raise ValueError(f"Snapshot format {self.version} is newer than supported ({FORMAT_VERSION})")
+        self._data = data
+        self._pos = 3
+        self._shapes: Dict[str, Tuple[str, ...]] = {}
+        self._strings: List[Optional[str]] = [None]
+        for _ in range(self.varint()):
+            length = self.varint()
+            self._strings.append(data[self._pos:self._pos + length].decode())
+            self._pos += length
+        self.sections: Dict[int, Tuple[int, int]] = {}
+        while self._pos < len(data):
+            tag = data[self._pos]
+            self._pos += 1
+            length = self.varint()
+            self.sections[tag] = (self._pos, self._pos + length)
+            self._pos += length
+
+    def open(self, tag: int) -> bool:
+        """Position the reader at the start of a section; False if it is absent"""
+        if tag not in self.sections:
+            return False
+        self._pos = self.sections[tag][0]
+        return True
+
+    def varint(self) -> int:
+        data = self._data
+        byte = data[self._pos]
+        self._pos += 1
+        if byte < 0x80:
+            return byte  # Most values (string references, counters) fit in one byte
+        result, shift = byte & 0x7F, 7
+        while True:
+            byte = data[self._pos]
+            self._pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def string(self) -> Optional[str]:
+        index = self._data[self._pos]
+        if index < 0x80:
+            self._pos += 1
+            return self._strings[index]
+        return self._strings[self.varint()]
+
+    def strings(self, refs: Tuple[int, ...]) -> Tuple[Optional[str], ...]:
+        table = self._strings
+        return tuple(table[ref] for ref in refs)
+
+    def unpack(self, layout: struct.Struct) -> Tuple:
+        values = layout.unpack_from(self._data, self._pos)
+        self._pos += layout.size
+        return values
+
+    def flags(self, count: int) -> Tuple[bool, ...]:
+        bits = self.varint()
+        return tuple(bool(bits >> i & 1) for i in range(count))
+
+    def value(self):
+        tag = self._data[self._pos]
+        self._pos += 1
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _INT:
+            raw = self.varint()
+            return -((raw + 1) >> 1) if raw & 1 else raw >> 1
+        if tag == _FLOAT:
+            value = _DOUBLE.unpack_from(self._data, self._pos)[0]
+            self._pos += _DOUBLE.size
+            return value
+        if tag == _STR:
+            return self.string()
+        raise ValueError(f"Unknown value tag {tag}")
+
+    def record(self) -> Dict:
+        shape = self.string()
+        keys = self._shapes.get(shape)
+        if keys is None:
+            keys = self._shapes[shape] = tuple(shape.split(_KEY_SEPARATOR)) if shape else ()
+        return {key: self.value() for key in keys}
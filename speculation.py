@@ -0,0 +1,124 @@
+"""Speculative pre-generation of predictable LLM calls.
+
+The game flow is nearly linear: once an NPC reaches the `ai_opinion` phase
+the player's next request is almost always /api/ask_ai_opinion. The server
+starts that request's LLM call as soon as the phase changes and parks the
+future here; the follow-up request takes it, getting the result immediately
+or joining the call still in flight.
+
+Speculations are process-local. With several workers, a follow-up that lands
+on another worker simply misses and makes the call itself. So does a
+follow-up whose speculation is still waiting for an executor worker, rather
+than queue behind other speculations. Speculative calls run at low priority
+(see scheduler.py); when the scheduler turns one away, the request that
+took it makes the call itself.
+"""
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, Iterator, Optional
+
+from scheduler import AdmissionError, speculative
+
+
+class Speculator:
+    """Runs calls ahead of the request that needs them and hands out their futures"""
+
+    def __init__(self, max_workers: int = 4, ttl: float = 120):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='speculation')
+        # key -> (future, started_at)
+        self._pending: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+        self._started = 0
+        self._hits = 0
+        self._joined = 0
+        self._misses = 0
+        self._expired = 0
+
+    def start(self, key: Hashable, fn: Callable, *args) -> None:
+        """Start fn(*args) in the background unless a speculation for key already exists"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._pending:
+                return
+            # Run in the caller's context so the call is scheduled under its session, as speculative work
+            context = contextvars.copy_context()
+            context.run(speculative.set, True)
+            self._pending[key] = (self._executor.submit(context.run, fn, *args), now)
+            self._started += 1
+
+    def take(self, key: Hashable) -> Optional[Future]:
+        """Claim the speculation for key, if any (done or already running)"""
+        with self._lock:
+            entry = self._pending.pop(key, None)
+            if entry is None:
+                self._misses += 1
+                return None
+            future = entry[0]
+            # Not started yet (cancel() fails once it runs), or turned away by the scheduler
+            if future.cancel() or (future.done() and isinstance(future.exception(), AdmissionError)):
+                self._misses += 1
+                return None
+            if future.done():
+                self._hits += 1
+            else:
+                self._joined += 1
+            return future
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "started": self._started,
+                "hits": self._hits,
+                "joined": self._joined,
+                "misses": self._misses,
+                "expired": self._expired
+            }
+
+    def _expire(self, now: float):
+        """Drop speculations nobody claimed in time (lock must be held)"""
+        expired = [key for key, (_, started_at) in self._pending.items() if now - started_at > self.ttl]
+        for key in expired:
+            future, _ = self._pending.pop(key)
+            future.cancel()
+            self._expired += 1
+
+
+def speculated_result(future: Future, call: Callable[[], str], fallback: Callable[[], str],
+                      timeout: float = 60) -> str:
+    """A speculated response: call() instead if the scheduler turned the speculation
+    away, fallback() if it failed or did not finish in time"""
+    try:
+        return future.result(timeout=timeout)
+    except AdmissionError:
+        return call()
+    except Exception as e:
+        print(f"AI Error: {e}")
+        return fallback()
+
+
+def result_stream(future: Future, call: Callable[[], Iterable[str]], fallback: Callable[[], str],
+                  timeout: float = 60) -> Iterator[str]:
+    """Stream a speculated response like speculated_result, as a single delta once
+    it is ready, or the deltas of call()"""
+    try:
+        text = future.result(timeout=timeout)
+    except AdmissionError:
+        yield from call()
+        return
+    except Exception as e:
+        print(f"AI Error: {e}")
+        text = fallback()
+    yield text
+
+
+speculator = Speculator(
+    max_workers=int(os.getenv('SPECULATION_WORKERS', '4')),
+    ttl=float(os.getenv('SPECULATION_TTL', '120'))
+)
+speculation_enabled = os.getenv('SPECULATION_ENABLED', '1') == '1'
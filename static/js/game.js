@@ -4,12 +4,111 @@ class Game {
     constructor() {
         this.currentNpc = null;
         this.gameData = null;
+        this.npcsById = {};
+        this.npcOrder = [];
+        this.statusVersion = 0;
+        this.socket = null;
+        this.socketRequests = new Map();
+        this.socketSeq = 0;
+        this.gameStarted = false;
+        this.gameStarting = null;
         this.init();
     }
 
     init() {
         this.bindEvents();
-        this.startNewGame();
+        if (!this.resumeEmbeddedGame()) {
+            this.startNewGame();
+        }
+    }
+
+    resumeEmbeddedGame() {
+        // The page may carry the NPC cards and this session's status, saving /api/start_game
+        const catalogue = document.getElementById('npcCatalogue');
+        const initial = document.getElementById('initialState');
+        if (!catalogue || !initial) {
+            return false;
+        }
+        // Without a saved game the page shows a fresh one, created on the first action
+        this.gameStarted = !initial.hasAttribute('data-new-game');
+        this.loadGame(JSON.parse(catalogue.textContent), JSON.parse(initial.textContent));
+        return true;
+    }
+
+    loadGame(npcs, status) {
+        this.npcsById = {};
+        this.npcOrder = npcs.map(npc => npc.id);
+        npcs.forEach(npc => {
+            this.npcsById[npc.id] = npc;
+        });
+        this.updateProgress(status);
+        this.showConferenceRoom();
+        // The socket needs the session cookie the game is created with
+        if (this.gameStarted) {
+            this.connectSocket();
+        }
+    }
+
+    ensureGame() {
+        // Create the game the page was rendered with before its first action
+        if (this.gameStarted) return Promise.resolve();
+        if (!this.gameStarting) {
+            this.gameStarting = fetch('/api/start_game', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' }
+            }).then(response => response.json()).then(data => {
+                if (!data.success) throw new Error('Falha ao iniciar jogo');
+                this.gameData = data;
+                this.gameStarted = true;
+                this.connectSocket();
+            }).finally(() => {
+                this.gameStarting = null;
+            });
+        }
+        return this.gameStarting;
+    }
+
+    connectSocket() {
+        // One connection for every game action when the server offers it (ASGI); REST otherwise
+        if (this.socket || !window.WebSocket) return;
+        const protocol = location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(`${protocol}//${location.host}/ws`);
+        let opened = false;
+        socket.addEventListener('open', () => {
+            opened = true;
+        });
+        socket.addEventListener('message', (event) => {
+            this.onSocketMessage(JSON.parse(event.data));
+        });
+        socket.addEventListener('close', () => {
+            this.socket = null;
+            this.socketRequests.forEach(request => request.reject(new Error('Conexão encerrada')));
+            this.socketRequests.clear();
+            // Reconnect after a dropped connection; a refused one means there is no socket endpoint
+            if (opened) {
+                setTimeout(() => this.connectSocket(), 2000);
+            }
+        });
+        this.socket = socket;
+    }
+
+    socketOpen() {
+        return this.socket !== null && this.socket.readyState === WebSocket.OPEN;
+    }
+
+    onSocketMessage(data) {
+        const request = this.socketRequests.get(data.id);
+        if (!request) return;
+        if (data.event === 'delta') {
+            if (request.onDelta) request.onDelta(data.text);
+            return;
+        }
+        this.socketRequests.delete(data.id);
+        if (data.error) {
+            request.reject(new Error(data.error));
+        } else {
+            request.resolve(data);
+        }
     }
 
     bindEvents() {
@@ -67,9 +166,8 @@ class Game {
             const data = await response.json();
             if (data.success) {
                 this.gameData = data;
-                this.renderNPCs(data.npcs);
-                this.updateProgress(data.status);
-                this.showConferenceRoom();
+                this.gameStarted = true;
+                this.loadGame(data.npcs, data.status);
             }
         } catch (error) {
             console.error('Failed to start game:', error);
@@ -102,25 +200,12 @@ class Game {
                 statusClass = 'needs-convincing';
             }
             
-            // Check if NPC has a custom avatar image
+            // Use the NPC's avatar image when it has one
             let avatarContent = `${npc.name.charAt(0)}`;
             let avatarStyle = `background-color: ${npc.avatar_color}`;
             
-            const customAvatars = {
-                'alex_frontend': 'alexandre.jpg',
-                'david_devops': 'david.jpg', 
-                'maria_backend': 'maria.jpg',
-                'sarah_pm': 'sarah.jpg',
-                'tom_ux': 'tom.jpg',
-                'lisa_data': 'lisa.jpg',
-                'mike_security': 'miguel.jpg',
-                'jen_founder': 'jennifer.jpg',
-                'robert_lead': 'roberto.jpg',
-                'anna_qa': 'ana.jpg'
-            };
-            
-            if (customAvatars[npc.id]) {
-                avatarContent = `<img src="/static/images/avatars/${customAvatars[npc.id]}" alt="${npc.name}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 50%;">`;
+            if (npc.avatar) {
+                avatarContent = this.avatarPicture(npc);
                 avatarStyle = 'background-color: transparent';
             }
             
@@ -155,11 +240,8 @@ class Game {
         
         this.showLoading();
         try {
-            const response = await fetch(`/api/start_conversation/${npcId}`, {
-                method: 'POST'
-            });
-            
-            const data = await response.json();
+            const { results } = await this.runActions([{ action: 'start_conversation', npc_id: npcId }]);
+            const data = results[0];
             this.currentNpc = data.npc;
             this.showChatInterface();
             this.updateChatHeader();
@@ -192,11 +274,10 @@ class Game {
         this.showTyping();
         
         try {
-            const response = await fetch(`/api/ask_giovanni/${this.currentNpc.id}`, {
-                method: 'POST'
-            });
-            
-            const data = await response.json();
+            const { results, status } = await this.runActions([
+                { action: 'ask_giovanni', npc_id: this.currentNpc.id }
+            ]);
+            const data = results[0];
             
             // Simulate typing time based on response length
             await this.simulateTypingDelay(data.response);
@@ -211,7 +292,7 @@ class Game {
                 await this.updateChatActions(data.phase);
             }
             
-            await this.refreshGameStatus();
+            this.handleStatus(status);
         } catch (error) {
             console.error('Failed to ask about Giovanni:', error);
             this.hideTyping();
@@ -232,28 +313,33 @@ class Game {
         this.showTyping();
         
         try {
-            const response = await fetch(`/api/ask_ai_opinion/${this.currentNpc.id}`, {
-                method: 'POST'
-            });
-            
-            const data = await response.json();
-            
-            // For AI responses, simulate a slightly longer typing time
-            const extraDelay = 500; // Extra delay for "thinking"
-            await this.simulateTypingDelay(data.response);
-            await new Promise(resolve => setTimeout(resolve, extraDelay));
-            
-            this.hideTyping();
-            this.addMessage('npc', data.response);
+            let data, randomArgs, status;
+            if (this.socketOpen()) {
+                // The opinion streams in, then argument choices and status arrive with it
+                const reply = this.replyView();
+                ({ results: [data, randomArgs], status } = await this.runActions([
+                    { action: 'ask_ai_opinion', npc_id: this.currentNpc.id },
+                    { action: 'random_arguments' }
+                ], reply.delta));
+                if (data.error) throw new Error(data.error);
+                reply.finish(data.response);
+            } else {
+                data = await this.streamReply(`/api/ask_ai_opinion/${this.currentNpc.id}`, {
+                    method: 'POST'
+                });
+                
+                // Argument choices and the updated status in one round trip
+                ({ results: [randomArgs], status } = await this.runActions([{ action: 'random_arguments' }]));
+            }
             
             if (data.status === 'safe') {
                 this.addMessage('system', '✅ Este NPC está seguro! Não acha que IA é uma bolha.');
                 await this.updateChatActions('safe');
             } else {
-                await this.updateChatActions(data.phase);
+                await this.updateChatActions(data.phase, randomArgs);
             }
             
-            await this.refreshGameStatus();
+            this.handleStatus(status);
         } catch (error) {
             console.error('Failed to ask AI opinion:', error);
             this.hideTyping();
@@ -277,13 +363,12 @@ class Game {
         this.showTyping();
         
         try {
-            const response = await fetch(`/api/make_argument/${this.currentNpc.id}`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ argument: argumentText })
-            });
-            
-            const data = await response.json();
+            // The next argument choices come back with the result, in case this one fails
+            const { results, status } = await this.runActions([
+                { action: 'make_argument', npc_id: this.currentNpc.id, argument: argumentText },
+                { action: 'random_arguments' }
+            ]);
+            const [data, randomArgs] = results;
             
             // Simulate typing time based on response length
             await this.simulateTypingDelay(data.response);
@@ -296,10 +381,10 @@ class Game {
                 await this.updateChatActions('safe');
             } else {
                 this.addMessage('system', '❌ Argumento não os convenceu. Tente novamente!');
-                await this.updateChatActions(data.phase);
+                await this.updateChatActions(data.phase, randomArgs);
             }
             
-            await this.refreshGameStatus();
+            this.handleStatus(status);
         } catch (error) {
             console.error('Failed to make argument:', error);
             this.hideTyping();
@@ -318,21 +403,20 @@ class Game {
         this.showTyping();
         
         try {
-            const response = await fetch(`/api/chat/${this.currentNpc.id}`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message })
-            });
-            
-            const data = await response.json();
-            
-            // For custom AI responses, add extra thinking time
-            const extraDelay = 700; // Extra delay for AI processing
-            await this.simulateTypingDelay(data.response);
-            await new Promise(resolve => setTimeout(resolve, extraDelay));
-            
-            this.hideTyping();
-            this.addMessage('npc', data.response);
+            if (this.socketOpen()) {
+                const reply = this.replyView();
+                const { results: [data] } = await this.runActions([
+                    { action: 'chat', npc_id: this.currentNpc.id, message }
+                ], reply.delta);
+                if (data.error) throw new Error(data.error);
+                reply.finish(data.response);
+            } else {
+                await this.streamReply(`/api/chat/${this.currentNpc.id}`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ message })
+                });
+            }
         } catch (error) {
             console.error('Failed to send message:', error);
             this.hideTyping();
@@ -340,7 +424,92 @@ class Game {
         }
     }
 
-    async updateChatActions(phase) {
+    async streamReply(url, options) {
+        // Request a Server-Sent Events stream and render the NPC reply as deltas arrive
+        const response = await fetch(url, {
+            ...options,
+            headers: { ...(options.headers || {}), 'Accept': 'text/event-stream' }
+        });
+        
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.startsWith('text/event-stream') || !response.body) {
+            // Server answered with a regular JSON payload (errors, phase checks)
+            const data = await response.json();
+            if (!response.ok || data.error) {
+                throw new Error(data.error || `HTTP ${response.status}`);
+            }
+            this.hideTyping();
+            this.addMessage('npc', data.response);
+            return data;
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const reply = this.replyView();
+        let buffer = '';
+        let result = null;
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let payload = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) payload += line.slice(5).trim();
+                });
+                if (!payload) continue;
+                const data = JSON.parse(payload);
+                
+                if (event === 'delta') {
+                    reply.delta(data.text);
+                } else if (event === 'done') {
+                    result = data;
+                }
+            }
+        }
+        
+        if (!result) {
+            throw new Error('Stream closed before completion');
+        }
+        
+        reply.finish(result.response);
+        return result;
+    }
+
+    replyView() {
+        // Renders an NPC reply as deltas arrive, then the final, trimmed text recorded by the server
+        let messageEl = null;
+        let text = '';
+        const element = () => {
+            if (!messageEl) {
+                this.hideTyping();
+                messageEl = this.addMessage('npc', '');
+            }
+            return messageEl;
+        };
+        return {
+            delta: (chunk) => {
+                text += chunk;
+                element().textContent = text;
+                this.scrollMessages();
+            },
+            finish: (response) => {
+                this.hideTyping();
+                element().textContent = response;
+            }
+        };
+    }
+
+    async updateChatActions(phase, randomArgs) {
         const actions = document.getElementById('chatActions');
         const customInput = document.getElementById('customMessageInput');
         
@@ -371,7 +540,7 @@ class Game {
                 break;
                 
             case 'argument_phase':
-                await this.loadRandomArguments(actions);
+                await this.loadRandomArguments(actions, randomArgs);
                 break;
                 
             case 'safe':
@@ -387,10 +556,12 @@ class Game {
         }
     }
 
-    async loadRandomArguments(actionsElement) {
+    async loadRandomArguments(actionsElement, randomArgs) {
         try {
-            const response = await fetch('/api/random_arguments');
-            const randomArgs = await response.json();
+            if (!randomArgs) {
+                const response = await fetch('/api/random_arguments');
+                randomArgs = await response.json();
+            }
             
             let buttonsHtml = `
                 <button class="action-btn special" onclick="game.makeArgument('chicoteia')">
@@ -448,6 +619,12 @@ class Game {
         message.textContent = text;
         messages.appendChild(message);
         messages.scrollTop = messages.scrollHeight;
+        return message;
+    }
+
+    scrollMessages() {
+        const messages = document.getElementById('chatMessages');
+        messages.scrollTop = messages.scrollHeight;
     }
 
     updateChatHeader() {
@@ -456,22 +633,9 @@ class Game {
         
         const avatar = document.getElementById('chatNpcAvatar');
         
-        const customAvatars = {
-            'alex_frontend': 'alexandre.jpg',
-            'david_devops': 'david.jpg',
-            'maria_backend': 'maria.jpg', 
-            'sarah_pm': 'sarah.jpg',
-            'tom_ux': 'tom.jpg',
-            'lisa_data': 'lisa.jpg',
-            'mike_security': 'miguel.jpg',
-            'jen_founder': 'jennifer.jpg',
-            'robert_lead': 'roberto.jpg',
-            'anna_qa': 'ana.jpg'
-        };
-        
-        if (customAvatars[this.currentNpc.id]) {
+        if (this.currentNpc.avatar) {
             avatar.style.backgroundColor = 'transparent';
-            avatar.innerHTML = `<img src="/static/images/avatars/${customAvatars[this.currentNpc.id]}" alt="${this.currentNpc.name}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 50%;">`;
+            avatar.innerHTML = this.avatarPicture(this.currentNpc);
         } else {
             avatar.style.backgroundColor = this.currentNpc.avatar_color;
             avatar.textContent = this.currentNpc.name.charAt(0);
@@ -479,19 +643,46 @@ class Game {
         }
     }
 
-    async refreshGameStatus() {
-        try {
-            const response = await fetch('/api/game_status');
-            const status = await response.json();
-            this.updateProgress(status);
-            
-            if (status.game_won) {
-                setTimeout(() => {
-                    this.showWinModal();
-                }, 1000);
-            }
-        } catch (error) {
-            console.error('Failed to refresh game status:', error);
+    avatarPicture(npc) {
+        // Responsive variants from the image build (see tools/build_images.py), if any
+        const image = npc.avatar;
+        const sizes = image.sizes ? ` sizes="${image.sizes}"` : '';
+        const sources = image.sources.map(source =>
+            `<source type="${source.type}" srcset="${source.srcset}"${sizes}>`
+        ).join('');
+        const srcset = image.srcset ? ` srcset="${image.srcset}"${sizes}` : '';
+        return `<picture>${sources}<img src="${image.src}"${srcset} alt="${npc.name}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 50%;"></picture>`;
+    }
+
+    async runActions(actions, onDelta) {
+        // Several game actions in one message (socket) or request (REST); the compact status comes back with them
+        await this.ensureGame();
+        if (this.socketOpen()) {
+            const id = ++this.socketSeq;
+            return new Promise((resolve, reject) => {
+                this.socketRequests.set(id, { resolve, reject, onDelta });
+                this.socket.send(JSON.stringify({ id, actions, since: this.statusVersion }));
+            });
+        }
+        const response = await fetch('/api/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ actions, since: this.statusVersion })
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || `HTTP ${response.status}`);
+        }
+        return data;
+    }
+
+    handleStatus(status) {
+        this.updateProgress(status);
+        
+        if (status.game_won) {
+            setTimeout(() => {
+                this.showWinModal();
+            }, 1000);
         }
     }
 
@@ -506,8 +697,25 @@ class Game {
         // Debug: Log the status to see what we're getting
         console.log('Game Status Update:', status);
         
+        this.applyStatus(status);
+        
         // Always update NPC cards with latest status - they'll be visible when user returns to conference room
-        this.renderNPCs([...status.safe_npcs, ...status.needs_convincing, ...status.unknown]);
+        const npcs = this.npcOrder.map(id => this.npcsById[id]);
+        const byStatus = (value) => npcs.filter(npc => npc.status === value);
+        this.renderNPCs([...byStatus('safe'), ...byStatus('needs_convincing'), ...byStatus('unknown')]);
+    }
+
+    applyStatus(status) {
+        // Merge compact (possibly delta) status into the NPCs received at game start
+        Object.entries(status.npcs).forEach(([id, state]) => {
+            const npc = this.npcsById[id];
+            if (npc) {
+                npc.status = state.status;
+                npc.conversation_phase = state.phase;
+                npc.resistance_level = state.resistance_level;
+            }
+        });
+        this.statusVersion = status.version;
     }
 
     showConferenceRoom() {
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Tests import the app's top-level modules and must never reach the real API
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('LLM_WARMUP', '0')
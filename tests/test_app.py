@@ -0,0 +1,132 @@
+import pytest
+
+from app import app, game_sessions
+from npc_data import NPC_IDS
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "speculation_enabled", False)
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def test_index_without_a_game_saves_nothing(client):
+    sessions = game_sessions.stats()["entries"]
+    response = client.get("/")
+    assert response.status_code == 200
+    assert b"data-new-game" in response.data
+    assert "Set-Cookie" not in response.headers
+    assert game_sessions.stats()["entries"] == sessions
+
+
+def test_index_resumes_a_started_game(client):
+    assert client.post("/api/start_game").get_json()["success"]
+    response = client.get("/")
+    assert b'id="initialState">' in response.data
+    assert b"data-new-game" not in response.data
+
+
+def test_ready_reports_an_open_circuit(client, monkeypatch):
+    from app import llm_engines, llm_guard
+
+    for engine in llm_engines.values():
+        monkeypatch.setattr(engine, "_client", object())
+    assert client.get("/ready?llm=1").get_json()["llm_breaker"] == "closed"
+    for _ in range(llm_guard.breaker.failure_threshold):
+        llm_guard.breaker.record_failure()
+    try:
+        response = client.get("/ready?llm=1")
+        assert response.status_code == 503
+        assert response.get_json()["llm"] == "degraded"
+        assert response.get_json()["llm_breaker"] == "open"
+    finally:
+        llm_guard.breaker.record_success()
+
+
+def test_batch_stops_at_the_first_failing_action(client):
+    client.post("/api/start_game")
+    version = client.get("/api/game_status?format=compact").get_json()["version"]
+    response = client.post("/api/batch", json={"since": version, "actions": [
+        {"action": "ask_giovanni", "npc_id": NPC_IDS[0]},
+        {"action": "start_conversation", "npc_id": "ninguem"},
+        {"action": "random_arguments"},
+    ]})
+    data = response.get_json()
+    assert response.status_code == 200
+    assert len(data["results"]) == 2
+    assert "phase" in data["results"][0]
+    assert data["results"][1] == {"error": "Action failed"}
+    # The status carries only the NPC the first action changed
+    assert data["status"]["delta"] and list(data["status"]["npcs"]) == [NPC_IDS[0]]
+    assert data["status"]["version"] > version
+
+
+def test_batch_rejects_malformed_parameters(client):
+    client.post("/api/start_game")
+    bad_bodies = [
+        {"actions": [{"action": "random_arguments", "count": "x"}]},
+        {"actions": [{"action": "random_arguments", "count": -1}]},
+        {"actions": [{"action": "make_argument", "npc_id": NPC_IDS[0], "argument": None}]},
+        {"actions": [{"action": "ask_giovanni", "npc_id": 3}]},
+        {"actions": [{"action": "random_arguments"}], "since": True},
+        {"actions": [{"action": "voar"}]},
+        {"actions": []},
+        ["random_arguments"],
+    ]
+    for body in bad_bodies:
+        response = client.post("/api/batch", json=body)
+        assert response.status_code == 400, body
+        assert "Traceback" not in response.get_json()["error"] and "'" not in response.get_json()["error"]
+    assert len(client.post("/api/batch", json={"actions": [{"action": "random_arguments", "count": 2}]})
+               .get_json()["results"][0]) == 2
+
+
+def test_game_status_etag_round_trip(client):
+    client.post("/api/start_game")
+    for query in ("", "?format=compact"):
+        response = client.get(f"/api/game_status{query}")
+        etag = response.headers["ETag"]
+        assert response.headers["Cache-Control"] == "no-cache"
+        again = client.get(f"/api/game_status{query}", headers={"If-None-Match": etag})
+        assert again.status_code == 304 and again.data == b""
+    compact_etag = client.get("/api/game_status?format=compact").headers["ETag"]
+    assert compact_etag != client.get("/api/game_status").headers["ETag"]
+    client.post("/api/batch", json={"actions": [{"action": "ask_giovanni", "npc_id": NPC_IDS[0]}]})
+    assert client.get("/api/game_status?format=compact", headers={"If-None-Match": compact_etag}).status_code == 200
+
+
+def test_compact_game_status_shape(client):
+    client.post("/api/start_game")
+    status = client.get("/api/game_status?format=compact").get_json()
+    assert set(status) == {"version", "game_won", "safe_count", "total_npcs", "npcs", "delta"}
+    assert not status["delta"] and set(status["npcs"]) == set(NPC_IDS)
+    assert set(status["npcs"][NPC_IDS[0]]) == {"status", "phase", "resistance_level"}
+    assert status["total_npcs"] == len(NPC_IDS)
+
+
+def test_compact_game_status_delta(client):
+    client.post("/api/start_game")
+    version = client.get("/api/game_status?format=compact").get_json()["version"]
+    assert client.get(f"/api/game_status?format=compact&since={version}").get_json()["npcs"] == {}
+    client.post("/api/batch", json={"actions": [{"action": "ask_giovanni", "npc_id": NPC_IDS[1]}]})
+    status = client.get(f"/api/game_status?format=compact&since={version}").get_json()
+    assert status["delta"] and list(status["npcs"]) == [NPC_IDS[1]]
+    assert status["version"] > version
+
+
+def test_ready_reports_every_serving_engine(client, monkeypatch):
+    import asgi
+    from app import ai_engine
+
+    monkeypatch.setattr(ai_engine, "_client", object())
+    monkeypatch.setattr(asgi.async_ai_engine, "_client", None)
+    response = client.get("/ready?llm=1")
+    assert response.status_code == 503
+    status = response.get_json()
+    assert status["llm"] == "cold"
+    assert status["llm_engines"] == {"sync": "ready", "async": "cold"}
+    monkeypatch.setattr(asgi.async_ai_engine, "_client", object())
+    assert client.get("/ready?llm=1").get_json()["llm"] == "ready"
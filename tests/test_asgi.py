@@ -0,0 +1,109 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import app as app_module
+import asgi
+from game_logic import GameState
+from npc_data import NPC_IDS
+from session_store import SQLiteSessionStore
+
+OPINION_NPC = next(npc_id for npc_id in NPC_IDS if GameState().ask_about_giovanni(npc_id)["phase"] == "ai_opinion")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), lock_timeout=0.5)
+    monkeypatch.setattr(app_module, "game_sessions", store)
+    monkeypatch.setattr(asgi, "game_sessions", store)
+    monkeypatch.setattr(app_module, "speculation_enabled", False)
+    return store
+
+
+def session_cookie(session_id):
+    serializer = app_module.app.session_interface.get_signing_serializer(app_module.app)
+    name = app_module.app.config['SESSION_COOKIE_NAME']
+    return f"{name}={serializer.dumps({'session_id': session_id})}".encode()
+
+
+def run_socket(session_id, messages):
+    """Play messages over game_socket and return every frame it sent"""
+    scope = {'type': 'websocket', 'path': '/ws', 'headers': [(b'cookie', session_cookie(session_id))]}
+    incoming = [{'type': 'websocket.connect'}]
+    incoming += [{'type': 'websocket.receive', 'text': json.dumps(message)} for message in messages]
+    incoming.append({'type': 'websocket.disconnect'})
+    frames = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        if message['type'] == 'websocket.send':
+            frames.append(json.loads(message['text']))
+
+    asyncio.run(asgi.game_socket(scope, receive, send))
+    return frames
+
+
+def test_socket_runs_game_actions_off_the_event_loop(store, monkeypatch):
+    store.set("s1", GameState())
+    threads = []
+    run_actions = asgi.run_actions
+
+    def recording_run_actions(game_state, actions):
+        threads.append(threading.current_thread())
+        return run_actions(game_state, actions)
+
+    monkeypatch.setattr(asgi, "run_actions", recording_run_actions)
+    frames = run_socket("s1", [{'id': 1, 'actions': [{'action': 'start_conversation', 'npc_id': NPC_IDS[0]},
+                                                     {'action': 'ask_giovanni', 'npc_id': NPC_IDS[0]}]}])
+
+    assert [len(frame['results']) for frame in frames] == [2]
+    assert threads and all(thread is not threading.main_thread() for thread in threads)
+    assert store.get("s1").current_npc == NPC_IDS[0]
+
+
+def test_socket_reply_is_saved_once(store, monkeypatch):
+    game_state = GameState()
+    game_state.ask_about_giovanni(OPINION_NPC)
+    store.set("s1", game_state)
+    saves = []
+    set_game = store.set
+    monkeypatch.setattr(store, "set", lambda session_id, game_state: (saves.append(1), set_game(session_id, game_state)))
+
+    async def stream(npc):
+        yield "Bolha"
+        yield " total."
+
+    monkeypatch.setattr(asgi.async_ai_engine, "stream_ai_bubble_response", stream)
+    frames = run_socket("s1", [{'id': 1, 'actions': [{'action': 'ask_ai_opinion', 'npc_id': OPINION_NPC}]}])
+
+    assert [frame.get('text') for frame in frames if frame.get('event') == 'delta'] == ["Bolha", " total."]
+    assert frames[-1]['results'][0]['response'] == "Bolha total."
+    # The phase change before streaming, then the reply: no extra save at the end of the message
+    assert len(saves) == 2
+    saved = store.get("s1")
+    assert saved.npcs[OPINION_NPC].conversation_phase != "ai_opinion"
+    assert saved.history(OPINION_NPC).entries[-1] == {"type": "ai_opinion", "response": "Bolha total."}
+
+
+def test_socket_without_a_game(store):
+    frames = run_socket("missing", [{'id': 7, 'actions': [{'action': 'random_arguments'}]}])
+    assert frames == [{'id': 7, 'error': 'No active game'}]
+
+
+def test_busy_session_lock_is_reported_without_closing_the_socket(store):
+    game_state = GameState()
+    game_state.ask_about_giovanni(OPINION_NPC)
+    store.set("s1", game_state)
+    token = store.acquire_lock("s1")
+    try:
+        frames = run_socket("s1", [{'id': 1, 'actions': [{'action': 'random_arguments'}]},
+                                   {'id': 2, 'actions': [{'action': 'ask_ai_opinion', 'npc_id': OPINION_NPC}]}])
+    finally:
+        store.release_lock("s1", token)
+    assert frames == [{'id': 1, 'error': 'Game is busy, try again'}, {'id': 2, 'error': 'Game is busy, try again'}]
+    frames = run_socket("s1", [{'id': 3, 'actions': [{'action': 'random_arguments'}]}])
+    assert frames[0]['id'] == 3 and 'results' in frames[0]
@@ -0,0 +1,64 @@
+import gzip
+
+import pytest
+
+import assets
+from app import app
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    (tmp_path / "app.0123456789.js").write_text("console.log('oi');")
+    (tmp_path / "app.0123456789.js.gz").write_bytes(gzip.compress(b"console.log('oi');"))
+    (tmp_path / "app.0123456789.js.br").write_bytes(b"br-bytes")
+    (tmp_path / "logo.0123456789.png").write_bytes(b"png")
+    (tmp_path / "plain.css").write_text("body {}")
+    monkeypatch.setattr(assets, "STATIC_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def client(static_dir):
+    return app.test_client()
+
+
+def test_fingerprinted_assets_are_immutable(client):
+    response = client.get("/static/logo.0123456789.png")
+    assert response.status_code == 200
+    cache_control = response.cache_control
+    assert cache_control.max_age == assets.IMMUTABLE_MAX_AGE
+    assert cache_control.immutable and cache_control.public
+    assert "Content-Encoding" not in response.headers
+
+
+def test_precompressed_variant_follows_accept_encoding(client):
+    brotli = client.get("/static/app.0123456789.js", headers={"Accept-Encoding": "gzip, br"})
+    assert brotli.headers["Content-Encoding"] == "br" and brotli.data == b"br-bytes"
+    assert brotli.mimetype in ("text/javascript", "application/javascript")
+    assert "Accept-Encoding" in brotli.headers["Vary"]
+
+    gzipped = client.get("/static/app.0123456789.js", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(gzipped.data) == b"console.log('oi');"
+
+    identity = client.get("/static/app.0123456789.js", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers and identity.data == b"console.log('oi');"
+    assert "Accept-Encoding" in identity.headers["Vary"]
+
+
+def test_other_assets_revalidate(client):
+    response = client.get("/static/plain.css", headers={"Accept-Encoding": "gzip, br"})
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+    assert not response.cache_control.immutable
+    assert "Content-Encoding" not in response.headers
+    etag = response.headers["ETag"]
+    again = client.get("/static/plain.css", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+
+def test_asset_url_uses_the_manifest(monkeypatch):
+    monkeypatch.setattr(assets, "_manifest", {"css/style.css": "css/style.0123456789.css"})
+    with app.test_request_context():
+        assert assets.asset_url("css/style.css") == "/static/build/css/style.0123456789.css"
+        assert assets.asset_url("js/other.js") == "/static/js/other.js"
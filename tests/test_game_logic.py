@@ -0,0 +1,56 @@
+import random
+
+from game_logic import GameState
+from npc_data import ARGUMENTS, NPC_IDS
+from scoring import REPEAT_PENALTY, argument_scorer
+
+CATALOGUE = [arg["text"] for arg in ARGUMENTS if not arg.get("special")]
+
+
+def arguing_game(resistance: int = 1000) -> GameState:
+    game_state = GameState()
+    npc = game_state.npcs[NPC_IDS[0]]
+    npc.conversation_phase = "argument_phase"
+    npc.status = "needs_convincing"
+    npc.resistance_level = resistance
+    return game_state
+
+
+def test_arguments_used_is_bounded_by_the_catalogue():
+    random.seed(1)
+    game_state = arguing_game()
+    for i in range(500):
+        game_state.make_argument(NPC_IDS[0], random.choice(CATALOGUE + [f"qualquer coisa {i}"]))
+    arguments_used = game_state.npcs[NPC_IDS[0]].arguments_used
+    assert len(arguments_used) == len(set(arguments_used)) <= len(CATALOGUE)
+    assert set(arguments_used) <= set(CATALOGUE)
+
+
+def test_gibberish_is_not_recorded():
+    game_state = arguing_game()
+    game_state.make_argument(NPC_IDS[0], "!!! ???")
+    assert game_state.npcs[NPC_IDS[0]].arguments_used == ()
+
+
+def test_rephrased_argument_counts_as_repeated():
+    npc_id = NPC_IDS[0]
+    first = argument_scorer.evaluate(npc_id, CATALOGUE[0], 1)
+    again = argument_scorer.evaluate(npc_id, CATALOGUE[0].lower() + "!", 1, used=(CATALOGUE[0],))
+    assert again["argument"] == CATALOGUE[0]
+    assert again["chance"] < first["chance"]
+    assert argument_scorer.evaluate(npc_id, CATALOGUE[0], 1, repeated=True)["chance"] == \
+        argument_scorer.evaluate(npc_id, CATALOGUE[0], 1, used=(CATALOGUE[0],))["chance"]
+    assert REPEAT_PENALTY < 1
+
+
+def test_argument_at_zero_resistance_convinces():
+    game_state = arguing_game(resistance=0)
+    result = game_state.make_argument(NPC_IDS[0], CATALOGUE[0])
+    assert result["success"] and result["status"] == "safe"
+    assert game_state.get_compact_status()["npcs"][NPC_IDS[0]]["phase"] == "safe"
+
+
+def test_scorer_is_imported_once():
+    from game_logic import get_argument_scorer
+
+    assert get_argument_scorer() is get_argument_scorer() is argument_scorer
@@ -0,0 +1,53 @@
+import history
+from game_logic import GameState
+from history import HISTORY_SIZE, SUMMARY_MAX_CHARS, ConversationHistory, summarize_entry
+from npc_data import NPC_IDS
+
+
+def message(i: int) -> dict:
+    return {"type": "user_message", "message": f"mensagem {i}"}
+
+
+def test_ring_keeps_the_latest_entries_and_summarizes_the_rest():
+    conversation = ConversationHistory(message(i) for i in range(HISTORY_SIZE + 2))
+    assert [entry["message"] for entry in conversation] == \
+        [f"mensagem {i}" for i in range(2, HISTORY_SIZE + 2)]
+    assert conversation.summary.split("\n") == [summarize_entry(message(0)), summarize_entry(message(1))]
+
+
+def test_entries_without_a_summary_line_are_dropped():
+    conversation = ConversationHistory([{"type": "unknown"}] + [message(i) for i in range(HISTORY_SIZE)])
+    assert len(conversation) == HISTORY_SIZE
+    assert conversation.summary == ""
+
+
+def test_summary_drops_its_oldest_lines_past_the_cap():
+    conversation = ConversationHistory({"type": "user_message", "message": f"{i} " + "x" * 200}
+                                       for i in range(HISTORY_SIZE + 20))
+    lines = conversation.summary.split("\n")
+    assert len(conversation.summary) <= SUMMARY_MAX_CHARS
+    assert lines[-1].startswith('O jogador disse: "19 ')
+    assert all(len(line) < 120 for line in lines)
+
+
+def test_long_quotes_are_shortened():
+    line = summarize_entry({"type": "ai_response", "response": "palavra " * 50})
+    assert line.endswith('..."') and len(line) < history.QUOTE_MAX_CHARS + 20
+
+
+def test_history_survives_the_snapshot_and_dict_formats():
+    game_state = GameState()
+    for i in range(HISTORY_SIZE + 3):
+        game_state.history(NPC_IDS[0]).append(message(i))
+    original = game_state.history(NPC_IDS[0])
+    for restored in (GameState.from_bytes(game_state.to_bytes()), GameState.from_dict(game_state.to_dict())):
+        conversation = restored.history(NPC_IDS[0])
+        assert list(conversation) == list(original)
+        assert conversation.summary == original.summary
+        conversation.append(message(99))
+        assert len(conversation) == HISTORY_SIZE
+
+
+def test_plain_entry_lists_from_older_saves_are_bounded():
+    conversation = ConversationHistory.from_dict([message(i) for i in range(HISTORY_SIZE + 1)])
+    assert len(conversation) == HISTORY_SIZE and conversation.summary
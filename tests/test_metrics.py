@@ -0,0 +1,64 @@
+import re
+
+from metrics import Registry
+
+# name{labels} value, as in the Prometheus text exposition format
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*"'
+                    r'(,[a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*")*\})? -?[0-9.e+-]+$')
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("t_seconds", "Test", ("route",), buckets=(0.1, 1))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP t_seconds Test", "# TYPE t_seconds histogram"]
+    assert lines[2:] == [
+        't_seconds_bucket{route="/a",le="0.1"} 1',
+        't_seconds_bucket{route="/a",le="1.0"} 2',
+        't_seconds_bucket{route="/a",le="+Inf"} 3',
+        't_seconds_sum{route="/a"} 5.55',
+        't_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("t_total", "Test", ("npc",)).inc('a"b\\c\n')
+    assert 't_total{npc="a\\"b\\\\c\\n"} 1' in registry.render()
+
+
+def test_register_stats_exports_counters_gauges_and_states():
+    registry = Registry()
+    registry.register_stats("t", lambda: {"hits": 3, "size": 2.5, "breaker": {"state": "open"}},
+                            counters=("hits",))
+    lines = registry.render().splitlines()
+    assert lines == [
+        "# TYPE t_hits_total counter", "t_hits_total 3",
+        "# TYPE t_size gauge", "t_size 2.5",
+        "# TYPE t_breaker_state gauge", 't_breaker_state{state="open"} 1',
+    ]
+
+
+def test_failing_stats_do_not_break_the_scrape():
+    registry = Registry()
+    registry.register_stats("broken", lambda: 1 / 0)
+    registry.register_stats("t", lambda: {"n": 1})
+    assert registry.render() == "# TYPE t_n gauge\nt_n 1\n"
+
+
+def test_metrics_endpoint_scrape():
+    from app import app
+
+    client = app.test_client()
+    client.get("/ready")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'chicoteia_http_request_duration_seconds_count{route="/ready",method="GET",status="200"}' in body
+    assert "# TYPE chicoteia_llm_scheduler_admitted_total counter" in body
+    for line in body.splitlines():
+        assert line.startswith("# HELP ") or line.startswith("# TYPE ") or SAMPLE.match(line), line
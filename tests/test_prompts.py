@@ -0,0 +1,143 @@
+import pytest
+
+from prompts import PHASES, STATUSES, PromptLibrary
+
+SAMPLE = {
+    "id": "ana", "name": "Ana Lima", "role": "Engenheira de Dados",
+    "personality": "Pragmática e direta.", "bio": "Dez anos com pipelines de dados.",
+    "knows_giovanni": True, "giovanni_relationship": "Trabalhou com ele numa fintech.",
+    "ai_bubble_stance": "bubble",
+}
+
+GOLDEN_ARGUMENT_PROMPT = """Você é Ana Lima, um(a) Engenheira de Dados numa conferência de tecnologia.
+
+PERSONALIDADE: Pragmática e direta.
+BACKGROUND: Dez anos com pipelines de dados.
+
+REGRAS IMPORTANTES DO JOGO:
+- Você está numa conferência de tecnologia para desenvolvedores backend e frontend
+- Mantenha-se no personagem Ana Lima o tempo todo
+- Mantenha respostas com no máximo 40 palavras - seja conciso!
+- Não quebre a quarta parede ou mencione que isso é um jogo
+- RESPONDA SEMPRE EM PORTUGUÊS BRASILEIRO
+- Suas opiniões sobre IA devem ser consistentes com sua posição declarada abaixo
+
+POSIÇÃO SOBRE IA: Você acredita que o mercado de IA está numa bolha especulativa. Seja cético sobre as avaliações e hype da IA, mas não seja hostil.
+
+CONTEXTO ATUAL:
+- Você atualmente acha que IA é uma bolha
+- Você está aberto a ouvir argumentos mas um pouco cético
+- Você precisa de 2 argumentos bons a mais para mudar de opinião"""
+
+
+def legacy_stance(npc):
+    """AIEngine._get_ai_stance_description before the prompts were precompiled"""
+    status = npc.get('status', 'unknown')
+    ai_stance = npc.get('ai_bubble_stance', 'bubble')
+    if status == 'safe':
+        return "Você foi convencido de que IA não é uma bolha e está criando valor real. Seja otimista sobre o futuro da IA."
+    elif ai_stance == 'bubble':
+        return "Você acredita que o mercado de IA está numa bolha especulativa. Seja cético sobre as avaliações e hype da IA, mas não seja hostil."
+    else:
+        return "Você acredita que IA não é uma bolha e está criando valor real. Seja otimista sobre o potencial da IA."
+
+
+def legacy_system_prompt(npc):
+    """AIEngine._build_system_prompt before the prompts were precompiled"""
+    base_prompt = f"""Você é {npc['name']}, um(a) {npc['role']} numa conferência de tecnologia. 
+
+PERSONALIDADE: {npc['personality']}
+BACKGROUND: {npc['bio']}
+
+POSIÇÃO SOBRE IA: {legacy_stance(npc)}
+
+REGRAS IMPORTANTES DO JOGO:
+- Você está numa conferência de tecnologia para desenvolvedores backend e frontend
+- Mantenha-se no personagem {npc['name']} o tempo todo
+- Mantenha respostas com no máximo 40 palavras - seja conciso!
+- Não quebre a quarta parede ou mencione que isso é um jogo
+- RESPONDA SEMPRE EM PORTUGUÊS BRASILEIRO
+- Suas opiniões sobre IA devem ser consistentes com sua posição declarada acima
+"""
+    phase = npc.get('conversation_phase', 'initial')
+    if phase == 'initial':
+        base_prompt += "\n- Esta é sua primeira interação com esta pessoa\n- Seja amigável e profissional"
+    elif phase == 'giovanni_check':
+        if npc['knows_giovanni']:
+            base_prompt += f"\n- Você conhece Giovanni e já trabalhou com ele antes\n- Você deve ficar curioso sobre por que estão perguntando sobre Giovanni"
+        else:
+            base_prompt += f"\n- Você não conhece ninguém chamado Giovanni\n- Você deve expressar que não reconhece o nome"
+    elif phase == 'ai_opinion':
+        base_prompt += f"\n- Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', 'Você conhece Giovanni.')}"
+        if npc['ai_bubble_stance'] == 'bubble':
+            base_prompt += f"\n- Você acredita que o mercado de IA está numa bolha\n- Expresse ceticismo sobre as avaliações e hype da IA\n- Referencie sua experiência com Giovanni se relevante\n- Seja específico sobre por que acha que é uma bolha"
+        else:
+            base_prompt += f"\n- Você acredita que IA não é bolha mas está criando valor real\n- Seja otimista sobre o potencial da IA\n- Referencie sua experiência positiva com Giovanni se relevante\n- Dê exemplos específicos de valor real da IA"
+    elif phase == 'argument_phase':
+        base_prompt += f"\n- Você atualmente acha que IA é uma bolha\n- Você está aberto a ouvir argumentos mas um pouco cético\n- Você precisa de {npc.get('resistance_level', 1)} argumentos bons a mais para mudar de opinião"
+    elif phase == 'safe':
+        base_prompt += f"\n- Você foi convencido de que IA não é uma bolha\n- Seja positivo sobre a conversa e o futuro da IA"
+    return base_prompt
+
+
+def legacy_bubble_prompt(npc):
+    """User prompt of AIEngine._build_ai_bubble_messages before the prompts were precompiled"""
+    if npc['ai_bubble_stance'] == 'bubble':
+        return f"""Como {npc['name']}, dê sua opinião sobre se o mercado de IA é uma bolha. 
+            Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', '')}
+            Você acredita que É uma bolha. Seja específico mas muito breve.
+            Mantenha sob 40 palavras e permaneça no personagem como {npc['role']}."""
+    return f"""Como {npc['name']}, dê sua opinião sobre se o mercado de IA é uma bolha.
+            Seu relacionamento com Giovanni: {npc.get('giovanni_relationship', '')}
+            Você acredita que NÃO é uma bolha. Dê exemplos breves de valor real da IA.
+            Mantenha sob 40 palavras e permaneça no personagem como {npc['role']}."""
+
+
+def lines(text):
+    """Sorted non-empty lines, stripped: the new layout reorders them, says
+    "below" where the old one said "above" and adds a heading"""
+    text = text.replace("declarada acima", "declarada abaixo")
+    return sorted(line.strip() for line in text.split("\n") if line.strip() and line.strip() != "CONTEXTO ATUAL:")
+
+
+@pytest.fixture(params=[
+    SAMPLE,
+    dict(SAMPLE, knows_giovanni=False, ai_bubble_stance="not_bubble"),
+])
+def npc(request):
+    return request.param
+
+
+def test_golden_argument_phase_prompt():
+    library = PromptLibrary([SAMPLE])
+    npc = dict(SAMPLE, conversation_phase="argument_phase", status="needs_convincing", resistance_level=2)
+    assert library.system_prompt(npc) == GOLDEN_ARGUMENT_PROMPT
+
+
+def test_system_prompts_keep_every_instruction_of_the_inline_version(npc):
+    library = PromptLibrary([npc])
+    for phase in PHASES:
+        for status in STATUSES:
+            state = dict(npc, conversation_phase=phase, status=status, resistance_level=3)
+            assert lines(library.system_prompt(state)) == lines(legacy_system_prompt(state)), (phase, status)
+
+
+def test_opinion_request_matches_the_inline_version(npc):
+    library = PromptLibrary([npc])
+    for status in STATUSES:
+        state = dict(npc, status=status)
+        system, user = library.ai_bubble_messages(state)
+        assert [line.strip() for line in user["content"].split("\n")] == \
+            [line.strip() for line in legacy_bubble_prompt(state).split("\n")]
+        assert legacy_stance(state) in system["content"]
+
+
+def test_prompts_share_the_npc_prefix(npc):
+    library = PromptLibrary([npc])
+    prefix = library.system_prompt(dict(npc, conversation_phase="initial"))
+    prefix = prefix[:prefix.index("POSIÇÃO SOBRE IA:")]
+    state = dict(npc, conversation_phase="ai_opinion", status="needs_convincing")
+    assert library.system_prompt(state).startswith(prefix)
+    assert library.ai_bubble_messages(state)[0]["content"].startswith(prefix)
+    assert library.custom_system_prompt(state).startswith(prefix)
+    assert npc["giovanni_relationship"] in library.custom_system_prompt(state)
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, UpstreamGuard
+
+
+def half_open_breaker(**kwargs) -> CircuitBreaker:
+    """A breaker whose cool-down is over: the next allow() starts the trial call"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0, **kwargs)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_single_trial_while_half_open():
+    breaker = half_open_breaker()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = half_open_breaker()
+    assert breaker.allow()
+    breaker.reset_timeout = 60.0
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_released_trial_lets_the_next_call_through():
+    breaker = half_open_breaker()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_stale_trial_expires():
+    breaker = half_open_breaker(trial_timeout=0.05)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_release_is_a_no_op_when_closed():
+    breaker = CircuitBreaker()
+    breaker.release()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_call_short_circuits_while_open():
+    guard = UpstreamGuard(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60.0), hedge_percentile=0)
+    guard.breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        guard.call(lambda timeout: "never")
+    assert guard.stats()["short_circuits"] == 1
+
+
+def test_call_retries_then_opens():
+    guard = UpstreamGuard(retries=1, backoff=0.0, hedge_percentile=0,
+                          breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60.0))
+
+    def attempt(timeout):
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        guard.call(attempt)
+    stats = guard.stats()
+    assert stats["retries"] == 1
+    assert stats["failures"] == 1
+    assert stats["breaker"]["state"] == "open"
+
+
+def test_cancelled_acall_releases_the_trial():
+    guard = UpstreamGuard(breaker=half_open_breaker(), hedge_percentile=0)
+
+    async def attempt(timeout):
+        await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.ensure_future(guard.acall(attempt))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert guard.breaker.state == "half_open"
+    assert guard.breaker.allow()
+
+
+def chunk(text=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text else []
+    return SimpleNamespace(choices=choices, usage=None)
+
+
+class FakeCompletions:
+    def create(self, **kwargs):
+        return iter([chunk("Olá"), chunk(", tudo"), chunk(" bem?")])
+
+
+@pytest.fixture
+def trial_guard(monkeypatch):
+    """Put the shared guard's breaker in half-open state for the test"""
+    from resilience import llm_guard
+    monkeypatch.setattr(llm_guard, "breaker", half_open_breaker())
+    return llm_guard
+
+
+def fake_engine():
+    from ai_engine import AIEngine
+    engine = AIEngine()
+    engine._client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+    return engine
+
+
+def test_abandoned_stream_releases_the_trial(trial_guard):
+    calls = trial_guard.stats()["calls"]
+    stream = fake_engine()._stream_completion([], temperature=0.7, fallback=lambda: "fallback")
+    assert next(stream) == "Olá"
+    assert not trial_guard.breaker.allow()
+    stream.close()  # The player disconnected
+    assert trial_guard.breaker.allow()
+    assert trial_guard.stats()["calls"] == calls + 1
+
+
+def test_finished_stream_closes_the_breaker(trial_guard):
+    stream = fake_engine()._stream_completion([], temperature=0.7, fallback=lambda: "fallback")
+    assert "".join(stream) == "Olá, tudo bem?"
+    assert trial_guard.breaker.state == "closed"
@@ -0,0 +1,67 @@
+import response_cache
+from response_cache import ResponseCache, prompt_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_miss_then_hit_while_variants_fill_up():
+    cache = ResponseCache(variants=2)
+    assert cache.get("k") == (None, False)
+    cache.add("k", "a")
+    assert cache.get("k") == ("a", True)
+    # Only one caller refreshes a key at a time
+    assert cache.get("k") == ("a", False)
+    cache.add("k", "b")
+    response, refresh = cache.get("k")
+    assert response in ("a", "b") and not refresh
+    assert cache.stats() == {"keys": 1, "responses": 2, "hits": 3, "misses": 1, "refreshes": 1}
+
+
+def test_oldest_variant_is_dropped_beyond_the_limit():
+    cache = ResponseCache(variants=2)
+    for response in ("a", "b", "c"):
+        cache.add("k", response)
+    assert {cache.get("k")[0] for _ in range(50)} == {"b", "c"}
+
+
+def test_stale_entry_asks_for_a_refresh(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock.time)
+    cache = ResponseCache(variants=1, max_age=60)
+    cache.add("k", "a")
+    assert cache.get("k") == ("a", False)
+    clock.now += 61
+    # Stale responses are still served while the refresh runs
+    assert cache.get("k") == ("a", True)
+    cache.add("k", "b")
+    assert cache.get("k") == ("b", False)
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_failed_refresh_lets_another_caller_retry():
+    cache = ResponseCache(variants=3)
+    cache.add("k", "a")
+    assert cache.get("k")[1]
+    assert not cache.get("k")[1]
+    cache.refresh_failed("k")
+    assert cache.get("k")[1]
+    assert cache.stats()["refreshes"] == 2
+
+
+def test_cache_file_round_trip(tmp_path):
+    cache = ResponseCache(variants=3)
+    key = prompt_key([{"role": "user", "content": "Bolha?"}])
+    cache.add(key, "Sim", label="maria")
+    cache.add(key, "Talvez", label="maria")
+    path = str(tmp_path / "cache.json")
+    cache.save(path)
+    loaded = ResponseCache(variants=3)
+    assert loaded.load(path) == 2
+    assert loaded.stats()["responses"] == 2
+    assert prompt_key([{"content": "Bolha?", "role": "user"}]) == key
@@ -0,0 +1,53 @@
+from resilience import CircuitBreaker, llm_guard
+from router import ResponseRouter
+
+NPC = {"id": "maria", "name": "Maria Silva", "status": "needs_convincing", "conversation_phase": "argument_phase"}
+
+
+def test_small_talk_gets_a_template():
+    router = ResponseRouter()
+    assert router.choose(NPC, "Oi, tudo bem?") == ("template", "greeting")
+    assert router.choose(NPC, "valeu Maria!") == ("template", "thanks")
+    assert router.choose(NPC, "kkkkk") == ("template", "laugh")
+    assert router.template_reply(NPC, "greeting").endswith("Me convença do contrário!")
+
+
+def test_without_a_local_endpoint_everything_else_is_remote():
+    router = ResponseRouter()
+    assert router.choose(NPC, "Onde você trabalha?") == ("remote", None)
+
+
+def test_short_messages_go_local_and_long_ones_remote():
+    router = ResponseRouter(local_base_url="http://local", local_max_chars=20)
+    assert router.choose(NPC, "Onde você trabalha?") == ("local", None)
+    assert router.choose(NPC, "Onde você trabalha atualmente, e faz quanto tempo?") == ("remote", None)
+
+
+def test_local_failures_trip_its_breaker():
+    router = ResponseRouter(local_base_url="http://local",
+                            local_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    router.record_local(True, router.latency_budget + 1)
+    router.record_local(False, 0.1)
+    assert router.choose(NPC, "Onde você trabalha?") == ("remote", None)
+    assert router.stats()["local_errors"] == 1
+
+
+def test_open_remote_circuit_sends_everything_local():
+    router = ResponseRouter(local_base_url="http://local", local_max_chars=5)
+    for _ in range(llm_guard.breaker.failure_threshold):
+        llm_guard.breaker.record_failure()
+    try:
+        assert router.choose(NPC, "Onde você trabalha atualmente?") == ("local", None)
+    finally:
+        llm_guard.breaker.record_success()
+
+
+def test_turns_are_counted_by_the_tier_that_answered():
+    router = ResponseRouter(local_base_url="http://local", local_max_chars=40)
+    assert router.route(NPC, "Onde você trabalha?") == ("local", None)
+    router.record_local(True, 0.1)
+    assert router.route(NPC, "E o que acha de Rust?") == ("local", None)
+    router.record_local(False, 0.1)
+    router.route(NPC, "oi")
+    stats = router.stats()
+    assert (stats["template"], stats["local"], stats["remote"], stats["local_errors"]) == (1, 1, 1, 1)
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import LLMScheduler, RateLimited, SlotsBusy, current_session, speculative
+from speculation import Speculator, speculated_result
+
+
+def test_concurrency_cap_queues_extra_calls():
+    scheduler = LLMScheduler(max_concurrent=1, session_rate=0, queue_timeout=0.05)
+    with scheduler.slot("a"):
+        with pytest.raises(Exception):
+            with scheduler.slot("b"):
+                pass
+    assert scheduler.stats()["queue_timeouts"] == 1
+
+
+def test_token_bucket_limits_a_session():
+    scheduler = LLMScheduler(max_concurrent=4, session_rate=0.01, session_burst=2)
+    for _ in range(2):
+        with scheduler.slot("a"):
+            pass
+    with pytest.raises(RateLimited):
+        with scheduler.slot("a"):
+            pass
+    with scheduler.slot("b"):
+        pass
+
+
+def test_queued_sessions_are_served_round_robin():
+    scheduler = LLMScheduler(max_concurrent=1, session_rate=0, queue_timeout=5)
+    order = []
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot("holder"):
+            release.wait()
+
+    def call(session):
+        with scheduler.slot(session):
+            order.append(session)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.05)
+    threads = []
+    for session in ("a", "a", "a", "b"):
+        thread = threading.Thread(target=call, args=(session,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+    release.set()
+    for thread in [holder] + threads:
+        thread.join(5)
+    assert order[:2] == ["a", "b"]
+
+
+def test_speculative_calls_do_not_spend_the_session_bucket():
+    scheduler = LLMScheduler(max_concurrent=4, session_rate=0.01, session_burst=1)
+    token = speculative.set(True)
+    try:
+        with scheduler.slot("a"):
+            pass
+    finally:
+        speculative.reset(token)
+    with scheduler.slot("a"):
+        pass
+    assert scheduler.stats()["speculative_admitted"] == 1
+
+
+def test_speculative_calls_never_queue():
+    scheduler = LLMScheduler(max_concurrent=1, session_rate=0)
+    with scheduler.slot("a"):
+        token = speculative.set(True)
+        try:
+            with pytest.raises(SlotsBusy):
+                with scheduler.slot("b"):
+                    pass
+        finally:
+            speculative.reset(token)
+    assert scheduler.stats()["speculative_skipped"] == 1
+
+
+def test_speculation_waiting_for_a_worker_is_not_joined():
+    speculator = Speculator(max_workers=1)
+    gate = threading.Event()
+    speculator.start("busy", gate.wait)
+    speculator.start("key", lambda: "resposta")
+    try:
+        assert speculator.take("key") is None
+        assert speculator.stats()["misses"] == 1
+    finally:
+        gate.set()
+
+
+def test_joined_speculation_turned_away_makes_the_players_call():
+    speculator = Speculator(max_workers=1)
+    started, gate = threading.Event(), threading.Event()
+
+    def call():
+        assert speculative.get() and current_session.get() == "a"
+        started.set()
+        gate.wait()
+        raise SlotsBusy("busy")
+
+    token = current_session.set("a")
+    try:
+        speculator.start("key", call)
+    finally:
+        current_session.reset(token)
+    assert started.wait(1)
+    future = speculator.take("key")
+    assert future is not None and speculator.stats()["joined"] == 1
+    gate.set()
+    assert speculated_result(future, lambda: "chamada", lambda: "fallback") == "chamada"
+
+
+def test_speculative_calls_do_not_share_a_flight_with_requests(monkeypatch):
+    import ai_engine
+
+    keys = []
+    monkeypatch.setattr(ai_engine.llm_flight, "do", lambda key, fn: keys.append(key))
+    engine = ai_engine.AIEngine()
+    messages = [{"role": "user", "content": "oi"}]
+    engine._request_completion(messages, 0.7)
+    token = speculative.set(True)
+    try:
+        engine._request_completion(messages, 0.7)
+    finally:
+        speculative.reset(token)
+    assert keys[0] != keys[1]
+
+
+def test_bucket_table_stays_bounded_when_every_bucket_is_recent(monkeypatch):
+    import scheduler
+
+    monkeypatch.setattr(scheduler, "MAX_BUCKETS", 100)
+    llm = LLMScheduler(max_concurrent=4, session_rate=0.01, session_burst=2)
+    for session in range(250):
+        with llm.slot(session):
+            pass
+    assert llm.stats()["sessions"] <= 100
+    # The most recent sessions keep their buckets
+    with llm.slot(249):
+        pass
+    with pytest.raises(RateLimited):
+        with llm.slot(249):
+            pass
@@ -0,0 +1,44 @@
+import gc
+import weakref
+
+import scoring
+from npc_data import ARGUMENTS
+from scoring import ArgumentScorer, argument_scorer, cached_features, features
+
+CATALOGUE = [arg["text"] for arg in ARGUMENTS if not arg.get("special", False)]
+
+
+def test_rephrased_argument_matches_the_catalogue():
+    text = CATALOGUE[0]
+    argument, similarity = argument_scorer.match(text.upper().replace("a", "á", 1) + "!!")
+    assert argument["text"] == text
+    assert similarity > scoring.MATCH_THRESHOLD
+
+
+def test_gibberish_never_lands():
+    assert argument_scorer.evaluate("x", "   ", 3)["chance"] == 0.0
+
+
+def test_feature_cache_is_bounded_and_keyed_by_digest(monkeypatch):
+    monkeypatch.setattr(scoring, "FEATURE_CACHE_SIZE", 8)
+    for i in range(50):
+        cached_features(f"mensagem numero {i}")
+    assert len(scoring._feature_cache) <= 8
+    assert all(isinstance(key, bytes) and len(key) == 16 for key in scoring._feature_cache)
+    assert cached_features("Olá, Mundo!") is cached_features("ola mundo")
+    assert cached_features("ola mundo") == features("ola mundo")
+
+
+def test_long_messages_are_not_cached():
+    size = len(scoring._feature_cache)
+    cached_features("ia " * scoring.FEATURE_CACHE_MAX_CHARS)
+    assert len(scoring._feature_cache) == size
+
+
+def test_cache_does_not_keep_a_scorer_alive():
+    scorer = ArgumentScorer()
+    assert scorer.evaluate("x", CATALOGUE[1], 1)["argument"] == CATALOGUE[1]
+    ref = weakref.ref(scorer)
+    del scorer
+    gc.collect()
+    assert ref() is None
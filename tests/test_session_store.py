@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from game_logic import GameState
+from npc_data import NPC_IDS
+from session_store import MemorySessionStore, SQLiteSessionStore, approximate_size
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), lock_timeout=0.2, lock_lease=30.0)
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_entries=2)
+    for session_id in ("a", "b"):
+        store.set(session_id, GameState())
+    store.get("a")
+    store.set("c", GameState())
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_size_estimate_counts_the_conversation_history():
+    game_state = GameState()
+    before = approximate_size(game_state)
+    for i in range(3):
+        game_state.history(NPC_IDS[0]).append({"type": "user_message", "message": f"{i}" * 5000})
+    assert approximate_size(game_state) - before > 15000
+
+
+def test_memory_store_expires_idle_sessions():
+    store = MemorySessionStore(idle_ttl=0.01)
+    store.set("a", GameState())
+    time.sleep(0.02)
+    assert store.get("a") is None
+    assert store.stats()["expirations"] == 1
+
+
+def test_sqlite_store_round_trip(sqlite_store):
+    game_state = GameState()
+    game_state.ask_about_giovanni(NPC_IDS[0])
+    sqlite_store.set("a", game_state)
+    loaded = sqlite_store.get("a")
+    assert loaded is not game_state
+    assert loaded.to_dict() == game_state.to_dict()
+    assert sqlite_store.get("missing") is None
+
+
+def test_sqlite_store_cleanup_bounds_entries(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_entries=10)
+    for i in range(100):
+        store.set(str(i), GameState())
+    assert len(store) == 10
+    assert store.stats()["evictions"] == 90
+
+
+def test_sqlite_lock_is_exclusive_across_connections(sqlite_store):
+    token = sqlite_store.acquire_lock("a")
+    waited = []
+
+    def other_worker():
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            sqlite_store.acquire_lock("a")  # A thread has its own connection, like another worker
+        waited.append(time.monotonic() - start)
+
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    thread.join()
+    assert waited[0] >= sqlite_store.lock_timeout
+    sqlite_store.release_lock("a", token)
+    sqlite_store.release_lock("a", sqlite_store.acquire_lock("a"))
+
+
+def test_sqlite_expired_lease_can_be_taken_over(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), lock_timeout=0.0, lock_lease=0.2)
+    stale = store.acquire_lock("a")  # Never released: its worker crashed
+    with pytest.raises(TimeoutError):
+        store.acquire_lock("a")
+    time.sleep(0.25)
+    owner = store.acquire_lock("a")
+    # Releasing the expired lease must not free the new owner's
+    store.release_lock("a", stale)
+    with pytest.raises(TimeoutError):
+        store.acquire_lock("a")
+    store.release_lock("a", owner)
+    assert store.acquire_lock("a") is not None
+
+
+def test_llm_wait_does_not_hold_the_session_lock(sqlite_store, monkeypatch):
+    """A change saved by another request during the LLM wait is kept, and the lock is free meanwhile"""
+    npc_id = next(npc_id for npc_id in NPC_IDS
+                  if GameState().ask_about_giovanni(npc_id)["phase"] == "ai_opinion")
+    other_npc = next(other for other in NPC_IDS if other != npc_id)
+    monkeypatch.setattr(app_module, "game_sessions", sqlite_store)
+    monkeypatch.setattr(app_module, "speculation_enabled", False)
+    client = app_module.app.test_client()
+    client.post("/api/start_game")
+    client.post(f"/api/ask_giovanni/{npc_id}")
+    session_id = next(iter(sqlite_store._connection().execute("SELECT session_id FROM sessions")))[0]
+
+    def other_request():
+        with sqlite_store.lock(session_id):
+            game_state = sqlite_store.get(session_id)
+            game_state.start_conversation(other_npc)
+            sqlite_store.set(session_id, game_state)
+
+    def generate(npc):
+        thread = threading.Thread(target=other_request)
+        thread.start()
+        thread.join()
+        return "Acho que é bolha."
+
+    monkeypatch.setattr(app_module.ai_engine, "generate_ai_bubble_response", generate)
+    response = client.post(f"/api/ask_ai_opinion/{npc_id}").get_json()
+    assert response["response"] == "Acho que é bolha."
+
+    saved = sqlite_store.get(session_id)
+    assert saved.current_npc == other_npc
+    assert saved.history(npc_id).entries[-1] == {"type": "ai_opinion", "response": "Acho que é bolha."}
+    assert saved.npcs[npc_id].conversation_phase != "ai_opinion"
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+import pytest
+
+from singleflight import SingleFlight, request_key
+
+
+def test_request_key_ignores_param_order():
+    messages = [{"role": "user", "content": "oi"}]
+    assert request_key("m", messages, a=1, b=2) == request_key("m", messages, b=2, a=1)
+    assert request_key("m", messages, a=1) != request_key("m", messages, a=2)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "resposta"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", fn))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()["executed"] + flight.stats()["saved"] < 5:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["resposta"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "saved": 4}
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("down")
+
+    async def main():
+        return await asyncio.gather(flight.ado("k", fn), flight.ado("k", fn), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert flight.stats()["executed"] == 1
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "resposta"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("k", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("k", fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()  # The leader's client disconnected
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "resposta"
+    assert len(calls) == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_call_is_cancelled_when_every_waiter_leaves():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        waiters = [asyncio.ensure_future(flight.ado("k", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        # A new request after that starts a fresh call
+        return await flight.ado("k", lambda: asyncio.sleep(0, result="nova"))
+
+    assert asyncio.run(main()) == "nova"
+    assert cancelled == [1]
+    assert flight.stats() == {"in_flight": 0, "executed": 2, "saved": 1}
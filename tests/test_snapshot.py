@@ -0,0 +1,85 @@
+import struct
+
+import pytest
+
+import snapshot
+from game_logic import NPC_LAYOUT_V1, SECTION_GAME, SECTION_NPCS, GameState
+from npc_data import NPC_IDS, NPC_RECORDS
+from snapshot import SnapshotReader, SnapshotWriter
+
+
+def played_game() -> GameState:
+    game_state = GameState()
+    for npc_id in NPC_IDS[:3]:
+        game_state.start_conversation(npc_id)
+        game_state.ask_about_giovanni(npc_id)
+        game_state.ask_ai_bubble_opinion(npc_id)
+        if game_state.npcs[npc_id].conversation_phase == "argument_phase":
+            game_state.make_argument(npc_id, "chicoteia")
+    return game_state
+
+
+def assert_same(a: GameState, b: GameState):
+    assert a.to_dict() == b.to_dict()
+
+
+def test_round_trip():
+    game_state = played_game()
+    assert_same(GameState.from_bytes(game_state.to_bytes()), game_state)
+    assert_same(GameState.from_dict(game_state.to_dict()), game_state)
+
+
+def test_round_trip_past_16_bit_fields():
+    """Counts, references and numbers that did not fit the fixed-width format 1 records"""
+    game_state = GameState()
+    npc = game_state.npcs[NPC_IDS[0]]
+    npc.arguments_used = tuple(f"argumento {i}" for i in range(70000))
+    npc.resistance_level = 300
+    npc.version = game_state.version = 2 ** 40
+    assert_same(GameState.from_bytes(game_state.to_bytes()), game_state)
+
+
+def test_reads_format_1(monkeypatch):
+    npc_id = NPC_IDS[0]
+
+    def write_game(w):
+        w.string("abc123")
+        w.varint(7)
+        w.string(npc_id)
+        w.flags(False)
+
+    def write_npcs(w):
+        w.varint(1)
+        w.pack(NPC_LAYOUT_V1, w.ref(npc_id), w.ref("needs_convincing"), w.ref("argument_phase"), 1, 7, 1, 2)
+        w.pack(struct.Struct("<2H"), w.ref("um"), w.ref("dois"))
+
+    monkeypatch.setattr(snapshot, "FORMAT_VERSION", 1)
+    writer = SnapshotWriter()
+    writer.section(SECTION_GAME, write_game)
+    writer.section(SECTION_NPCS, write_npcs)
+    data = writer.to_bytes()
+    monkeypatch.undo()
+
+    game_state = GameState.from_bytes(data)
+    npc = game_state.npcs[npc_id]
+    assert (game_state.game_id, game_state.version, game_state.current_npc) == ("abc123", 7, npc_id)
+    assert (npc.status, npc.conversation_phase, npc.resistance_level) == ("needs_convincing", "argument_phase", 1)
+    assert npc.chicoteia_used and npc.arguments_used == ("um", "dois")
+    assert game_state.npcs[NPC_IDS[1]].resistance_level == NPC_RECORDS[NPC_IDS[1]]["resistance_level"]
+
+
+def test_unknown_sections_are_skipped():
+    writer = SnapshotWriter()
+    writer.section(SECTION_GAME, lambda w: (w.string("abc123"), w.varint(3), w.string(None), w.flags(True)))
+    writer.section(99, lambda w: w.string("de uma versão futura"))
+    game_state = GameState.from_bytes(writer.to_bytes())
+    assert (game_state.game_id, game_state.version, game_state.game_won) == ("abc123", 3, True)
+
+
+def test_refuses_newer_and_foreign_data():
+    data = bytearray(GameState().to_bytes())
+    data[2] = snapshot.FORMAT_VERSION + 1
+    with pytest.raises(ValueError):
+        SnapshotReader(bytes(data))
+    with pytest.raises(ValueError):
+        GameState.from_bytes(b'{"game_id": "x"}')
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from scheduler import SlotsBusy
+from speculation import Speculator, result_stream, speculated_result
+
+
+def failed(error: Exception) -> Future:
+    future = Future()
+    future.set_exception(error)
+    return future
+
+
+def start_running(speculator: Speculator, key, fn):
+    """Start a speculation and wait until a worker runs it"""
+    started = threading.Event()
+
+    def run():
+        started.set()
+        return fn()
+
+    speculator.start(key, run)
+    assert started.wait(1)
+
+
+def test_take_hands_out_the_speculation_once():
+    speculator = Speculator(max_workers=1)
+    start_running(speculator, "k", lambda: "resposta")
+    future = speculator.take("k")
+    assert future.result(timeout=1) == "resposta"
+    assert speculator.take("k") is None
+    assert speculator.stats()["misses"] == 1
+
+
+def test_start_runs_in_the_callers_context():
+    from scheduler import current_session
+    speculator = Speculator(max_workers=1)
+    current_session.set("sessao")
+    start_running(speculator, "k", current_session.get)
+    assert speculator.take("k").result(timeout=1) == "sessao"
+
+
+def test_failed_speculation_streams_the_fallback():
+    stream = result_stream(failed(ConnectionError("down")), lambda: iter(["chamada"]), lambda: "fallback")
+    assert list(stream) == ["fallback"]
+
+
+def test_slow_speculation_falls_back_after_the_timeout():
+    assert speculated_result(Future(), lambda: "chamada", lambda: "fallback", timeout=0.01) == "fallback"
+
+
+def test_rejected_speculation_makes_the_call():
+    rejected = failed(SlotsBusy("busy"))
+    assert speculated_result(rejected, lambda: "chamada", lambda: "fallback") == "chamada"
+    assert list(result_stream(rejected, lambda: iter(["cha", "mada"]), lambda: "fallback")) == ["cha", "mada"]
+
+
+def test_async_join_falls_back():
+    from asgi import future_deltas, future_result
+
+    async def call():
+        return "chamada"
+
+    async def deltas():
+        yield "chamada"
+
+    async def main():
+        failed_deltas = [delta async for delta in future_deltas(failed(ValueError("bad")), deltas, lambda: "fallback")]
+        slow = await future_result(Future(), call, lambda: "fallback", timeout=0.01)
+        rejected = await future_result(failed(SlotsBusy("busy")), call, lambda: "fallback")
+        rejected_deltas = [delta async for delta in future_deltas(failed(SlotsBusy("busy")), deltas,
+                                                                 lambda: "fallback")]
+        return failed_deltas, slow, rejected, rejected_deltas
+
+    assert asyncio.run(main()) == (["fallback"], "fallback", "chamada", ["chamada"])
+
+
+def test_stream_finishes_when_the_speculation_failed(monkeypatch):
+    """The done event (and the save in on_complete) still happen"""
+    import app as app_module
+    from npc_data import NPC_IDS
+    from game_logic import GameState
+
+    npc_id = next(npc_id for npc_id in NPC_IDS
+                  if GameState().ask_about_giovanni(npc_id)["phase"] == "ai_opinion")
+    monkeypatch.setattr(app_module.ai_engine, "generate_ai_bubble_response",
+                        lambda npc: (_ for _ in ()).throw(ConnectionError("down")))
+    client = app_module.app.test_client()
+    client.post("/api/start_game")
+    client.post(f"/api/ask_giovanni/{npc_id}")
+    body = client.post(f"/api/ask_ai_opinion/{npc_id}?stream=1").get_data(as_text=True)
+    assert "event: done" in body
+    status = client.get("/api/game_status?format=compact").get_json()
+    assert status["npcs"][npc_id]["phase"] != "ai_opinion"
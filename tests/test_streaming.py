@@ -0,0 +1,74 @@
+import pytest
+
+import app as app_module
+from game_logic import GameState
+from npc_data import NPC_IDS
+from session_store import SQLiteSessionStore
+
+OPINION_NPC = next(npc_id for npc_id in NPC_IDS if GameState().ask_about_giovanni(npc_id)["phase"] == "ai_opinion")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), lock_timeout=0.0)
+    monkeypatch.setattr(app_module, "game_sessions", store)
+    monkeypatch.setattr(app_module, "speculation_enabled", False)
+    return store
+
+
+def saved_game(store):
+    session_id = next(iter(store._connection().execute("SELECT session_id FROM sessions")))[0]
+    return session_id, store.get(session_id)
+
+
+def test_opinion_phase_is_saved_before_the_reply_streams(store, monkeypatch):
+    seen = {}
+
+    def stream(npc):
+        # Runs while the response streams: the game is saved and unlocked already
+        session_id, game_state = saved_game(store)
+        seen["phase"] = game_state.npcs[OPINION_NPC].conversation_phase
+        store.release_lock(session_id, store.acquire_lock(session_id))
+        yield "Bolha"
+        yield " total."
+
+    monkeypatch.setattr(app_module.ai_engine, "stream_ai_bubble_response", stream)
+    client = app_module.app.test_client()
+    client.post("/api/start_game")
+    client.post(f"/api/ask_giovanni/{OPINION_NPC}")
+    body = client.post(f"/api/ask_ai_opinion/{OPINION_NPC}?stream=1").get_data(as_text=True)
+
+    assert "event: done" in body
+    assert seen["phase"] != "ai_opinion"
+    _, game_state = saved_game(store)
+    assert game_state.history(OPINION_NPC).entries[-1] == {"type": "ai_opinion", "response": "Bolha total."}
+
+
+def test_aborted_stream_keeps_the_phase_change(store, monkeypatch):
+    def stream(npc):
+        yield "Bolha"
+        yield " total."
+
+    monkeypatch.setattr(app_module.ai_engine, "stream_ai_bubble_response", stream)
+    client = app_module.app.test_client()
+    client.post("/api/start_game")
+    client.post(f"/api/ask_giovanni/{OPINION_NPC}")
+    response = client.post(f"/api/ask_ai_opinion/{OPINION_NPC}?stream=1", buffered=False)
+    next(iter(response.response))
+    response.close()  # The player left mid-stream
+
+    session_id, game_state = saved_game(store)
+    assert game_state.npcs[OPINION_NPC].conversation_phase != "ai_opinion"
+    assert game_state.history(OPINION_NPC).entries[-1]["type"] == "giovanni_question"
+    store.release_lock(session_id, store.acquire_lock(session_id))
+
+
+def test_streamed_chat_is_recorded_on_completion(store, monkeypatch):
+    monkeypatch.setattr(app_module.ai_engine, "stream_npc_response", lambda **kwargs: iter(["Oi!", " Tudo bem."]))
+    client = app_module.app.test_client()
+    client.post("/api/start_game")
+    body = client.post(f"/api/chat/{NPC_IDS[0]}?stream=1", json={"message": "qual sua palestra favorita?"})
+    assert "event: done" in body.get_data(as_text=True)
+
+    _, game_state = saved_game(store)
+    assert [entry["type"] for entry in game_state.history(NPC_IDS[0])] == ["user_message", "ai_response"]
@@ -0,0 +1,74 @@
+"""Build fingerprinted, precompressed copies of the page's static assets.
+
+Each asset is copied to static/build/ as name.<hash>.ext; text files also
+get .gz and (with the brotli package installed) .br siblings compressed at
+maximum level once here instead of per request. The manifest written next
+to them is read by assets.py.
+
+Usage:
+    pip install brotli  # optional, for .br variants
+    python tools/build_assets.py
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from assets import BUILD_DIR, MANIFEST_PATH, MANIFEST_VERSION, STATIC_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Paths relative to static/, as passed to asset_url() in templates
+ASSETS = ("css/style.css", "js/game.js", "images/favicon.jpg")
+COMPRESSIBLE = (".css", ".js", ".svg", ".json")
+
+
+def write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build() -> dict:
+    if brotli is None:
+        print("brotli is not installed, skipping .br variants")
+
+    # Output names are content-hashed, so anything left over is stale
+    shutil.rmtree(BUILD_DIR, ignore_errors=True)
+    manifest = {}
+    for path in ASSETS:
+        with open(os.path.join(STATIC_DIR, path), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(path)
+        built = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        target = os.path.join(BUILD_DIR, built)
+        write(target, data)
+        sizes = [f"{len(data) / 1024:.1f} KB"]
+
+        if ext in COMPRESSIBLE:
+            # mtime=0 keeps the output identical between builds
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            write(target + '.gz', gz)
+            sizes.append(f"gzip {len(gz) / 1024:.1f} KB")
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                write(target + '.br', br)
+                sizes.append(f"br {len(br) / 1024:.1f} KB")
+
+        manifest[path] = built
+        print(f"{path} -> build/{built} ({', '.join(sizes)})")
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "assets": manifest}, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,121 @@
+"""Build resized AVIF/WebP/JPEG variants of the game images.
+
+The originals are 1024px (and up to 3.7 MB as PNG) but are displayed at
+24-80 CSS pixels. This writes each image at 1x-3x its largest display size
+in every format, with content-hashed filenames that can be cached forever,
+plus the manifest read by images.py.
+
+Usage (Pillow is only needed here, not at runtime):
+    pip install Pillow
+    python tools/build_images.py [--quality 80]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from images import BUILD_DIR, IMAGES_DIR, MANIFEST_PATH, MANIFEST_VERSION
+from npc_data import NPCS
+
+try:
+    from PIL import Image, features
+except ImportError:
+    sys.exit("Pillow is required to build images: pip install Pillow")
+
+# Largest display size in CSS pixels, see static/css/style.css
+AVATAR_SIZE = 65       # .npc-avatar (45px in the chat header, smaller on phones)
+PAGE_IMAGES = {
+    "giovanni.jpg": 80,    # .giovanni-logo
+    "conference.jpg": 48,  # .conference-icon
+    "danilo.jpg": 24,      # .creator-avatar
+}
+DENSITIES = (1, 2, 3)
+
+
+def image_sizes() -> dict:
+    """Source path (relative to static/images) -> display size"""
+    sizes = {npc["avatar_image"]: AVATAR_SIZE for npc in NPCS}
+    sizes.update(PAGE_IMAGES)
+    return sizes
+
+
+def load_source(path: str) -> Image.Image:
+    """Open the best available original, preferring the lossless PNG master"""
+    png = os.path.splitext(path)[0] + '.png'
+    source = png if os.path.exists(png) else path
+    with Image.open(source) as image:
+        return image.convert('RGB')
+
+
+def crop_square(image: Image.Image) -> Image.Image:
+    """Center crop, matching how the page displays images (object-fit: cover)"""
+    side = min(image.size)
+    left = (image.width - side) // 2
+    top = (image.height - side) // 2
+    return image.crop((left, top, left + side, top + side))
+
+
+def encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpg":
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    elif fmt == "webp":
+        image.save(buffer, "WEBP", quality=quality, method=6)
+    else:
+        image.save(buffer, "AVIF", quality=max(quality - 20, 30))
+    return buffer.getvalue()
+
+
+def build(quality: int) -> dict:
+    formats = ["jpg", "webp"]
+    if features.check("avif"):
+        formats.insert(0, "avif")
+    else:
+        print("Pillow was built without AVIF support, skipping AVIF")
+
+    # Output names are content-hashed, so anything left over is stale
+    shutil.rmtree(BUILD_DIR, ignore_errors=True)
+    manifest = {}
+    original_bytes = built_bytes = 0
+
+    for path, size in image_sizes().items():
+        source_path = os.path.join(IMAGES_DIR, path)
+        image = crop_square(load_source(source_path))
+        original_bytes += os.path.getsize(source_path)
+        stem = os.path.splitext(path)[0]
+        variants = {fmt: [] for fmt in formats}
+
+        for width in sorted({min(size * density, image.width) for density in DENSITIES}):
+            resized = image.resize((width, width), Image.LANCZOS)
+            for fmt in formats:
+                data = encode(resized, fmt, quality)
+                digest = hashlib.sha256(data).hexdigest()[:10]
+                filename = f"{stem}.{width}.{digest}.{fmt}"
+                target = os.path.join(BUILD_DIR, filename)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.write(data)
+                variants[fmt].append([width, filename])
+                if width == size and fmt == formats[0]:
+                    built_bytes += len(data)
+
+        manifest[path] = {"size": size, "variants": variants}
+        print(f"{path}: {', '.join(f'{w}px' for w, _ in variants['jpg'])}")
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "images": manifest}, f, indent=2, sort_keys=True)
+    print(f"\n{len(manifest)} images, originals {original_bytes / 1024:.0f} KB, "
+          f"1x {formats[0].upper()} variants {built_bytes / 1024:.0f} KB")
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build responsive image variants")
+    parser.add_argument('--quality', type=int, default=80)
+    args = parser.parse_args()
+    build(args.quality)
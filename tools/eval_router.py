@@ -0,0 +1,234 @@
+"""Offline evaluation of the chat response router (router.py).
+
+Replays player messages against a few NPCs and, for every case, records
+the tier the router picks and the reply of each tier that can answer it:
+the template (small talk only), the local model (when LOCAL_LLM_BASE_URL or
+--local-url is set) and the remote LLM. Each reply is measured for latency
+and cost (remote tokens at gpt-4o-mini prices; templates and the local
+model count as free), and with --judge the remote model grades it from 1 to
+5. The report compares every tier with the routed mix and with sending
+everything to the remote LLM.
+
+Cases come from --cases (JSON lines with "message" and optionally "npc_id",
+"phase" and "status") or from the built-in set below.
+
+Usage:
+    python tools/eval_router.py --routes-only
+    python tools/eval_router.py [--cases cases.jsonl] [--npcs 3] [--judge] [--json report.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from ai_engine import AIEngine
+from game_logic import GameState
+from history import ConversationHistory
+from npc_data import NPC_IDS
+from router import TIERS, ResponseRouter
+
+# gpt-4o-mini, USD per million tokens
+PRICE_INPUT = 0.15
+PRICE_OUTPUT = 0.60
+
+CASES = [
+    {"message": "Oi!"},
+    {"message": "oi, tudo bem?"},
+    {"message": "Bom dia! Como vai?"},
+    {"message": "valeu!"},
+    {"message": "kkkkk"},
+    {"message": "ok, entendi"},
+    {"message": "tchau, até mais!"},
+    {"message": "Qual palestra você mais gostou hoje?"},
+    {"message": "Você usa Copilot no dia a dia?"},
+    {"message": "Onde você trabalha atualmente?"},
+    {"message": "O que acha de Rust?"},
+    {"message": "Faz quanto tempo que você conhece o Giovanni?"},
+    {"message": "Você já viu algum projeto de IA dar errado na sua empresa? O que aconteceu?"},
+    {"message": "A IA já gera receita real: o GitHub Copilot tem milhões de assinantes pagantes e "
+                "empresas estão reduzindo custos de suporte com agentes. Isso ainda parece bolha pra você?"},
+    {"message": "Eu entendo o ceticismo, mas na bolha da internet as empresas não tinham receita. "
+                "Hoje a Nvidia, a Microsoft e a OpenAI faturam bilhões com IA. Qual a diferença que você vê?"},
+    {"message": "Valeu pela conversa! Vou assistir a próxima palestra.", "status": "safe", "phase": "safe"},
+    {"message": "E agora que você mudou de ideia, vai usar IA no seu próximo projeto?", "status": "safe",
+     "phase": "safe"},
+]
+
+JUDGE_PROMPT = """Você avalia respostas de personagens (NPCs) de um jogo sobre uma conferência de tecnologia.
+
+PERSONAGEM: {name}, {role}. {personality}
+MENSAGEM DO JOGADOR: {message}
+RESPOSTA DO PERSONAGEM: {reply}
+
+Dê uma nota de 1 a 5 considerando: responde à mensagem, mantém o personagem e é português natural e curto.
+Responda apenas com o número."""
+
+
+def load_cases(path: Optional[str]) -> List[Dict]:
+    if not path:
+        return CASES
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def case_npc(npc_id: str, case: Dict) -> Dict:
+    """NPC dict as the chat route sees it, in the case's phase (argument phase by default)"""
+    npc = GameState().get_npc(npc_id)
+    npc["conversation_phase"] = case.get("phase", "argument_phase")
+    npc["status"] = case.get("status", "needs_convincing")
+    return npc
+
+
+def complete(client, model: str, messages: List[Dict], temperature: float = 0.7, max_tokens: int = 60) -> Dict:
+    """One completion with its latency and cost; errors are reported, not raised"""
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens,
+                                                  temperature=temperature)
+    except Exception as e:
+        return {"reply": None, "error": str(e), "latency": time.perf_counter() - start, "cost": 0.0}
+    latency = time.perf_counter() - start
+    usage = response.usage
+    cost = 0.0
+    if usage is not None and model == "gpt-4o-mini":
+        cost = (usage.prompt_tokens * PRICE_INPUT + usage.completion_tokens * PRICE_OUTPUT) / 1e6
+    return {"reply": (response.choices[0].message.content or "").strip(), "latency": latency, "cost": cost}
+
+
+def judge(client, npc: Dict, message: str, reply: str) -> Optional[int]:
+    prompt = JUDGE_PROMPT.format(name=npc["name"], role=npc["role"], personality=npc["personality"],
+                                 message=message, reply=reply)
+    result = complete(client, "gpt-4o-mini", [{"role": "user", "content": prompt}], temperature=0, max_tokens=3)
+    match = re.search(r"[1-5]", result["reply"] or "")
+    return int(match.group()) if match else None
+
+
+def evaluate(cases: List[Dict], npc_ids: List[str], router: ResponseRouter, routes_only: bool,
+             use_judge: bool) -> List[Dict]:
+    """One row per (case, NPC): routed tier plus each tier's reply and measurements"""
+    engine = AIEngine()
+    local_client = None
+    if router.has_local and not routes_only:
+        from openai import OpenAI
+        local_client = OpenAI(base_url=router.local_base_url, api_key=router.local_api_key, max_retries=0)
+
+    rows = []
+    for case in cases:
+        for npc_id in ([case["npc_id"]] if "npc_id" in case else npc_ids):
+            npc = case_npc(npc_id, case)
+            message = case["message"]
+            tier, intent = router.choose(npc, message)
+            row = {"npc_id": npc_id, "message": message, "routed": tier, "intent": intent, "tiers": {}}
+            rows.append(row)
+            if routes_only:
+                continue
+
+            if intent:
+                start = time.perf_counter()
+                reply = router.template_reply(npc, intent)
+                row["tiers"]["template"] = {"reply": reply, "latency": time.perf_counter() - start, "cost": 0.0}
+            messages = engine._build_npc_messages(npc, ConversationHistory(), message, {})
+            if local_client is not None:
+                row["tiers"]["local"] = complete(local_client, router.local_model, messages)
+            row["tiers"]["remote"] = complete(engine.client, "gpt-4o-mini", messages)
+
+            if use_judge:
+                for result in row["tiers"].values():
+                    if result["reply"]:
+                        result["quality"] = judge(engine.client, npc, message, result["reply"])
+    return rows
+
+
+def aggregate(results: List[Dict]) -> Dict:
+    latencies = [r["latency"] * 1000 for r in results]
+    qualities = [r["quality"] for r in results if r.get("quality") is not None]
+    return {
+        "replies": len(results),
+        "errors": sum(1 for r in results if r["reply"] is None),
+        "latency_p50_ms": statistics.median(latencies) if latencies else None,
+        "latency_p95_ms": sorted(latencies)[int(len(latencies) * 0.95)] if latencies else None,
+        "cost_per_1000": sum(r["cost"] for r in results) / len(results) * 1000 if results else None,
+        "quality": statistics.mean(qualities) if qualities else None
+    }
+
+
+def summarize(rows: List[Dict]) -> Dict:
+    routed = {tier: sum(1 for row in rows if row["routed"] == tier) for tier in TIERS}
+    summary = {
+        "cases": len(rows),
+        "routed": routed,
+        "remote_calls_avoided": 1 - routed["remote"] / len(rows) if rows else 0.0,
+        "tiers": {}
+    }
+    if not any(row["tiers"] for row in rows):
+        return summary
+    for tier in TIERS:
+        results = [row["tiers"][tier] for row in rows if tier in row["tiers"]]
+        if results:
+            summary["tiers"][tier] = aggregate(results)
+    # The routed mix: each case answered by its routed tier (remote when that tier failed, as in the app)
+    mix = []
+    for row in rows:
+        result = row["tiers"].get(row["routed"])
+        if result is None or result["reply"] is None:
+            result = row["tiers"]["remote"]
+        mix.append(result)
+    summary["tiers"]["routed"] = aggregate(mix)
+    return summary
+
+
+def print_report(rows: List[Dict], summary: Dict, verbose: bool):
+    if verbose:
+        for row in rows:
+            print(f"[{row['routed']:<8}] {row['npc_id']:<18} {row['message'][:60]}")
+            for tier, result in row["tiers"].items():
+                quality = f" q={result['quality']}" if result.get("quality") is not None else ""
+                print(f"    {tier:<8} {result['latency'] * 1000:>7.0f} ms{quality}  {result['reply'] or result.get('error')}")
+        print()
+    routed = summary["routed"]
+    print(f"{summary['cases']} cases routed: " + ", ".join(f"{tier} {routed[tier]}" for tier in TIERS) +
+          f" ({summary['remote_calls_avoided']:.0%} without a remote call)")
+    if not summary["tiers"]:
+        return
+    print(f"\n{'tier':<10} {'replies':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'$/1000':>8} {'quality':>8}")
+    for tier, stats in summary["tiers"].items():
+        quality = f"{stats['quality']:.2f}" if stats["quality"] is not None else "-"
+        print(f"{tier:<10} {stats['replies']:>7} {stats['errors']:>6} {stats['latency_p50_ms']:>8.0f} "
+              f"{stats['latency_p95_ms']:>8.0f} {stats['cost_per_1000']:>8.4f} {quality:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare template, local and remote replies for chat turns")
+    parser.add_argument('--cases', help="JSON lines file with the messages to replay")
+    parser.add_argument('--npcs', type=int, default=3, help="NPCs per case (when the case has no npc_id)")
+    parser.add_argument('--local-url', help="OpenAI-compatible endpoint of the small model (overrides LOCAL_LLM_BASE_URL)")
+    parser.add_argument('--local-model', help="model name on that endpoint (overrides LOCAL_LLM_MODEL)")
+    parser.add_argument('--routes-only', action='store_true', help="only show routing decisions, call no model")
+    parser.add_argument('--judge', action='store_true', help="grade every reply with the remote model")
+    parser.add_argument('--verbose', action='store_true', help="print every reply")
+    parser.add_argument('--json', help="write the rows and summary to this file")
+    args = parser.parse_args()
+
+    router = ResponseRouter.from_env()
+    router.enabled = True
+    if args.local_url:
+        router.local_base_url = args.local_url
+    if args.local_model:
+        router.local_model = args.local_model
+
+    rows = evaluate(load_cases(args.cases), list(NPC_IDS[:args.npcs]), router, args.routes_only, args.judge)
+    summary = summarize(rows)
+    print_report(rows, summary, args.verbose or args.routes_only)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"summary": summary, "rows": rows}, f, indent=2, ensure_ascii=False)
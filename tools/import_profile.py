@@ -0,0 +1,105 @@
+"""Cold start profile: import time of the app and time to its first page.
+
+Runs a fresh interpreter with -X importtime, reports the total and the
+slowest modules (cumulative), whether heavy dependencies that should be
+deferred (openai, httpx, numpy) were imported at startup, and the time
+until `/` has been rendered once. --json writes the numbers so they can be
+tracked between releases.
+
+Usage:
+    python tools/import_profile.py [--module app] [--top 15] [--runs 3] [--json profile.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Imported on first use (or by the background warm-up), never at startup
+DEFERRED = ("openai", "httpx", "numpy", "scoring")
+
+FIRST_PAGE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+from app import app
+app.test_client().get('/')
+served = time.perf_counter()
+print(imported - start, served - start, ",".join(m for m in {deferred!r} if m in sys.modules))
+"""
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    # No warm-up thread: it would race the measurement
+    env = dict(os.environ, LLM_WARMUP='0')
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def import_times(module: str) -> List[Dict]:
+    """Per-module self and cumulative import time in ms, from -X importtime"""
+    stderr = run_python(f"import {module}", '-X', 'importtime').stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    return rows
+
+
+def profile(module: str, top: int, runs: int) -> Dict:
+    rows = import_times(module)
+    total = next(row["cumulative_ms"] for row in rows if row["module"] == module)
+
+    import_ms, first_page_ms, deferred = [], [], ""
+    for _ in range(runs):
+        output = run_python(FIRST_PAGE.format(module=module, deferred=DEFERRED)).stdout.split()
+        import_ms.append(float(output[0]) * 1000)
+        first_page_ms.append(float(output[1]) * 1000)
+        deferred = output[2] if len(output) > 2 else ""
+
+    return {
+        "module": module,
+        "import_ms": statistics.median(import_ms),
+        "first_page_ms": statistics.median(first_page_ms),
+        "importtime_total_ms": total,
+        "imported_at_startup": [name for name in deferred.split(",") if name],
+        "slowest": sorted((row for row in rows if row["depth"] <= 1 and row["module"] != module),
+                          key=lambda row: row["cumulative_ms"], reverse=True)[:top]
+    }
+
+
+def print_report(report: Dict):
+    print(f"import {report['module']}: {report['import_ms']:.0f} ms "
+          f"(first page after {report['first_page_ms']:.0f} ms)")
+    eager = report["imported_at_startup"]
+    print(f"deferred modules imported at startup: {', '.join(eager) if eager else 'none'}\n")
+    print(f"{'module':<40} {'cumulative ms':>14} {'self ms':>8}")
+    for row in report["slowest"]:
+        print(f"{row['module']:<40} {row['cumulative_ms']:>14.1f} {row['self_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile the app's import time and first page")
+    parser.add_argument('--module', default='app', help="entry module (app or asgi)")
+    parser.add_argument('--top', type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument('--runs', type=int, default=3, help="first-page runs (median is reported)")
+    parser.add_argument('--json', help="write the report to this file")
+    args = parser.parse_args()
+
+    report = profile(args.module, args.top, args.runs)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,223 @@
+"""Headless game simulator for balancing npc_data.py.
+
+Plays whole games with a simple player (asks every NPC about Giovanni and
+the AI bubble, then picks one of the offered arguments each turn, opening
+with "chicoteia" with some probability, and gives up on an NPC after
+--max-turns arguments). The vectorized mode runs each NPC's conversation
+for all games at once in NumPy, with the landing chances taken from the
+same argument scorer make_argument uses; the reference mode plays
+GameState itself, one game at a time, to check the two agree.
+
+Usage:
+    python tools/simulate.py [--games 1000000] [--seed 1] [--max-turns 20] [--chicoteia 0.5] [--json out.json]
+    python tools/simulate.py --reference --games 20000
+    python tools/simulate.py --verify 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from npc_data import NPC_IDS, NPC_RECORDS
+from game_logic import CHICOTEIA_RATE, GameState
+from scoring import argument_scorer
+
+BATCH_SIZE = 250_000
+
+
+def chance_table(npc_id: str) -> np.ndarray:
+    """Landing chance per [argument, resistance, repeated] for one NPC"""
+    arguments = argument_scorer.arguments
+    resistance = NPC_RECORDS[npc_id]["resistance_level"]
+    table = np.zeros((len(arguments), resistance + 1, 2))
+    for a, argument in enumerate(arguments):
+        for r in range(resistance + 1):
+            for repeated in (0, 1):
+                table[a, r, repeated] = argument_scorer.evaluate(npc_id, argument["text"], r, bool(repeated))["chance"]
+    return table
+
+
+def simulate_npc(rng: np.random.Generator, npc_id: str, games: int, max_turns: int,
+                 chicoteia: float, table: np.ndarray):
+    """Turns spent on one NPC and whether it was convinced, for `games` games"""
+    record = NPC_RECORDS[npc_id]
+    if not record["knows_giovanni"]:
+        return np.ones(games, dtype=np.int32), np.ones(games, dtype=bool)
+    if record["ai_bubble_stance"] != "bubble":
+        return np.full(games, 2, dtype=np.int32), np.ones(games, dtype=bool)
+
+    n_arguments = table.shape[0]
+    rows = np.arange(games)
+    turns = np.full(games, 2, dtype=np.int32)  # ask_giovanni + ask_ai_opinion
+    resistance = np.full(games, record["resistance_level"], dtype=np.int32)
+    used = np.zeros((games, n_arguments), dtype=bool)
+    safe = np.zeros(games, dtype=bool)
+
+    for turn in range(max_turns):
+        active = ~safe
+        if not active.any():
+            break
+        turns += active
+        if turn == 0 and chicoteia > 0:
+            magic = active & (rng.random(games) < chicoteia)
+            safe |= magic & (rng.random(games) < CHICOTEIA_RATE)
+            active &= ~magic
+
+        chosen = rng.integers(n_arguments, size=games)
+        repeated = used[rows, chosen]
+        lands = active & (rng.random(games) < table[chosen, resistance, repeated.astype(np.int32)])
+        resistance = np.maximum(resistance - lands, 0)
+        used[rows[active], chosen[active]] = True
+        safe |= active & (resistance <= 0)
+    return turns, safe
+
+
+def run_vectorized(games: int, seed: int, max_turns: int, chicoteia: float) -> Dict:
+    rng = np.random.default_rng(seed)
+    tables = {npc_id: chance_table(npc_id) for npc_id in NPC_IDS}
+    turns = {npc_id: [] for npc_id in NPC_IDS}
+    safe = {npc_id: [] for npc_id in NPC_IDS}
+    for start in range(0, games, BATCH_SIZE):
+        size = min(BATCH_SIZE, games - start)
+        for npc_id in NPC_IDS:
+            npc_turns, npc_safe = simulate_npc(rng, npc_id, size, max_turns, chicoteia, tables[npc_id])
+            turns[npc_id].append(npc_turns)
+            safe[npc_id].append(npc_safe)
+    return summarize({npc_id: np.concatenate(turns[npc_id]) for npc_id in NPC_IDS},
+                     {npc_id: np.concatenate(safe[npc_id]) for npc_id in NPC_IDS})
+
+
+def play_reference(game_state: GameState, npc_id: str, max_turns: int, chicoteia: float):
+    """One conversation through the real game rules, same player as simulate_npc"""
+    game_state.start_conversation(npc_id)
+    turns = 1
+    if game_state.ask_about_giovanni(npc_id)["phase"] != "ai_opinion":
+        return turns, True
+    turns += 1
+    game_state.ask_ai_bubble_opinion(npc_id)
+    for turn in range(max_turns):
+        if game_state.npcs[npc_id].status == "safe":
+            break
+        turns += 1
+        if turn == 0 and random.random() < chicoteia:
+            game_state.make_argument(npc_id, "chicoteia")
+        else:
+            game_state.make_argument(npc_id, random.choice(game_state.get_random_arguments())["text"])
+    return turns, game_state.npcs[npc_id].status == "safe"
+
+
+def run_reference(games: int, seed: int, max_turns: int, chicoteia: float) -> Dict:
+    random.seed(seed)
+    turns = {npc_id: np.zeros(games, dtype=np.int32) for npc_id in NPC_IDS}
+    safe = {npc_id: np.zeros(games, dtype=bool) for npc_id in NPC_IDS}
+    for game in range(games):
+        game_state = GameState()
+        for npc_id in NPC_IDS:
+            turns[npc_id][game], safe[npc_id][game] = play_reference(game_state, npc_id, max_turns, chicoteia)
+    return summarize(turns, safe)
+
+
+def distribution(values: np.ndarray) -> Dict:
+    if not len(values):
+        return {"mean": None, "p10": None, "p50": None, "p90": None}
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    return {"mean": float(values.mean()), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+
+def summarize(turns: Dict[str, np.ndarray], safe: Dict[str, np.ndarray]) -> Dict:
+    won = np.logical_and.reduce([safe[npc_id] for npc_id in NPC_IDS])
+    total_turns = np.sum([turns[npc_id] for npc_id in NPC_IDS], axis=0)
+    npcs = {}
+    for npc_id in NPC_IDS:
+        npcs[npc_id] = {
+            "resistance_level": NPC_RECORDS[npc_id]["resistance_level"],
+            "convinced_rate": float(safe[npc_id].mean()),
+            "turns": distribution(turns[npc_id][safe[npc_id]]),
+            "turns_std": float(turns[npc_id].std()),
+            "turns_all_mean": float(turns[npc_id].mean())
+        }
+    return {
+        "games": int(len(won)),
+        "win_rate": float(won.mean()),
+        "turns_to_win": distribution(total_turns[won]),
+        "npcs": npcs
+    }
+
+
+def print_summary(summary: Dict, label: str, elapsed: float):
+    turns = summary["turns_to_win"]
+    print(f"\n{label}: {summary['games']} games in {elapsed:.1f}s, win rate {summary['win_rate']:.1%}")
+    if turns["mean"] is not None:
+        print(f"turns to win: mean {turns['mean']:.1f}, p10 {turns['p10']:.0f}, "
+              f"p50 {turns['p50']:.0f}, p90 {turns['p90']:.0f}")
+    print(f"\n{'npc':<20} {'resist':>6} {'convinced':>10} {'mean':>6} {'p50':>5} {'p90':>5}")
+    for npc_id, row in summary["npcs"].items():
+        t = row["turns"]
+        mean = f"{t['mean']:.1f}" if t["mean"] is not None else "-"
+        p50 = f"{t['p50']:.0f}" if t["p50"] is not None else "-"
+        p90 = f"{t['p90']:.0f}" if t["p90"] is not None else "-"
+        print(f"{npc_id:<20} {row['resistance_level']:>6} {row['convinced_rate']:>10.1%} "
+              f"{mean:>6} {p50:>5} {p90:>5}")
+
+
+def compare(vectorized: Dict, reference: Dict) -> List[str]:
+    """Statistics that differ by more than 4 standard errors between the two modes"""
+    mismatches = []
+    n_vec, n_ref = vectorized["games"], reference["games"]
+
+    def check(name, p_vec, p_ref, std_vec, std_ref):
+        error = (std_vec ** 2 / n_vec + std_ref ** 2 / n_ref) ** 0.5
+        if abs(p_vec - p_ref) > 4 * max(error, 1e-9):
+            mismatches.append(f"{name}: vectorized {p_vec:.4f}, reference {p_ref:.4f}")
+
+    def rate_std(p):
+        return (p * (1 - p)) ** 0.5
+
+    check("win_rate", vectorized["win_rate"], reference["win_rate"],
+          rate_std(vectorized["win_rate"]), rate_std(reference["win_rate"]))
+    for npc_id in NPC_IDS:
+        v, r = vectorized["npcs"][npc_id], reference["npcs"][npc_id]
+        check(f"{npc_id} convinced_rate", v["convinced_rate"], r["convinced_rate"],
+              rate_std(v["convinced_rate"]), rate_std(r["convinced_rate"]))
+        check(f"{npc_id} mean turns", v["turns_all_mean"], r["turns_all_mean"], v["turns_std"], r["turns_std"])
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate games to balance NPC resistance and argument odds")
+    parser.add_argument('--games', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-turns', type=int, default=20, help="arguments tried per NPC before giving up")
+    parser.add_argument('--chicoteia', type=float, default=0.5, help="probability of opening with the magic word")
+    parser.add_argument('--reference', action='store_true', help="play GameState one game at a time instead")
+    parser.add_argument('--verify', type=int, metavar='GAMES', help="run both modes and compare their statistics")
+    parser.add_argument('--json', help="write the summary to this file")
+    args = parser.parse_args()
+
+    if args.verify:
+        start = time.perf_counter()
+        vectorized = run_vectorized(args.verify, args.seed, args.max_turns, args.chicoteia)
+        print_summary(vectorized, "vectorized", time.perf_counter() - start)
+        start = time.perf_counter()
+        reference = run_reference(args.verify, args.seed, args.max_turns, args.chicoteia)
+        print_summary(reference, "reference", time.perf_counter() - start)
+        mismatches = compare(vectorized, reference)
+        for line in mismatches:
+            print(f"MISMATCH {line}")
+        print("\nmodes agree" if not mismatches else f"\n{len(mismatches)} statistics differ")
+        sys.exit(1 if mismatches else 0)
+
+    run = run_reference if args.reference else run_vectorized
+    start = time.perf_counter()
+    summary = run(args.games, args.seed, args.max_turns, args.chicoteia)
+    print_summary(summary, "reference" if args.reference else "vectorized", time.perf_counter() - start)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)